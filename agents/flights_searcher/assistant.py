@@ -22,6 +22,11 @@ from langgraph.graph.message import AnyMessage, add_messages # type: ignore
 from datetime import *
 from dotenv import load_dotenv
 from mq_sdk.mq_agent.MQBaseAssistant import MQBaseAssistant
+from mq_sdk.mq_agent.MQCompactor import MQCompactor
+from mq_sdk.utilities.metrics import metrics
+from mq_sdk.utilities.tracing import tracer
+from mq_sdk.mq_trigger.state_listener import StateListener
+from agents.flights_searcher.inventory import get_inventory
 from agents.flights_searcher.tools import search_flights
 import uuid
 import json
@@ -43,6 +48,8 @@ class FlightInfo(BaseModel):
 class State(TypedDict):
     messages: Annotated[list[AnyMessage], add_messages]    
     flight_info: str
+    # Older turns, folded in by MQCompactor
+    summary: str
 
 class FlightSearcherAgent(MQBaseAssistant):    
     messages = []        
@@ -74,19 +81,26 @@ class FlightSearcherAgent(MQBaseAssistant):
             ccdt_path=ccdt_path, 
             assistant_id=assistant_id
         )                
+        self.inventory = get_inventory()
+        # Price publications keep the search inventory up to date
+        self.bt = StateListener(
+            ccdt_path=ccdt_path,
+            on_state_change=self.on_state_change
+        )
         self.runnable = self.bind()    
 
     def on_state_change(self, msgObject: str):         
         try:            
             flight_infoJSON = json.loads(msgObject["Object"])            
-            print(f'EventAssistant::on_message::{flight_infoJSON}')          
-            self.reactive_state["flight_info"] = flight_infoJSON
+            self.inventory.apply_update(flight_infoJSON)
         except Exception as e:
-            print(f'EventAssistant::on_message::{e}')
+            print(f'FlightSearcherAgent::on_state_change::{e}')
              
     def __call__(self, state: State, config: RunnableConfig):
+        state = MQCompactor.with_summary(state)
         while True:                  
-            result = self.runnable.invoke(state, config=config)            
+            with metrics.timer('llm_invoke_seconds', agent='flights_searcher'), tracer.span('llm.invoke', agent='flights_searcher'):
+                result = self.runnable.invoke(state, config=config)            
             if not result.tool_calls and (
                 not result.content
                 or (isinstance(result.content, list) and not result.content[0].get("text"))
@@ -98,9 +112,10 @@ class FlightSearcherAgent(MQBaseAssistant):
         return {"messages": result}
         
     def bind(self):
-        llm = ChatOpenAI(model="gpt-4o-mini-2024-07-18", temperature=0)
+        # Kept unbound so the graph's compactor can summarize with the same model
+        self.llm = ChatOpenAI(model="gpt-4o-mini-2024-07-18", temperature=0)
         mq_chat_template = self.format_prompt_template(self.primary_assistant_prompt)      
-        return mq_chat_template | self.bind_tools(llm, self.tools)
+        return mq_chat_template | self.bind_tools(self.llm, self.tools)
     
     def get_tools(self):
         return self.tools
\ No newline at end of file
@@ -22,6 +22,7 @@ from agents.flights_searcher.assistant import (
     State, 
 )
 from agents.primary_agent.utilities import create_tool_node_with_fallback
+from mq_sdk.mq_agent.MQCompactor import MQCompactor
 
 class MyGraph:
     builder:StateGraph = None
@@ -33,9 +34,12 @@ class MyGraph:
 
     def build_graph(self):
         assistant = FlightSearcherAgent()
+        # Each turn starts by folding the oldest turns of the thread into its summary
+        self.builder.add_node("compact", MQCompactor.from_env(llm=assistant.llm, agent="flights_searcher"))
         self.builder.add_node("assistant", assistant)
         self.builder.add_node("tools", create_tool_node_with_fallback(assistant.get_tools()))
-        self.builder.add_edge(START, "assistant")
+        self.builder.add_edge(START, "compact")
+        self.builder.add_edge("compact", "assistant")
         self.builder.add_conditional_edges(
             "assistant",
             tools_condition,
@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+In-memory flight inventory behind the search_flights tool.
+
+Flights are stored column-wise in numpy arrays. Each (departure_city, arrival_city, date)
+route keeps its flights sorted by departure time, so a departure window is two binary
+searches and the price and seats filters run over the window as array operations.
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400
+# An update departing within this many seconds of a known departure of the same flight
+# number on the day before or after is taken as that flight retimed, not as a new one
+RETIME_WINDOW = 12 * 3600
+DEFAULT_INVENTORY_PATH = "agents/flights_searcher/flights.json"
+
+
+def to_epoch(value) -> int:
+    """Seconds since the epoch for an ISO-8601 timestamp (UTC when no offset is given)."""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    dt = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def to_day(date: str) -> int:
+    """Day number since the epoch for a YYYY-MM-DD date."""
+    return to_epoch(f"{str(date).strip()[:10]}T00:00:00") // SECONDS_PER_DAY
+
+
+def to_iso(ts: int) -> str:
+    return datetime.fromtimestamp(int(ts), tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def format_duration(seconds: int) -> str:
+    return f"{seconds // 3600}h {(seconds % 3600) // 60}m"
+
+
+class FlightInventory:
+    """
+        Flights indexed by (departure_city, arrival_city, date).
+
+        A flight is identified by its flight number and departure date. Loading or
+        applying an update for a flight that is already known replaces its price,
+        seats and times in place. An update only changes the fields it carries, and
+        may move a flight to the day before or after.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.RLock()
+        self._size = 0
+        self._strings: List[str] = []
+        self._string_codes: Dict[str, int] = {}
+        self._airline = np.empty(capacity, dtype=np.int32)
+        self._fare_type = np.empty(capacity, dtype=np.int32)
+        self._departure_city = np.empty(capacity, dtype=np.int32)
+        self._arrival_city = np.empty(capacity, dtype=np.int32)
+        self._flight_number = np.empty(capacity, dtype=object)
+        self._departure = np.empty(capacity, dtype=np.int64)
+        self._arrival = np.empty(capacity, dtype=np.int64)
+        self._price = np.empty(capacity, dtype=np.float64)
+        self._seats = np.empty(capacity, dtype=np.int32)
+        # route key -> (departure times sorted ascending, row of each departure)
+        self._routes: Dict[Tuple[int, int, int], Tuple[np.ndarray, np.ndarray]] = {}
+        # (flight_number, departure day) -> row
+        self._rows: Dict[Tuple[str, int], int] = {}
+
+    def __len__(self) -> int:
+        return self._size
+
+    @classmethod
+    def from_files(cls, *paths: str) -> "FlightInventory":
+        inventory = cls()
+        for path in paths:
+            inventory.load(path)
+        return inventory
+
+    def load(self, path: str) -> int:
+        """
+            Load flights from a JSON array or a JSON-lines file of FlightInfo records.
+        """
+        with open(path) as f:
+            if path.endswith(".jsonl"):
+                records = [json.loads(line) for line in f if line.strip()]
+            else:
+                records = json.load(f)
+        count = self.extend(records)
+        logger.info("Loaded %d flights from %s", count, path)
+        return count
+
+    def extend(self, records: Iterable[dict]) -> int:
+        """
+            Add or update many FlightInfo records at once.
+        """
+        columns = {name: [] for name in ("airline", "flight_number", "departure_city", "arrival_city",
+                                          "departure", "arrival", "price", "seats", "fare_type")}
+        for record in records:
+            columns["airline"].append(record["airline"])
+            columns["flight_number"].append(record["flight_number"])
+            columns["departure_city"].append(record["departure_city"])
+            columns["arrival_city"].append(record["arrival_city"])
+            columns["departure"].append(to_epoch(record["departure_time"]))
+            columns["arrival"].append(to_epoch(record["arrival_time"]))
+            columns["price"].append(float(record["price"]))
+            columns["seats"].append(int(record["seats_left"]))
+            columns["fare_type"].append(record.get("fare_type", ""))
+        return self.extend_columns(**columns)
+
+    def extend_columns(self, airline, flight_number, departure_city, arrival_city,
+                       departure, arrival, price, seats, fare_type) -> int:
+        """
+            Add or update flights given as parallel columns.
+
+            String columns may be any sequence of str; departure and arrival are epoch seconds.
+        """
+        with self._lock:
+            departure = np.asarray(departure, dtype=np.int64)
+            n = len(departure)
+            if n == 0:
+                return 0
+            airline = self._encode(airline)
+            fare_type = self._encode(fare_type)
+            departure_city = self._encode(departure_city)
+            arrival_city = self._encode(arrival_city)
+            flight_number = np.asarray(flight_number, dtype=object)
+            days = departure // SECONDS_PER_DAY
+
+            rows = np.empty(n, dtype=np.int64)
+            next_row = self._size
+            for i, key in enumerate(zip(flight_number.tolist(), days.tolist())):
+                row = self._rows.get(key)
+                if row is None:
+                    row = next_row
+                    next_row += 1
+                    self._rows[key] = row
+                rows[i] = row
+
+            # Flights that are already indexed leave their route before their columns change.
+            for row in np.unique(rows[rows < self._size]).tolist():
+                self._unindex(row)
+
+            self._reserve(next_row)
+            self._airline[rows] = airline
+            self._fare_type[rows] = fare_type
+            self._departure_city[rows] = departure_city
+            self._arrival_city[rows] = arrival_city
+            self._flight_number[rows] = flight_number
+            self._departure[rows] = departure
+            self._arrival[rows] = np.asarray(arrival, dtype=np.int64)
+            self._price[rows] = np.asarray(price, dtype=np.float64)
+            self._seats[rows] = np.asarray(seats, dtype=np.int32)
+            self._size = next_row
+            self._index_rows(np.unique(rows))
+            return n
+
+    def apply_update(self, record: dict):
+        """
+            Apply one FlightInfo record, e.g. a publication from the pricing topic.
+            Fields that are missing or None keep the value already stored.
+        """
+        with self._lock:
+            departure = to_epoch(record["departure_time"])
+            row = self._find(record["flight_number"], departure)
+            if row is None:
+                self.extend([record])
+                return
+            update = {field: value for field, value in record.items() if value is not None}
+            if "arrival_time" not in update:
+                # A retimed flight keeps its duration
+                update["arrival_time"] = int(self._arrival[row]) + departure - int(self._departure[row])
+            moved = departure // SECONDS_PER_DAY
+            stored = int(self._departure[row]) // SECONDS_PER_DAY
+            if moved != stored:
+                # The flight keeps its row under its new departure day
+                del self._rows[(self._flight_number[row], stored)]
+                self._rows[(self._flight_number[row], moved)] = row
+            self.extend([{**self._record(row), **update}])
+
+    def _find(self, flight_number: str, departure: int) -> Optional[int]:
+        """Row of the flight departing at departure, allowing for a move across midnight."""
+        day = departure // SECONDS_PER_DAY
+        row = self._rows.get((flight_number, day))
+        if row is not None:
+            return row
+        nearby = [row for row in (self._rows.get((flight_number, day - 1)), self._rows.get((flight_number, day + 1)))
+                  if row is not None and abs(int(self._departure[row]) - departure) <= RETIME_WINDOW]
+        return min(nearby, key=lambda row: abs(int(self._departure[row]) - departure), default=None)
+
+    def search(self,
+               departure_city: str,
+               arrival_city: str,
+               date: str,
+               earliest: Optional[str] = None,
+               latest: Optional[str] = None,
+               max_price: Optional[float] = None,
+               min_seats: int = 1,
+               sort_by: str = "price",
+               limit: int = 10) -> List[dict]:
+        """
+            Flights on a route and date, optionally within a departure window (HH:MM, UTC),
+            under a maximum price and with enough seats left. Results are sorted by
+            price or departure time.
+        """
+        day = to_day(date)
+        with self._lock:
+            key = (self._string_codes.get(self._normalize(departure_city), -1),
+                   self._string_codes.get(self._normalize(arrival_city), -1),
+                   day)
+            route = self._routes.get(key)
+            if route is None:
+                return []
+            times, rows = route
+            start = day * SECONDS_PER_DAY
+            lo = 0 if earliest is None else np.searchsorted(times, start + self._seconds(earliest), "left")
+            hi = len(times) if latest is None else np.searchsorted(times, start + self._seconds(latest), "right")
+            rows = rows[lo:hi]
+            if len(rows) == 0:
+                return []
+
+            price = self._price[rows]
+            mask = self._seats[rows] >= min_seats
+            if max_price is not None:
+                mask &= price <= max_price
+            rows = rows[mask]
+            if sort_by == "price":
+                price = price[mask]
+                if limit and len(rows) > limit:
+                    top = np.argpartition(price, limit - 1)[:limit]
+                    rows, price = rows[top], price[top]
+                rows = rows[np.argsort(price, kind="stable")]
+            if limit:
+                rows = rows[:limit]
+            return [self._record(row) for row in rows.tolist()]
+
+    def _record(self, row: int) -> dict:
+        departure = int(self._departure[row])
+        arrival = int(self._arrival[row])
+        price = float(self._price[row])
+        return {
+            "airline": self._strings[self._airline[row]],
+            "departure_time": to_iso(departure),
+            "departure_city": self._strings[self._departure_city[row]],
+            "flight_number": self._flight_number[row],
+            "duration": format_duration(arrival - departure),
+            "arrival_time": to_iso(arrival),
+            "arrival_city": self._strings[self._arrival_city[row]],
+            "fare_type": self._strings[self._fare_type[row]],
+            "price": f"{price:g}",
+            "seats_left": str(int(self._seats[row])),
+        }
+
+    @staticmethod
+    def _normalize(value: str) -> str:
+        return str(value).strip().casefold()
+
+    @staticmethod
+    def _seconds(hhmm: str) -> int:
+        parts = [int(p) for p in str(hhmm).strip().split(":")]
+        parts += [0] * (3 - len(parts))
+        return parts[0] * 3600 + parts[1] * 60 + parts[2]
+
+    def _encode(self, values) -> np.ndarray:
+        """Intern a string column, returning its codes."""
+        unique, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+        codes = np.empty(len(unique), dtype=np.int32)
+        for i, value in enumerate(unique.tolist()):
+            normalized = self._normalize(value)
+            code = self._string_codes.get(normalized)
+            if code is None:
+                code = len(self._strings)
+                self._strings.append(value)
+                self._string_codes[normalized] = code
+            codes[i] = code
+        return codes[inverse.reshape(-1)]
+
+    def _reserve(self, size: int):
+        capacity = len(self._price)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2)
+        for name in ("_airline", "_fare_type", "_departure_city", "_arrival_city", "_flight_number",
+                     "_departure", "_arrival", "_price", "_seats"):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+
+    def _route_key(self, row: int) -> Tuple[int, int, int]:
+        return (int(self._departure_city[row]), int(self._arrival_city[row]),
+                int(self._departure[row]) // SECONDS_PER_DAY)
+
+    def _unindex(self, row: int):
+        key = self._route_key(row)
+        if key not in self._routes:
+            return
+        times, rows = self._routes[key]
+        keep = rows != row
+        if keep.all():
+            return
+        if keep.any():
+            self._routes[key] = (times[keep], rows[keep])
+        else:
+            del self._routes[key]
+
+    def _index_rows(self, rows: np.ndarray):
+        """Merge rows into their routes, keeping each route sorted by departure time."""
+        departure = self._departure[rows]
+        dep_city = self._departure_city[rows]
+        arr_city = self._arrival_city[rows]
+        days = departure // SECONDS_PER_DAY
+        order = np.lexsort((departure, days, arr_city, dep_city))
+        rows, departure = rows[order], departure[order]
+        dep_city, arr_city, days = dep_city[order], arr_city[order], days[order]
+        boundaries = np.flatnonzero((np.diff(dep_city) != 0) | (np.diff(arr_city) != 0) | (np.diff(days) != 0)) + 1
+        starts = np.concatenate(([0], boundaries)).tolist()
+        ends = np.concatenate((boundaries, [len(rows)])).tolist()
+        for start, end in zip(starts, ends):
+            key = (int(dep_city[start]), int(arr_city[start]), int(days[start]))
+            times, group = departure[start:end], rows[start:end]
+            existing = self._routes.get(key)
+            if existing is not None:
+                times = np.concatenate((existing[0], times))
+                group = np.concatenate((existing[1], group))
+                merged = np.argsort(times, kind="stable")
+                times, group = times[merged], group[merged]
+            self._routes[key] = (times, group)
+
+
+_inventory: Optional[FlightInventory] = None
+_inventory_lock = threading.Lock()
+
+
+def get_inventory() -> FlightInventory:
+    """
+        The process-wide inventory, loaded on first use from FLIGHT_INVENTORY_PATH
+        (a comma separated list of files) or the sample file shipped with the agent.
+    """
+    global _inventory
+    with _inventory_lock:
+        if _inventory is None:
+            paths = os.getenv("FLIGHT_INVENTORY_PATH", DEFAULT_INVENTORY_PATH)
+            _inventory = FlightInventory()
+            for path in filter(None, (p.strip() for p in paths.split(","))):
+                try:
+                    _inventory.load(path)
+                except (OSError, ValueError, KeyError) as e:
+                    logger.error("Error loading flight inventory from %s", path)
+                    logger.error(e)
+        return _inventory
@@ -13,8 +13,38 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import Optional, Tuple
+
 from langchain.tools import tool
 
+from agents.flights_searcher.inventory import get_inventory
+
+
+def parse_time_window(value: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Parse "HH:MM" (earliest departure) or "HH:MM-HH:MM" (departure window).
+    """
+    if not value or not value.strip():
+        return None, None
+    if "-" in value:
+        earliest, latest = value.split("-", 1)
+        return earliest.strip() or None, latest.strip() or None
+    return value.strip(), None
+
+
+def format_flights(title: str, flights: list) -> str:
+    if not flights:
+        return f"{title}: no flights available."
+    lines = [f"{title}:"]
+    for f in flights:
+        lines.append(
+            f"- {f['airline']} {f['flight_number']} departs {f['departure_city']} {f['departure_time']}, "
+            f"arrives {f['arrival_city']} {f['arrival_time']} ({f['duration']}), "
+            f"{f['fare_type']} {f['price']}, {f['seats_left']} seats left"
+        )
+    return "\n".join(lines)
+
+
 @tool
 def search_flights(
     departure_date: str,
@@ -23,9 +53,29 @@ def search_flights(
     departure_time: str,
     return_date: str,
     return_time: str,
+    passengers: int = 1,
+    max_price: Optional[float] = None,
 ):
     """
     Search for flights based on the provided parameters.
+    Times are "HH:MM" for the earliest departure or "HH:MM-HH:MM" for a departure window, in UTC.
+    Dates are YYYY-MM-DD. Leave return_date empty for a one way search.
     """
+    inventory = get_inventory()
+    try:
+        earliest, latest = parse_time_window(departure_time)
+        outbound = inventory.search(departure_city, arrival_city, departure_date,
+                                    earliest=earliest, latest=latest,
+                                    max_price=max_price, min_seats=passengers)
+        result = format_flights(f"Outbound {departure_city} to {arrival_city} on {departure_date}", outbound)
 
-    return "this is your flight number RK679"
\ No newline at end of file
+        if return_date and return_date.strip():
+            earliest, latest = parse_time_window(return_time)
+            inbound = inventory.search(arrival_city, departure_city, return_date,
+                                       earliest=earliest, latest=latest,
+                                       max_price=max_price, min_seats=passengers)
+            result += "\n" + format_flights(f"Return {arrival_city} to {departure_city} on {return_date}", inbound)
+    except ValueError as e:
+        # A date or time the model got wrong, which it can correct
+        return f"Error: {e}. Dates must be YYYY-MM-DD and times HH:MM or HH:MM-HH:MM."
+    return result
@@ -24,6 +24,10 @@ from dotenv import load_dotenv
 from mq_sdk.mq_trigger.state_listener import StateListener
 from mq_sdk.mq_trigger.models import ReactiveState
 from mq_sdk.mq_agent.MQBaseAssistant import MQBaseAssistant
+from mq_sdk.mq_agent.MQCompactor import MQCompactor
+from mq_sdk.utilities.metrics import metrics
+from mq_sdk.utilities.tracing import tracer
+from agents.primary_agent.tools import get_price_trend, price_history
 import time
 import uuid
 import json
@@ -45,10 +49,12 @@ class FlightInfo(BaseModel):
 class State(TypedDict):
     messages: Annotated[list[AnyMessage], add_messages]    
     flight_info: str
+    # Older turns, folded in by MQCompactor
+    summary: str
 
 class EventAssistant(MQBaseAssistant):    
     messages = []        
-    tools = []
+    tools = [get_price_trend]
     primary_assistant_prompt = ChatPromptTemplate.from_messages(
             [
                 (
@@ -58,6 +64,7 @@ class EventAssistant(MQBaseAssistant):
                         You goal is to help the user to find flights and track the flights prices.                        
                         - If the user ask you to find a new flight, you should delegate the task to the respective agent.
                         - If the user has already some flights under tracking, you will receive the last price of the flight in real time so you can inform the user about the price changes.
+                        - If the user asks how the price of a tracked flight has changed over time, use the price trend tool.
                         \n\n
                         <UserFlightsUnderTracking>
                         {flight_info}
@@ -89,13 +96,16 @@ class EventAssistant(MQBaseAssistant):
             flight_infoJSON = json.loads(msgObject["Object"])            
             # should be better handle with singleton pattern for mutual exclusion
             self.reactive_state["flight_info"] = flight_infoJSON 
+            price_history.record_flight(flight_infoJSON)
         except Exception as e:
             print(f'EventAssistant::on_message::{e}')
              
     def __call__(self, state: State, config: RunnableConfig):
+        state = MQCompactor.with_summary(state)
         while True:                              
             state = {**state, "flight_info": self.reactive_state["flight_info"]}    
-            result = self.runnable.invoke(state, config=config)            
+            with metrics.timer('llm_invoke_seconds', agent='primary_agent'), tracer.span('llm.invoke', agent='primary_agent'):
+                result = self.runnable.invoke(state, config=config)            
             if not result.tool_calls and (
                 not result.content
                 or (isinstance(result.content, list) and not result.content[0].get("text"))
@@ -2,30 +2,35 @@
 # -*- coding: utf-8 -*-
 """
 Graph definition for the Primary Agent.
-Uses Ollama (local mistral) as the LLM backend.
+Uses Ollama (local mistral) as the LLM backend, over its HTTP API.
 """
 
-import subprocess
 import json
+import threading
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, START, END
+from agents.primary_agent.ollama_client import OllamaClient
+from mq_sdk.utilities.metrics import metrics
+from mq_sdk.utilities.tracing import tracer
 
 
 class MyGraph:
-    def __init__(self):
+    def __init__(self, llm: OllamaClient = None):
         self.builder = StateGraph(dict)
+        self.llm = llm or OllamaClient()
 
-    def _ollama_chat_cli(self, prompt: str) -> str:
+    def _ollama_chat(self, prompt: str) -> str:
         """
-        Call Ollama locally via CLI and return the model response.
+        Stream the model response from the Ollama server and return it.
+        Tokens are written to the graph's "custom" stream as they arrive.
         """
+        writer = get_stream_writer()
+        tokens = []
         try:
-            result = subprocess.run(
-                ["ollama", "run", "mistral"],
-                input=prompt.encode("utf-8"),
-                capture_output=True,
-                check=True,
-            )
-            return result.stdout.decode("utf-8").strip()
+            for token in self.llm.stream_chat(prompt):
+                tokens.append(token)
+                writer({"token": token})
+            return "".join(tokens).strip()
         except Exception as e:
             return f"[echo] {prompt} (Ollama error: {e})"
 
@@ -43,13 +48,16 @@ class MyGraph:
         if not user_message:
             return {"messages": ("ai", "[echo] (empty)")}
 
-        response = self._ollama_chat_cli(user_message)
+        with metrics.timer("llm_invoke_seconds", agent="primary_agent"), tracer.span("llm.invoke", agent="primary_agent"):
+            response = self._ollama_chat(user_message)
         return {"messages": ("ai", response)}
 
     def build_graph(self, debug_enabled=False):
         """
         Build and return the compiled graph.
         """
+        # Load the model while the agent starts up
+        threading.Thread(target=self.llm.warm, name="ollama-warm", daemon=True).start()
         self.builder.add_node("assistant", self._assistant_node)
         self.builder.add_edge(START, "assistant")
         self.builder.add_edge("assistant", END)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Client of the Ollama HTTP API for the primary agent.
+
+Requests reuse a small pool of keep-alive connections, and every request asks
+the server to keep the model loaded for keep_alive, so a message pays neither
+a process start nor a model load. Replies are streamed token by token. A request
+that fails before its first token (refused or dropped connection, timeout, 5xx)
+is retried with backoff; one that fails mid-stream is not, as tokens were
+already handed out.
+"""
+
+import http.client
+import json
+import os
+import queue
+import time
+import urllib.parse
+from typing import Dict, Iterator, List, Union
+
+from mq_sdk.utilities.metrics import metrics
+
+DEFAULT_HOST = "http://127.0.0.1:11434"
+
+
+class OllamaError(Exception):
+    pass
+
+
+class OllamaClient:
+    """
+        Chat with model on the Ollama server at host. timeout is the seconds to wait
+        for the connection and for each chunk of a streamed reply.
+    """
+
+    def __init__(self, host: str = None, model: str = None, keep_alive: str = None,
+                 timeout: float = None, retries: int = 2, backoff: float = 0.5, pool_size: int = 4):
+        host = host or os.getenv("OLLAMA_HOST", DEFAULT_HOST)
+        # OLLAMA_HOST is often given as host:port
+        url = urllib.parse.urlsplit(host if "://" in host else f"http://{host}")
+        self.scheme = url.scheme
+        self.netloc = url.netloc
+        self.model = model or os.getenv("OLLAMA_MODEL", "mistral")
+        self.keep_alive = keep_alive or os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+        self.timeout = timeout or float(os.getenv("OLLAMA_TIMEOUT", 120))
+        self.retries = retries
+        self.backoff = backoff
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def chat(self, prompt: Union[str, List[Dict[str, str]]]) -> str:
+        return "".join(self.stream_chat(prompt))
+
+    def stream_chat(self, prompt: Union[str, List[Dict[str, str]]]) -> Iterator[str]:
+        """
+            Yield the reply to prompt, a user message or a list of {"role", "content"}
+            messages, as it is generated.
+        """
+        messages = [{"role": "user", "content": prompt}] if isinstance(prompt, str) else prompt
+        body = {"model": self.model, "messages": messages, "stream": True, "keep_alive": self.keep_alive}
+        start = time.perf_counter()
+        first_token = True
+        for chunk in self._stream("/api/chat", body):
+            token = chunk.get("message", {}).get("content", "")
+            if token:
+                if first_token:
+                    metrics.observe('llm_first_token_seconds', time.perf_counter() - start, agent='primary_agent')
+                    first_token = False
+                yield token
+            if chunk.get("done"):
+                metrics.inc('llm_tokens_total', chunk.get("eval_count", 0), agent='primary_agent')
+
+    def warm(self) -> bool:
+        """Load the model now, rather than on the first message."""
+        try:
+            for _ in self._stream("/api/generate", {"model": self.model, "keep_alive": self.keep_alive}):
+                pass
+            return True
+        except OllamaError as e:
+            print(f'OllamaClient::warm::{e}')
+            return False
+
+    def close(self):
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+    def _stream(self, path: str, body: dict) -> Iterator[dict]:
+        """POST body to path and yield each JSON line of the response."""
+        payload = json.dumps(body).encode("utf-8")
+        for attempt in range(self.retries + 1):
+            connection = self._connection()
+            started = False
+            released = False
+            try:
+                connection.request("POST", path, body=payload, headers={"Content-Type": "application/json"})
+                response = connection.getresponse()
+                if response.status != 200:
+                    error = response.read().decode("utf-8", "replace")
+                    if response.status < 500:
+                        raise OllamaError(f"{response.status} {error}")
+                    raise http.client.HTTPException(f"{response.status} {error}")
+                done = False
+                for line in response:
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if "error" in chunk:
+                        raise OllamaError(chunk["error"])
+                    started = True
+                    done = chunk.get("done", False)
+                    yield chunk
+                if not done:
+                    raise http.client.IncompleteRead(b"", None)
+                self._release(connection)
+                released = True
+                return
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                metrics.inc('llm_errors_total', agent='primary_agent')
+                if started or attempt == self.retries:
+                    raise OllamaError(f"{path} failed: {e}") from e
+                metrics.inc('llm_retries_total', agent='primary_agent')
+                time.sleep(self.backoff * 2 ** attempt)
+            finally:
+                # Failed, or left mid-stream, the connection cannot be reused
+                if not released:
+                    connection.close()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            return cls(self.netloc, timeout=self.timeout)
+
+    def _release(self, connection: http.client.HTTPConnection):
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Price history of the tracked flights, fed by the price publications on the STATE_NETWORK.
+
+Every flight owns one row of two fixed-size ring buffers (timestamps and prices), so memory
+per flight is bounded by the capacity. Queries mask the buffers by time and reduce along
+the rows, answering for one flight or for all of them at once.
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400
+
+
+def flight_key(flight_number: str, departure_time: str = "") -> str:
+    """A flight number is reused every day; the departure date tells the flights apart."""
+    date = str(departure_time)[:10]
+    return f"{flight_number} {date}" if date else str(flight_number)
+
+
+class PriceHistoryStore:
+    """
+        Fixed-size price history per flight.
+    """
+
+    def __init__(self, capacity: int = 512, initial_flights: int = 16):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._slots: Dict[str, int] = {}
+        self._keys: List[str] = []
+        self._ts = np.full((initial_flights, capacity), np.nan)
+        self._price = np.full((initial_flights, capacity), np.nan)
+        self._next = np.zeros(initial_flights, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def flights(self) -> List[str]:
+        with self._lock:
+            return list(self._keys)
+
+    def record(self, key: str, price: float, ts: Optional[float] = None):
+        """Append a price to the flight's ring buffer, overwriting the oldest once full."""
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._add(key)
+            pos = self._next[slot] % self.capacity
+            self._ts[slot, pos] = ts
+            self._price[slot, pos] = float(price)
+            self._next[slot] += 1
+
+    def record_flight(self, flight_info: dict, ts: Optional[float] = None):
+        """Record a FlightInfo publication."""
+        self.record(flight_key(flight_info["flight_number"], flight_info.get("departure_time", "")),
+                    float(flight_info["price"]), ts)
+
+    def stats(self, window_seconds: Optional[float] = None, now: Optional[float] = None,
+              keys: Optional[List[str]] = None) -> Dict[str, dict]:
+        """
+            Min, max and mean price, the first and latest price and the percent change
+            within the window (all history when no window is given), for the given
+            flights or for every flight.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            if keys is None:
+                keys = list(self._keys)
+                slots = np.arange(len(keys))
+            else:
+                keys = [k for k in keys if k in self._slots]
+                slots = np.array([self._slots[k] for k in keys], dtype=np.int64)
+            ts = self._ts[slots]
+            price = self._price[slots]
+        n = len(keys)
+        if n == 0:
+            return {}
+
+        since = -np.inf if window_seconds is None else now - window_seconds
+        in_window = (ts >= since) & (ts <= now)
+        prices = np.where(in_window, price, np.nan)
+        counts = in_window.sum(axis=1)
+        has = counts > 0
+
+        # Order within a row is by time, so the first/latest are the arg-min/max timestamps.
+        first_idx = np.argmin(np.where(in_window, ts, np.inf), axis=1)
+        last_idx = np.argmax(np.where(in_window, ts, -np.inf), axis=1)
+        rows = np.arange(n)
+        first = price[rows, first_idx]
+        latest = price[rows, last_idx]
+        with np.errstate(all="ignore"):
+            low = np.nanmin(np.where(has[:, None], prices, 0.0), axis=1)
+            high = np.nanmax(np.where(has[:, None], prices, 0.0), axis=1)
+            mean = np.nansum(prices, axis=1) / np.maximum(counts, 1)
+            pct_change = np.where(first != 0, (latest - first) / first * 100.0, 0.0)
+
+        result = {}
+        for i in np.flatnonzero(has).tolist():
+            result[keys[i]] = {
+                "samples": int(counts[i]),
+                "min": float(low[i]),
+                "max": float(high[i]),
+                "mean": round(float(mean[i]), 2),
+                "first": float(first[i]),
+                "latest": float(latest[i]),
+                "pct_change": round(float(pct_change[i]), 2),
+                "is_lowest": bool(latest[i] <= low[i]),
+            }
+        return result
+
+    def trend(self, key: str, window_seconds: Optional[float] = None, now: Optional[float] = None) -> Optional[dict]:
+        """Stats of one flight, or None if it has no prices in the window."""
+        return self.stats(window_seconds, now, keys=[key]).get(key)
+
+    def lowest_in_days(self, days: float, now: Optional[float] = None) -> List[str]:
+        """Flights whose latest price is the lowest seen in the last N days."""
+        stats = self.stats(days * SECONDS_PER_DAY, now)
+        return [key for key, s in stats.items() if s["is_lowest"]]
+
+    def find(self, flight_number: str) -> List[str]:
+        """Keys of the tracked flights with this flight number."""
+        flight_number = flight_number.strip().upper()
+        with self._lock:
+            return [k for k in self._keys if k.split(" ")[0].upper() == flight_number]
+
+    def _add(self, key: str) -> int:
+        slot = len(self._keys)
+        if slot == len(self._next):
+            rows = max(1, slot * 2)
+            self._ts = np.vstack((self._ts, np.full((rows - slot, self.capacity), np.nan)))
+            self._price = np.vstack((self._price, np.full((rows - slot, self.capacity), np.nan)))
+            self._next = np.concatenate((self._next, np.zeros(rows - slot, dtype=np.int64)))
+        self._slots[key] = slot
+        self._keys.append(key)
+        return slot
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from langchain.tools import tool
+
+from agents.primary_agent.price_history import PriceHistoryStore, SECONDS_PER_DAY
+
+# Fed by the STATE_NETWORK price publications received by the assistant
+price_history = PriceHistoryStore()
+
+
+@tool
+def get_price_trend(flight_number: str, days: float = 7):
+    """
+    Get the price trend of a tracked flight over the last N days:
+    lowest, highest and average price, the percent change and whether
+    the latest price is the lowest seen in that period.
+    """
+    keys = price_history.find(flight_number)
+    if not keys:
+        return f"No price history for flight {flight_number}."
+    stats = price_history.stats(days * SECONDS_PER_DAY, keys=keys)
+    if not stats:
+        return f"No price changes for flight {flight_number} in the last {days:g} days."
+    lines = []
+    for key, s in stats.items():
+        lines.append(
+            f"{key}: latest {s['latest']:g}, lowest {s['min']:g}, highest {s['max']:g}, "
+            f"average {s['mean']:g} over {s['samples']} updates, {s['pct_change']:+g}% since {s['first']:g}"
+            + (" - lowest price in this period" if s["is_lowest"] else "")
+        )
+    return "\n".join(lines)
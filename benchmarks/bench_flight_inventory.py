@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Benchmark for the flights searcher inventory.
+
+Builds a synthetic inventory and times route/date lookups with a departure window
+and a price cap, the query search_flights issues for each leg. Each query is drawn
+around a random flight of the inventory, so it returns at least that flight.
+
+    python -m benchmarks.bench_flight_inventory --flights 2000000 --queries 20000
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from agents.flights_searcher.inventory import FlightInventory, SECONDS_PER_DAY, to_day
+
+AIRLINES = ["Ryanair", "easyJet", "Jet2", "TAP Air Portugal", "British Airways", "Vueling", "Wizz Air"]
+FIRST_DAY = "2025-05-01"
+
+
+def synthetic_flights(flights: int, cities: int, days: int, seed: int) -> dict:
+    """Columns of flights between cities, departing over days from FIRST_DAY."""
+    rng = np.random.default_rng(seed)
+    city_names = np.array([f"City{i:03d}" for i in range(cities)])
+    origin = rng.integers(0, cities, flights)
+    destination = (origin + rng.integers(1, cities, flights)) % cities
+    departure = (to_day(FIRST_DAY) + rng.integers(0, days, flights)) * SECONDS_PER_DAY \
+        + rng.integers(0, SECONDS_PER_DAY, flights)
+    return dict(
+        airline=np.array(AIRLINES)[rng.integers(0, len(AIRLINES), flights)],
+        flight_number=[f"XX{i}" for i in range(flights)],
+        departure_city=city_names[origin],
+        arrival_city=city_names[destination],
+        departure=departure,
+        arrival=departure + rng.integers(3600, 6 * 3600, flights),
+        price=rng.uniform(20, 400, flights).round(2),
+        seats=rng.integers(0, 180, flights),
+        fare_type=np.full(flights, "Economy"),
+    )
+
+
+def build(columns: dict) -> FlightInventory:
+    inventory = FlightInventory(capacity=len(columns["departure"]))
+    inventory.extend_columns(**columns)
+    return inventory
+
+
+def sample_queries(columns: dict, queries: int, seed: int) -> list:
+    """
+        Queries on the route and date of random flights with two seats or more, with a
+        window around the flight's departure hour and a price cap above its price.
+    """
+    rng = np.random.default_rng(seed)
+    candidates = np.flatnonzero(columns["seats"] >= 2)
+    result = []
+    for row in rng.choice(candidates, queries).tolist():
+        departure = int(columns["departure"][row])
+        hour = departure % SECONDS_PER_DAY // 3600
+        earliest, latest = max(hour - int(rng.integers(0, 3)), 0), min(hour + int(rng.integers(1, 4)), 23)
+        result.append((str(columns["departure_city"][row]), str(columns["arrival_city"][row]),
+                       str(np.datetime64(departure // SECONDS_PER_DAY, "D")),
+                       f"{earliest:02d}:00", f"{latest:02d}:59",
+                       float(columns["price"][row]) * float(rng.uniform(1.0, 1.5))))
+    return result
+
+
+def run(args) -> dict:
+    columns = synthetic_flights(args.flights, args.cities, args.days, args.seed)
+    started = time.perf_counter()
+    inventory = build(columns)
+    build_seconds = time.perf_counter() - started
+    queries = sample_queries(columns, args.queries, args.seed + 1)
+
+    latencies = np.empty(len(queries))
+    results = 0
+    for i, (origin, destination, date, earliest, latest, max_price) in enumerate(queries):
+        t0 = time.perf_counter()
+        found = inventory.search(origin, destination, date, earliest=earliest, latest=latest,
+                                 max_price=max_price, min_seats=2)
+        latencies[i] = time.perf_counter() - t0
+        results += len(found)
+
+    latencies_us = latencies * 1e6
+    return {
+        "benchmark": "flight_inventory_search",
+        "flights": args.flights,
+        "routes": args.cities * (args.cities - 1),
+        "days": args.days,
+        "queries": args.queries,
+        "build_seconds": round(build_seconds, 3),
+        "mean_results": round(results / max(args.queries, 1), 2),
+        "latency_us": {
+            "p50": round(float(np.percentile(latencies_us, 50)), 1),
+            "p95": round(float(np.percentile(latencies_us, 95)), 1),
+            "p99": round(float(np.percentile(latencies_us, 99)), 1),
+            "max": round(float(latencies_us.max()), 1),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--flights", type=int, default=1_000_000)
+    parser.add_argument("--cities", type=int, default=60)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--queries", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    result = run(args)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+End to end request/reply benchmark.
+
+Drives MQRequest.put_and_wait_response against MessageListener responders with
+a stub handler that echoes the message back, for each payload size and
+concurrency level, and reports throughput and round trip latency percentiles.
+
+    python -m benchmarks.bench_request_reply --transport loopback
+    python -m benchmarks.bench_request_reply --transport mq --ccdt-path benchmarks/ \
+        --payload-sizes 64,4096 --concurrency 1,8 --requests 500 --output results.json
+
+The loopback transport runs everything in process on the in-memory broker of
+mq_sdk.utilities.loopback and measures the SDK overhead. The mq transport needs an env.json in --ccdt-path with
+INBOUND_NETWORK and OUTBOUND_NETWORK sections pointing at the same request queue.
+
+--mode call connects, opens the queues and disconnects for every request, as
+the contact_external_agent tool does. --mode warm opens them once per client.
+Pass --baseline with an earlier --output file to print the change per case.
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+LOOPBACK_ENDPOINT = {
+    "HOST": "127.0.0.1",
+    "PORT": "1414",
+    "CHANNEL": "DEV.APP.SVRCONN",
+    "QMGR": "QM1",
+    "APP_USER": "app",
+    "APP_PASSWORD": "passw0rd",
+    "QUEUE_NAME": "BENCH.REQUEST",
+    "MODEL_QUEUE_NAME": "SYSTEM.DEFAULT.MODEL.QUEUE",
+    "DYNAMIC_QUEUE_PREFIX": "BENCH.REPLY.*",
+    "BACKOUT_QUEUE": "BENCH.BACKOUT",
+}
+
+
+def loopback_ccdt_path() -> str:
+    path = tempfile.mkdtemp(prefix="bench_request_reply_")
+    network = {"MQ_ENDPOINTS": [LOOPBACK_ENDPOINT]}
+    with open(os.path.join(path, "env.json"), "w") as f:
+        json.dump({"INBOUND_NETWORK": network, "OUTBOUND_NETWORK": network}, f)
+    return path
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_responders(ccdt_path: str, count: int):
+    from mq_sdk.mq_trigger.message_listener_thread import MessageListenerThread
+
+    responders = []
+    for _ in range(count):
+        holder = {}
+
+        def on_message(msg, holder=holder):
+            holder["listener"].send_reply(msg.mqmd, msg.message)
+
+        # Daemon threads, an idle responder only returns from its get loop on a message
+        holder["listener"] = MessageListenerThread(ccdt_path, on_message)
+        holder["listener"].daemon = True
+        holder["listener"].start()
+        responders.append(holder["listener"])
+    return responders
+
+
+def close_request(req):
+    for queue in (req.dynamic["queue"], req.queue):
+        if queue is not None:
+            queue.close()
+    if req.qmgr is not None:
+        req.qmgr.disconnect()
+
+
+class Client(threading.Thread):
+    def __init__(self, ccdt_path: str, mode: str, body: str, requests: int, barrier: threading.Barrier):
+        super().__init__(daemon=True)
+        self.ccdt_path = ccdt_path
+        self.mode = mode
+        self.body = body
+        self.requests = requests
+        self.barrier = barrier
+        self.latencies = []
+        self.errors = 0
+
+    def run(self):
+        from mq_sdk.mq_agent.MQRequest import MQRequest
+
+        req = None
+        if self.mode == "warm":
+            req = MQRequest(ccdt_path=self.ccdt_path)
+            req.perform_connection()
+            req.queue = req.get_queue()
+            req.dynamic["queue"], req.dynamic["name"] = req.get_dynamic_queue()
+        self.barrier.wait()
+
+        for _ in range(self.requests):
+            started = time.perf_counter()
+            try:
+                if self.mode == "warm":
+                    msgid, correlid = req.putMessage(self.body)
+                    reply = req.awaitResponse(msgid, correlid)
+                else:
+                    call = MQRequest(ccdt_path=self.ccdt_path)
+                    call.perform_connection()
+                    reply = call.put_and_wait_response(self.body)
+                if reply is None:
+                    self.errors += 1
+                    continue
+            except Exception:
+                self.errors += 1
+                continue
+            self.latencies.append(time.perf_counter() - started)
+
+        if req is not None:
+            close_request(req)
+
+
+def run_case(ccdt_path: str, mode: str, payload_bytes: int, concurrency: int, requests: int, warmup: int) -> dict:
+    from mq_sdk.utilities.types import Message
+
+    body = Message(message="x" * payload_bytes, thread_id="bench").model_dump_json()
+    if warmup:
+        warm = Client(ccdt_path, mode, body, warmup, threading.Barrier(1))
+        warm.run()
+
+    per_client = max(1, requests // concurrency)
+    barrier = threading.Barrier(concurrency + 1)
+    clients = [Client(ccdt_path, mode, body, per_client, barrier) for _ in range(concurrency)]
+    for client in clients:
+        client.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for client in clients:
+        client.join()
+    seconds = time.perf_counter() - started
+
+    latencies_ms = np.array([l for c in clients for l in c.latencies]) * 1e3
+    completed = len(latencies_ms)
+    result = {
+        "payload_bytes": payload_bytes,
+        "concurrency": concurrency,
+        "requests": completed,
+        "errors": sum(c.errors for c in clients),
+        "seconds": round(seconds, 3),
+        "throughput_rps": round(completed / seconds, 1) if seconds else None,
+        "latency_ms": None,
+    }
+    if completed:
+        result["latency_ms"] = {
+            "p50": round(float(np.percentile(latencies_ms, 50)), 3),
+            "p95": round(float(np.percentile(latencies_ms, 95)), 3),
+            "p99": round(float(np.percentile(latencies_ms, 99)), 3),
+            "max": round(float(latencies_ms.max()), 3),
+        }
+    return result
+
+
+def compare(result: dict, baseline: dict) -> list:
+    previous = {(r["payload_bytes"], r["concurrency"]): r for r in baseline.get("results", [])}
+    lines = []
+    for case in result["results"]:
+        before = previous.get((case["payload_bytes"], case["concurrency"]))
+        if not before or not before.get("latency_ms") or not case["latency_ms"]:
+            continue
+        p99 = (case["latency_ms"]["p99"] / before["latency_ms"]["p99"] - 1) * 100
+        rps = (case["throughput_rps"] / before["throughput_rps"] - 1) * 100
+        lines.append(f'{case["payload_bytes"]:>8}B x{case["concurrency"]:<3} '
+                     f'p99 {before["latency_ms"]["p99"]:.3f} -> {case["latency_ms"]["p99"]:.3f} ms ({p99:+.1f}%)  '
+                     f'throughput {before["throughput_rps"]} -> {case["throughput_rps"]} rps ({rps:+.1f}%)')
+    return lines
+
+
+def run(args) -> dict:
+    # Selects the transport before the SDK is imported
+    os.environ["MQ_TRANSPORT"] = args.transport
+    if args.transport == "loopback":
+        ccdt_path = loopback_ccdt_path()
+    else:
+        if not args.ccdt_path:
+            raise SystemExit("--ccdt-path is required with --transport mq")
+        ccdt_path = args.ccdt_path
+
+    responders = start_responders(ccdt_path, args.responders)
+    # The SDK logs every message at INFO
+    logging.disable(logging.INFO)
+    try:
+        results = []
+        for payload_bytes in args.payload_sizes:
+            for concurrency in args.concurrency:
+                results.append(run_case(ccdt_path, args.mode, payload_bytes, concurrency,
+                                        args.requests, args.warmup))
+                print(json.dumps(results[-1]), file=sys.stderr)
+    finally:
+        for responder in responders:
+            responder.stop()
+
+    return {
+        "benchmark": "request_reply",
+        "transport": args.transport,
+        "mode": args.mode,
+        "responders": args.responders,
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+
+def sizes(value: str):
+    return [int(v) for v in value.split(",") if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transport", choices=["loopback", "mq"], default="loopback")
+    parser.add_argument("--ccdt-path", help="directory holding env.json for --transport mq")
+    parser.add_argument("--mode", choices=["call", "warm"], default="call")
+    parser.add_argument("--payload-sizes", type=sizes, default=[64, 1024, 16384])
+    parser.add_argument("--concurrency", type=sizes, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=1000, help="requests per case")
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--responders", type=int, default=1)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="earlier --output file to compare against")
+    args = parser.parse_args(argv)
+
+    # The SDK prints progress to stdout, keep it for the results
+    with contextlib.redirect_stdout(sys.stderr):
+        result = run(args)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            for line in compare(result, json.load(f)):
+                print(line, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
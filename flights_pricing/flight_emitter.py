@@ -15,21 +15,36 @@
 
 import json
 import datetime
-import pymqi
+from collections import OrderedDict
+from mq_sdk.utilities.transport import pymqi
 
 import logging
 
+from mq_sdk.utilities.async_put import AsyncPutter, connection_lost
 from mq_sdk.utilities.env import EnvStore
 from mq_sdk.utilities.constants import NETWORK_TYPE
+from mq_sdk.utilities.properties import put_options_with_properties
+from mq_sdk.utilities.qos import policy_for, STATE_UPDATE
+from mq_sdk.utilities.tracing import tracer
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
 class FlightEmitter:    
+    """
+      Publishes price changes on the state topic. By default each publication connects,
+      publishes and waits for the put to complete. With asynchronous=True the connection
+      and topics stay open and publications are pipelined with asynchronous puts (see
+      AsyncPutter), committed every flush_every publications or flush_interval seconds,
+      and on flush(). Failed publications are passed to on_failure(messages, error).
+      A publication after the connection was lost closes it and connects again.
+    """
     MQDetails = {}
     credentials = {}
+    # Topics kept open in asynchronous mode, least recently used are closed first
+    MAX_OPEN_TOPICS = 256
 
-    def __init__(self, envstore_path):
+    def __init__(self, envstore_path, asynchronous=False, flush_every=100, flush_interval=1.0, on_failure=None):
         self.envStore = EnvStore(
             envstore_path,
             network_type=NETWORK_TYPE.STATE_NETWORK
@@ -41,6 +56,16 @@ class FlightEmitter:
             self.envStore.PASSWORD: self.envStore.getEnvValue(self.envStore.APP_PASSWORD)
         }
 
+        self.asynchronous = asynchronous
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.on_failure = on_failure
+        self.qmgr = None
+        self.topics = OrderedDict()
+        self.putter = None
+        self.broken = False
+        self.qos = policy_for(STATE_UPDATE, self.envStore)
+
 
     def connect(self):
         logger.info('Establising Connection with MQ Server')
@@ -79,10 +104,50 @@ class FlightEmitter:
             return None
 
     
-    def getTopic(self,qmgr):
+    @staticmethod
+    def topicLevel(value) -> str:
+        # '/' separates levels and '#', '+' are wildcards, so none can appear within a level
+        level = str(value).strip()
+        for c in '/#+':
+            level = level.replace(c, '_')
+        return level or '_'
+
+    def topicString(self, object=None) -> str:
+        """
+            <TOPIC_NAME>/<origin>/<destination>/<flight_number> for a FlightInfo,
+            so subscribers can filter by route or flight with wildcards.
+        """
+        root = self.MQDetails[self.envStore.TOPIC_NAME].decode().rstrip('/')
+        try:
+            flight = json.loads(object) if isinstance(object, (str, bytes)) else dict(object or {})
+            levels = [flight['departure_city'], flight['arrival_city'], flight['flight_number']]
+        except (ValueError, TypeError, KeyError):
+            return root
+        return '/'.join([root] + [self.topicLevel(level) for level in levels])
+
+    @staticmethod
+    def flightProperties(object=None, pct_change=None) -> dict:
+        """
+            Typed message properties of a price publication. Subscribers can select on
+            them, e.g. "pct_change > 5 AND route = 'Newcastle-Faro'".
+        """
+        try:
+            flight = json.loads(object) if isinstance(object, (str, bytes)) else dict(object or {})
+            return {
+                'flight_number': flight['flight_number'],
+                'route': f"{flight['departure_city']}-{flight['arrival_city']}",
+                'price': float(flight['price']),
+                'seats_left': int(flight['seats_left']),
+                'pct_change': None if pct_change is None else float(pct_change),
+            }
+        except (ValueError, TypeError, KeyError):
+            return {}
+
+    def getTopic(self,qmgr, topic_string=None):
         logger.info('Connecting to Topic')
         try:
-            t = pymqi.Topic(qmgr, topic_string=self.MQDetails[self.envStore.TOPIC_NAME])
+            topic_string = topic_string or self.MQDetails[self.envStore.TOPIC_NAME]
+            t = pymqi.Topic(qmgr, topic_string=topic_string)
             t.open(open_opts=pymqi.CMQC.MQOO_OUTPUT)
             return t
         except pymqi.MQMIError as e:
@@ -91,7 +156,7 @@ class FlightEmitter:
             return None
 
 
-    def publishMessage(self, object=None):
+    def publishMessage(self, object=None, pct_change=None):
         self.buildMQDetails()
 
         logger.info('Credentials are set')                        
@@ -101,20 +166,29 @@ class FlightEmitter:
                 'Object': object
         }
 
+        if self.asynchronous:
+            return self.publishAsync(msgObjectJson, object, pct_change)
+
         qmgr = None
         topic = None
 
         qmgr = self.connect()
         if (qmgr):
-            topic = self.getTopic(qmgr)            
+            topic_string = self.topicString(object)
+            topic = self.getTopic(qmgr, topic_string)            
             if (topic):
                 logger.info("Application is closing")
             logger.info('Attempting publish to Topic')
             try:
                 md = pymqi.MD()
                 md.Format = pymqi.CMQC.MQFMT_STRING                
-                topic.pub(self.envStore.stringForVersion(json.dumps(msgObjectJson)), md)
-                logger.info("Publish message successful")
+                with tracer.span("mq.publish", topic=topic_string):
+                    properties = {**self.flightProperties(object, pct_change), **tracer.inject()}
+                    pmo = put_options_with_properties(qmgr, properties, self.qos.apply(md))
+                    topic.pub(self.envStore.stringForVersion(json.dumps(msgObjectJson)), md, pmo)
+                    if self.qos.syncpoint:
+                        qmgr.commit()
+                logger.info("Publish message successful on %s" % topic_string)
             except pymqi.MQMIError as e:
                 logger.error("Error in publish to topic")
                 logger.error(e)
@@ -124,6 +198,96 @@ class FlightEmitter:
         if (qmgr):
             qmgr.disconnect()
 
+
+    def publishAsync(self, msgObjectJson, object=None, pct_change=None):
+        if self.broken:
+            logger.info('Connection lost, reconnecting')
+            self.close()
+        if self.qmgr is None:
+            self.qmgr = self.connect()
+            if self.qmgr is None:
+                return False
+            self.putter = AsyncPutter(self.qmgr,
+                                      flush_every=self.flush_every,
+                                      flush_interval=self.flush_interval,
+                                      on_failure=self.failed,
+                                      component='emitter')
+
+        topic_string = self.topicString(object)
+        md = pymqi.MD()
+        md.Format = pymqi.CMQC.MQFMT_STRING
+        # Every call on the connection is kept clear of the putter's flush thread
+        with tracer.span("mq.publish", topic=topic_string), self.putter.locked():
+            topic = self.openTopic(topic_string)
+            if topic is None:
+                return False
+            try:
+                properties = {**self.flightProperties(object, pct_change), **tracer.inject()}
+                pmo = put_options_with_properties(self.qmgr, properties, self.qos.apply(md))
+            except pymqi.MQMIError as e:
+                logger.error("Error in publish to topic")
+                logger.error(e)
+                self.broken = connection_lost(e)
+                return False
+            return self.putter.put(topic, self.envStore.stringForVersion(json.dumps(msgObjectJson)), md, pmo)
+
+    def failed(self, messages, error):
+        # Called by the putter, possibly from its flush thread, so the connection
+        # is only replaced by the next publication
+        if connection_lost(error):
+            self.broken = True
+        if self.on_failure is not None:
+            self.on_failure(messages, error)
+
+    def openTopic(self, topic_string):
+        # Called holding the putter's lock
+        topic = self.topics.pop(topic_string, None)
+        if topic is None:
+            try:
+                topic = pymqi.Topic(self.qmgr, topic_string=topic_string)
+                topic.open(open_opts=pymqi.CMQC.MQOO_OUTPUT)
+            except pymqi.MQMIError as e:
+                logger.error("Error getting topic")
+                logger.error(e)
+                self.broken = connection_lost(e)
+                return None
+        self.topics[topic_string] = topic
+        if len(self.topics) > self.MAX_OPEN_TOPICS:
+            _, oldest = self.topics.popitem(last=False)
+            try:
+                oldest.close()
+            except pymqi.MQMIError as e:
+                logger.error("Error closing topic")
+                logger.error(e)
+        return topic
+
+    def flush(self):
+        """
+            Commit the asynchronous publications made so far. Returns False if any failed.
+        """
+        if self.putter is None:
+            return True
+        return self.putter.flush()
+
+    def close(self):
+        if self.putter is not None:
+            self.putter.close()
+        for topic in self.topics.values():
+            try:
+                topic.close()
+            except pymqi.MQMIError as e:
+                logger.error("Error closing topic")
+                logger.error(e)
+        self.topics.clear()
+        if self.qmgr:
+            try:
+                self.qmgr.disconnect()
+            except pymqi.MQMIError as e:
+                logger.error("Error disconnecting")
+                logger.error(e)
+        self.qmgr = None
+        self.putter = None
+        self.broken = False
         
     def buildMQDetails(self):
         for key in [self.envStore.QMGR, self.envStore.CHANNEL, self.envStore.HOST,
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from pydantic import BaseModel, ConfigDict
+
+from flights_pricing.flight_reader import FlightInfo
+
+
+class StringPool:
+    """
+        Interns strings as int32 codes. Snapshots built on the same pool share codes,
+        so their string columns and flight keys can be compared as integers.
+    """
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.strings)
+            self.strings.append(value)
+            self.codes[value] = code
+        return code
+
+    def encode(self, values) -> np.ndarray:
+        values = np.asarray(values, dtype=str)
+        if len(values) == 0:
+            return np.empty(0, dtype=np.int32)
+        unique, inverse = np.unique(values, return_inverse=True)
+        codes = np.fromiter((self.intern(v) for v in unique.tolist()), dtype=np.int32, count=len(unique))
+        return codes[inverse.reshape(-1)]
+
+    def decode(self, code: int) -> str:
+        return self.strings[code]
+
+
+class SnapshotDiff(BaseModel):
+    """
+        Rows of the current snapshot whose price or seats changed, rows that are new,
+        and rows of the previous snapshot that are gone.
+    """
+    changed: np.ndarray
+    added: np.ndarray
+    removed: np.ndarray
+    previous_price: np.ndarray
+    pct_change: np.ndarray
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    def __len__(self) -> int:
+        return len(self.changed) + len(self.added)
+
+    def published_rows(self) -> np.ndarray:
+        """Rows of the current snapshot that subscribers need to hear about."""
+        return np.concatenate((self.changed, self.added))
+
+
+class FlightSnapshot:
+    """
+        Column-wise view of the flights read in one pricing cycle.
+
+        Price and seats are numeric columns; every string field is an interned code.
+        A flight is keyed by its flight number and departure time.
+    """
+    STRING_FIELDS = ("airline", "departure_time", "departure_city", "flight_number", "duration",
+                     "arrival_time", "arrival_city", "fare_type")
+
+    def __init__(self, pool: StringPool, key: np.ndarray, price: np.ndarray, seats: np.ndarray,
+                 strings: Dict[str, np.ndarray]):
+        self.pool = pool
+        self.key = key
+        self.price = price
+        self.seats = seats
+        self.strings = strings
+        self._index: Optional[Dict[int, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.key)
+
+    @classmethod
+    def empty(cls, pool: StringPool) -> "FlightSnapshot":
+        return cls.from_columns(pool, price=[], seats_left=[], **{f: [] for f in cls.STRING_FIELDS})
+
+    @classmethod
+    def from_columns(cls, pool: StringPool, price, seats_left, **columns) -> "FlightSnapshot":
+        strings = {field: pool.encode(columns[field]) for field in cls.STRING_FIELDS}
+        flight_number = np.asarray(columns["flight_number"], dtype=str)
+        departure_time = np.asarray(columns["departure_time"], dtype=str)
+        key = pool.encode(np.char.add(np.char.add(flight_number, "@"), departure_time))
+        return cls(pool,
+                   key=key,
+                   price=np.asarray(price, dtype=np.float64),
+                   seats=np.asarray(seats_left, dtype=np.int32),
+                   strings=strings)
+
+    @classmethod
+    def from_flights(cls, pool: StringPool, flights: Iterable[FlightInfo]) -> "FlightSnapshot":
+        flights = list(flights)
+        columns = {field: [getattr(f, field) for f in flights] for field in cls.STRING_FIELDS}
+        return cls.from_columns(pool,
+                                price=[float(f.price) for f in flights],
+                                seats_left=[int(f.seats_left) for f in flights],
+                                **columns)
+
+    @property
+    def index(self) -> Dict[int, int]:
+        """Flight key code -> row."""
+        if self._index is None:
+            self._index = dict(zip(self.key.tolist(), range(len(self.key))))
+        return self._index
+
+    def row_of(self, flight_number: str, departure_time: str) -> Optional[int]:
+        code = self.pool.codes.get(f"{flight_number}@{departure_time}")
+        return None if code is None else self.index.get(code)
+
+    def flight_info(self, row: int) -> FlightInfo:
+        fields = {field: self.pool.decode(int(self.strings[field][row])) for field in self.STRING_FIELDS}
+        return FlightInfo(price=f"{self.price[row]:g}", seats_left=str(int(self.seats[row])), **fields)
+
+    def diff(self, previous: "FlightSnapshot") -> SnapshotDiff:
+        """
+            Compare with the snapshot of the previous cycle. Both must share a StringPool.
+        """
+        if previous.pool is not self.pool:
+            raise ValueError("Snapshots must share a StringPool to be compared")
+
+        if np.array_equal(previous.key, self.key):
+            rows = np.arange(len(self.key))
+            previous_rows = rows
+            added = np.empty(0, dtype=np.int64)
+            removed = np.empty(0, dtype=np.int64)
+        else:
+            _, rows, previous_rows = np.intersect1d(self.key, previous.key, assume_unique=True,
+                                                    return_indices=True)
+            added = np.flatnonzero(~np.isin(self.key, previous.key, assume_unique=True))
+            removed = np.flatnonzero(~np.isin(previous.key, self.key, assume_unique=True))
+
+        previous_price = previous.price[previous_rows]
+        changed = (self.price[rows] != previous_price) | (self.seats[rows] != previous.seats[previous_rows])
+        rows, previous_price = rows[changed], previous_price[changed]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct_change = np.where(previous_price != 0,
+                                  (self.price[rows] - previous_price) / previous_price * 100.0, 0.0)
+        return SnapshotDiff(changed=rows, added=added, removed=removed,
+                            previous_price=previous_price, pct_change=pct_change)
@@ -22,7 +22,7 @@ from mq_sdk.utilities.env import EnvStore
 from mq_sdk.utilities.types import MQAgentInfo
 from .MQPromptTemplate import MQPromptTemplate
 from mq_sdk.utilities.constants import NETWORK_TYPE
-from .MQTools import ContactExternalAgentTool
+from .MQTools import ContactExternalAgentTool, ContactExternalAgentsTool
 
 
 class MQBaseAssistant:
@@ -37,4 +37,7 @@ class MQBaseAssistant:
 
     def bind_tools(self, llm: BaseChatModel, tools: list):
         tools.append(ContactExternalAgentTool())
+        # Several agents in the network can be asked at once
+        if len(self.env_store.get_agents_info()) > 1:
+            tools.append(ContactExternalAgentsTool())
         return llm.bind_tools(tools)
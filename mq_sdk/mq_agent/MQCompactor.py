@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+from typing import List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AnyMessage, HumanMessage, RemoveMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately, get_buffer_string
+
+from mq_sdk.utilities.metrics import metrics
+from mq_sdk.utilities.tracing import tracer
+
+
+class MQCompactor:
+    """
+        Graph node keeping the conversation of a thread bounded. The last keep_turns
+        turns, each starting at a human message, stay verbatim. Older ones are removed
+        from the state and folded into its rolling summary, kept under summary_tokens.
+        A turn is never split, so a tool call stays with its ToolMessage.
+
+        Compaction waits until slack_turns more turns than keep_turns have built up,
+        then folds all of them at once, so a thread pays for a summary every
+        slack_turns turns rather than on every turn past keep_turns.
+
+        The summary is written by llm if given, otherwise it keeps the latest lines of
+        the folded messages that fit the budget.
+    """
+
+    SUMMARY_PROMPT = (
+        "Extend the summary of the earlier conversation with the new messages below. "
+        "Keep names, cities, dates, flight numbers, prices and decisions. "
+        "Answer with the summary only, in at most {budget} tokens.\n\n"
+        "Summary so far:\n{summary}\n\nNew messages:\n{messages}"
+    )
+
+    def __init__(self, keep_turns: int = 4, summary_tokens: int = 500,
+                 llm: BaseChatModel = None, agent: str = None, slack_turns: int = 4):
+        self.keep_turns = keep_turns
+        self.slack_turns = max(slack_turns, 0)
+        self.summary_tokens = summary_tokens
+        self.llm = llm
+        self.agent = agent
+
+    @classmethod
+    def from_env(cls, llm: BaseChatModel = None, agent: str = None) -> "MQCompactor":
+        """Tuned by COMPACT_KEEP_TURNS, COMPACT_SLACK_TURNS and COMPACT_SUMMARY_TOKENS if set."""
+        return cls(
+            keep_turns=int(os.getenv("COMPACT_KEEP_TURNS", 4)),
+            summary_tokens=int(os.getenv("COMPACT_SUMMARY_TOKENS", 500)),
+            llm=llm,
+            agent=agent,
+            slack_turns=int(os.getenv("COMPACT_SLACK_TURNS", 4))
+        )
+
+    def __call__(self, state: dict) -> dict:
+        messages = state.get("messages") or []
+        cut = self.cut_index(messages)
+        if cut == 0:
+            return {}
+        folded, kept = messages[:cut], messages[cut:]
+        summary = state.get("summary") or ""
+        with metrics.timer('llm_compaction_seconds', agent=self.agent), tracer.span('llm.compact', agent=self.agent):
+            new_summary = self.summarize(summary, folded)
+
+        before = count_tokens_approximately(messages) + self.count(summary)
+        after = count_tokens_approximately(kept) + self.count(new_summary)
+        metrics.inc('llm_compactions_total', agent=self.agent)
+        metrics.inc('llm_compacted_messages_total', len(folded), agent=self.agent)
+        metrics.observe('llm_prompt_tokens_saved', max(before - after, 0), agent=self.agent)
+        return {
+            "messages": [RemoveMessage(id=message.id) for message in folded],
+            "summary": new_summary
+        }
+
+    def cut_index(self, messages: List[AnyMessage]) -> int:
+        """
+            Index of the first message kept verbatim, 0 until the thread has more than
+            keep_turns + slack_turns turns.
+        """
+        turns = [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+        if len(turns) <= self.keep_turns + self.slack_turns:
+            return 0
+        return turns[-self.keep_turns] if self.keep_turns > 0 else len(messages)
+
+    def summarize(self, summary: str, folded: List[AnyMessage]) -> str:
+        transcript = get_buffer_string(folded)
+        if self.llm is not None:
+            prompt = self.SUMMARY_PROMPT.format(budget=self.summary_tokens, summary=summary or "(none)",
+                                                messages=transcript)
+            try:
+                # Time the turn waits for the summary, apart from the tokens it saves
+                with metrics.timer('llm_summary_seconds', agent=self.agent):
+                    summary = self.llm.invoke(prompt).content
+                return self.trim(summary if isinstance(summary, str) else str(summary))
+            except Exception as e:
+                print(f'MQCompactor::summarize::{e}')
+        return self.trim("\n".join(line for line in (summary, transcript) if line))
+
+    def trim(self, summary: str) -> str:
+        """Drop the oldest lines of summary until it fits summary_tokens."""
+        lines = summary.splitlines()
+        # Keep the newest lines whose characters fit the budget, about 4 characters a token,
+        # then drop the few more the per-message overhead of count() may still need
+        budget, size, start = self.summary_tokens * 4, -1, len(lines)
+        while start > 0 and size + len(lines[start - 1]) + 1 <= budget:
+            start -= 1
+            size += len(lines[start]) + 1
+        lines = lines[max(min(start, len(lines) - 1), 0):]
+        while len(lines) > 1 and self.count("\n".join(lines)) > self.summary_tokens:
+            lines.pop(0)
+        summary = "\n".join(lines)
+        if self.count(summary) > self.summary_tokens:
+            # A single line over the budget keeps its end, about 4 characters a token
+            summary = summary[-self.summary_tokens * 4:]
+        return summary
+
+    @staticmethod
+    def count(text: str) -> int:
+        return count_tokens_approximately([SystemMessage(content=text)]) if text else 0
+
+    @staticmethod
+    def with_summary(state: dict) -> dict:
+        """The state to prompt with: its summary, if any, ahead of the messages kept."""
+        summary: Optional[str] = state.get("summary")
+        if not summary:
+            return state
+        context = SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")
+        return {**state, "messages": [context] + list(state["messages"])}
@@ -17,18 +17,32 @@ import json
 from mq_sdk.utilities.env import EnvStore
 import json
 import datetime
-import pymqi
+from mq_sdk.utilities.transport import pymqi
 import random
+import threading
+import time
 
 import logging
 from mq_sdk.utilities.constants import NETWORK_TYPE
+from mq_sdk.utilities.metrics import metrics
+from mq_sdk.utilities.properties import put_options_with_properties, get_options_with_properties
+from mq_sdk.utilities.qos import policy_for, REQUEST
+from mq_sdk.utilities.hedge import hedge_policy
+from mq_sdk.utilities.heartbeat import instance_directory
+from mq_sdk.utilities.cancellation import CANCEL_CORREL_ID
+from mq_sdk.utilities.tracing import tracer, since_sent
+from mq_sdk.utilities.wake import Waker, is_wakeup, max_idle
 
 class MQRequest:
 
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
 
+    # Seconds to wait for a reply when the agent sets no REQUEST_TIMEOUT
+    DEFAULT_REQUEST_TIMEOUT = 120.0
+
     def __init__(self, ccdt_path: str):        
+        self.ccdt_path = ccdt_path
         self.envStore = EnvStore(
             ccdt_path=ccdt_path,
             network_type=NETWORK_TYPE.OUTBOUND_NETWORK
@@ -63,42 +77,134 @@ class MQRequest:
 
         self.msgid = None
         self.correlid = None
+        self.qos = policy_for(REQUEST, self.envStore)
+        # Opt-in hedging of slow requests, see mq_sdk.utilities.hedge
+        queue_name = self.MQDetails[self.envStore.QUEUE_NAME]
+        self.hedge = hedge_policy(self.envStore, queue_name.decode() if queue_name else '')
+        self.hedgeQueue = None
+        # MsgId of the request the last reply got answers
+        self.reply_msgid = None
+        # Instance the request was routed to by its heartbeats, and the queue it was put to
+        self.directory = None
+        self.instance = None
+        self.target_queue = queue_name
+        # Wakes awaitResponse on stop(), over a connection of its own
+        self.waker = Waker(self.connect, component='request')
+        self.awaiting = None
+        self._stop_event = threading.Event()
         
 
     def perform_connection(self):
         self.qmgr = self.connect()
     
-    def put_and_wait_response(self, message):
-        if (self.qmgr):
-            self.queue = self.get_queue()
-        
-        if (self.queue):
-            self.dynamic['queue'], self.dynamic['name'] = self.get_dynamic_queue()    
+    def put_and_wait_response(self, message, timeout=None):
+        try:
+            if (self.qmgr):
+                self.queue = self.get_queue(self.route())
+                if self.queue is None and self.instance is not None:
+                    # The instance queue cannot be used, any instance will do
+                    self.target_queue = self.MQDetails[self.envStore.QUEUE_NAME]
+                    self.queue = self.get_queue(self.target_queue)
+
+            if (self.queue):
+                self.dynamic['queue'], self.dynamic['name'] = self.get_dynamic_queue()    
+                self.waker.queue_name = self.dynamic['name']
+
+            if (self.dynamic['queue']):
+                self.logger.info('Checking dynamic Queue Name')
+                self.logger.info(self.dynamic['name'])
+                with tracer.span("mq.request", queue=self.target_queue.decode()):
+                    msgid, correlid = self.putMessage(message)
+                    if msgid:
+                        try:
+                            if self.hedge is not None:
+                                response = self.hedgedResponse(message, msgid, correlid, timeout)
+                            else:
+                                response = self.awaitResponse(msgid, correlid, timeout)
+                        finally:
+                            if self.instance is not None:
+                                self.directory.release(self.instance.instance_id)
+                        if response is None:
+                            # Given up on, the responder need not work on it any longer
+                            self.cancel(correlid)
+                        return response
+        finally:
+            # Whether answered, timed out or failed, nothing is left open
+            self.close()
+
+    def stop(self):
+        """
+            Stop waiting for the reply: awaitResponse returns None after its current get,
+            which a wake-up message on the reply queue ends at once.
+        """
+        self._stop_event.set()
+        correlId = self.awaiting
+        if correlId is not None:
+            self.waker.wake(correlId)
+
+    def close(self):
+        self.awaiting = None
+        self.waker.close()
+        self.waker.queue_name = None
 
         if (self.dynamic['queue']):
-            self.logger.info('Checking dynamic Queue Name')
-            self.logger.info(self.dynamic['name'])
-            msgid, correlid = self.putMessage(message)
-            if msgid:
-                response = self.awaitResponse(msgid, correlid)
-                return response
-                
-            self.dynamic['queue'].close()
-            
-        
+            self.close_queue(self.dynamic['queue'])
+            self.dynamic['queue'] = None
+
         if(self.queue):
-            self.queue.close()
-        
+            self.close_queue(self.queue)
+            self.queue = None
+
+        if(self.hedgeQueue):
+            self.close_queue(self.hedgeQueue)
+            self.hedgeQueue = None
+
         if(self.qmgr):
-            self.qmgr.disconnect()
+            try:
+                self.qmgr.disconnect()
+            except pymqi.MQMIError as e:
+                self.logger.error("Error disconnecting")
+                self.logger.error(e)
+            self.qmgr = None
         
         self.logger.info("Application is closing...")
 
+    def close_queue(self, queue):
+        try:
+            queue.close()
+            metrics.gauge('mq_open_handles', -1, component='request')
+        except pymqi.MQMIError as e:
+            self.logger.error("Error closing queue")
+            self.logger.error(e)
+
     
+    def route(self):
+        """
+            The queue to put the request to: the INSTANCE_QUEUE of the least loaded live
+            instance behind QUEUE_NAME, if the agent has a HEARTBEAT_TOPIC and one is
+            known, otherwise QUEUE_NAME itself.
+        """
+        queue_name = self.MQDetails[self.envStore.QUEUE_NAME]
+        self.directory = instance_directory(self.ccdt_path, self.envStore)
+        self.instance = None
+        if self.directory is not None and queue_name:
+            self.instance = self.directory.choose(queue_name.decode())
+        if self.instance is not None:
+            self.logger.info('Routing to instance ' + self.instance.instance_id)
+            self.target_queue = self.envStore.stringForVersion(self.instance.instance_queue)
+        else:
+            self.target_queue = queue_name
+        return self.target_queue
+
+    def request_timeout(self) -> float:
+        timeout = self.envStore.getEnvValue(self.envStore.REQUEST_TIMEOUT)
+        return float(timeout.decode()) if timeout else self.DEFAULT_REQUEST_TIMEOUT
+
     def buildMQDetails(self):
         for key in [self.envStore.QMGR, self.envStore.QUEUE_NAME, self.envStore.CHANNEL, self.envStore.HOST,
                 self.envStore.PORT, self.envStore.MODEL_QUEUE_NAME, self.envStore.DYNAMIC_QUEUE_PREFIX,
-                self.envStore.KEY_REPOSITORY, self.envStore.CIPHER]:
+                self.envStore.KEY_REPOSITORY, self.envStore.CIPHER, self.envStore.HEDGE_QUEUE,
+                self.envStore.CANCEL_TOPIC]:
             self.MQDetails[key] = self.envStore.getEnvValue(key)
 
     def get_dynamic_queue(self):
@@ -113,7 +219,9 @@ class MQRequest:
 
             # Open the dynamic queue.
             dyn_input_open_options = pymqi.CMQC.MQOO_INPUT_EXCLUSIVE
-            dyn_queue = pymqi.Queue(self.qmgr, dyn_od, dyn_input_open_options)
+            with metrics.timer('mq_open_seconds', component='request'):
+                dyn_queue = pymqi.Queue(self.qmgr, dyn_od, dyn_input_open_options)
+            metrics.gauge('mq_open_handles', 1, component='request')
             self.logger.info("CREATED DYN QUEUE: " + str(dyn_queue))
             dynamicQueueName = dyn_od.ObjectName.strip()
             self.logger.info('Dynamic Queue Details are')
@@ -124,21 +232,24 @@ class MQRequest:
         except pymqi.MQMIError as e:
             self.logger.error("Error getting queue")
             self.logger.error(e)
-            return None
+            return None, None
 
     
-    def get_queue(self):
+    def get_queue(self, queueName=None):
         self.logger.info('Connecting to Queue')
         try:
             # Can do this in one line, but with an Object Descriptor
             # can or in more options.
             # q = pymqi.Queue(qmgr, MQDetails[self.envStore.QUEUE_NAME])
+            queueName = queueName or self.MQDetails[self.envStore.QUEUE_NAME]
             q = pymqi.Queue(self.qmgr)
 
             od = pymqi.OD()
-            od.ObjectName = self.MQDetails[self.envStore.QUEUE_NAME]
-            q.open(od, pymqi.CMQC.MQOO_OUTPUT)
-            self.logger.info('Connected to queue ' + str(self.MQDetails[self.envStore.QUEUE_NAME]))
+            od.ObjectName = queueName
+            with metrics.timer('mq_open_seconds', component='request'):
+                q.open(od, pymqi.CMQC.MQOO_OUTPUT)
+            metrics.gauge('mq_open_handles', 1, component='request')
+            self.logger.info('Connected to queue ' + str(queueName))
             return q
         except pymqi.MQMIError as e:
             self.logger.error("Error getting queue")
@@ -177,18 +288,20 @@ class MQRequest:
 
             qmgr = pymqi.QueueManager(None)
             
-            qmgr.connect_with_options(self.MQDetails[self.envStore.QMGR],
-                                    user=self.credentials[self.envStore.USER],
-                                    password=self.credentials[self.envStore.PASSWORD],
-                                    opts=options, cd=cd, sco=sco)
+            with metrics.timer('mq_connect_seconds', component='request'):
+                qmgr.connect_with_options(self.MQDetails[self.envStore.QMGR],
+                                        user=self.credentials[self.envStore.USER],
+                                        password=self.credentials[self.envStore.PASSWORD],
+                                        opts=options, cd=cd, sco=sco)
             return qmgr
 
         except pymqi.MQMIError as e:
+            metrics.inc('mq_errors_total', component='request', operation='connect')
             self.logger.error("Error connecting")
             self.logger.error(e)
             return None
 
-    def putMessage(self, msgObject):
+    def putMessage(self, msgObject, queue=None, correlId=None):
         self.logger.info('Attempting put to Queue')
         try:
             # queue.put(json.dumps(msgObject).encode())
@@ -202,18 +315,136 @@ class MQRequest:
             md.MsgType = pymqi.CMQC.MQMT_REQUEST
             md.Format = pymqi.CMQC.MQFMT_STRING
 
+            # Carry the trace context with the request
+            pmo = put_options_with_properties(self.qmgr, tracer.inject(), self.qos.apply(md))
+            # A CorrelId of its own, copied to the reply, also identifies the request to cancel it.
+            # Copies of a request share it.
+            if correlId is None:
+                pmo.Options |= pymqi.CMQC.MQPMO_NEW_CORREL_ID
+            else:
+                md.CorrelId = correlId
+
             # Send the message and ReplyToQ destination        
-            self.queue.put(self.envStore.stringForVersion((json.dumps(msgObject))), md)
+            put_start = time.perf_counter()
+            (queue or self.queue).put(self.envStore.stringForVersion((json.dumps(msgObject))), md, pmo)
+            if self.qos.syncpoint:
+                self.qmgr.commit()
+            put_seconds = time.perf_counter() - put_start
+            metrics.observe('mq_put_seconds', put_seconds, component='request')
+            span = tracer.current()
+            if span is not None:
+                span.set('put_seconds', put_seconds)
             
             self.logger.info("Put message successful")
             #logger.info(md.CorrelID)
             return md.MsgId, md.CorrelId
             # return md.CorrelId
         except pymqi.MQMIError as e:
+            metrics.inc('mq_errors_total', component='request', operation='put')
             self.logger.error("Error in put to queue")
             self.logger.error(e)
+            return None, None
+
+    def hedgedResponse(self, message, msgid, correlid, timeout=None):
+        """
+            Wait for the reply until the hedge delay, then send the request again, to
+            HEDGE_QUEUE or to another instance on the same queue, and take the first reply.
+            The losing request is taken back off its queue if no instance has got it yet.
+        """
+        start = time.monotonic()
+        delay = self.hedge.delay() if timeout is None else min(timeout, self.hedge.delay())
+        response = self.awaitResponse(msgid, correlid, timeout=delay)
+        if response is not None:
+            self.hedge.record(time.monotonic() - start)
+            return response
+        # Without a timeout, give up once the slowest hedge delay has passed again
+        remaining = self.hedge.max_delay if timeout is None else timeout - (time.monotonic() - start)
+        if remaining <= 0:
+            return None
 
-    def awaitResponse(self, msgId, correlId):
+        # A request routed to an instance is hedged on the queue every instance consumes
+        hedge_name = self.MQDetails[self.envStore.HEDGE_QUEUE] or self.MQDetails[self.envStore.QUEUE_NAME]
+        if hedge_name != self.target_queue and self.hedgeQueue is None:
+            self.hedgeQueue = self.get_queue(hedge_name)
+            if self.hedgeQueue is None:
+                self.logger.warning('Could not open ' + str(hedge_name) + ', not hedging the request')
+                return self.awaitResponse(msgid, correlid, remaining)
+        self.logger.info('No reply yet, hedging the request on ' + str(hedge_name))
+        span = tracer.current()
+        if span is not None:
+            span.set('hedged', True)
+        hedge_id, _ = self.putMessage(message, self.hedgeQueue, correlid)
+        # Either copy's reply matches the shared CorrelId
+        response = self.awaitResponse(msgid, correlid, remaining)
+        if response is None:
+            return None
+
+        hedge_won = hedge_id is not None and self.reply_msgid == hedge_id
+        withdrawn = False
+        if hedge_id is not None:
+            loser, loser_queue = (msgid, self.target_queue) if hedge_won else (hedge_id, hedge_name)
+            withdrawn = self.withdraw(loser_queue, loser)
+            if not withdrawn:
+                # Stop the instance working on the losing copy
+                self.cancel(correlid)
+        self.hedge.record(time.monotonic() - start, hedged=True, hedge_won=hedge_won, withdrawn=withdrawn)
+        if span is not None:
+            span.set('hedge_won', hedge_won)
+        return response
+
+    def cancel(self, correlId):
+        """
+            Publish the CorrelId of a request given up on to the CANCEL_TOPIC, if the
+            agent has one, so the responder skips it or stops working on it.
+        """
+        topic_string = self.MQDetails[self.envStore.CANCEL_TOPIC]
+        if not topic_string or not correlId or self.qmgr is None:
+            return False
+        try:
+            topic = pymqi.Topic(self.qmgr, topic_string=topic_string)
+            topic.open(open_opts=pymqi.CMQC.MQOO_OUTPUT)
+            try:
+                md = pymqi.MD()
+                md.Format = pymqi.CMQC.MQFMT_STRING
+                md.Persistence = pymqi.CMQC.MQPER_NOT_PERSISTENT
+                topic.pub(self.envStore.stringForVersion(json.dumps({CANCEL_CORREL_ID: correlId.hex()})), md)
+            finally:
+                topic.close()
+            metrics.inc('mq_cancellations_sent_total', component='request')
+            self.logger.info('Cancelled request ' + correlId.hex())
+            return True
+        except pymqi.MQMIError as e:
+            self.logger.error("Error publishing cancellation")
+            self.logger.error(e)
+            return False
+
+    def withdraw(self, queueName, msgId):
+        """
+            Remove a request from its queue if no instance has got it yet.
+        """
+        try:
+            q = pymqi.Queue(self.qmgr)
+            od = pymqi.OD()
+            od.ObjectName = queueName
+            q.open(od, pymqi.CMQC.MQOO_INPUT_SHARED)
+            try:
+                md = pymqi.MD()
+                md.MsgId = msgId
+                gmo = pymqi.GMO()
+                gmo.Options = pymqi.CMQC.MQGMO_NO_WAIT | pymqi.CMQC.MQGMO_NO_SYNCPOINT
+                gmo.MatchOptions = pymqi.CMQC.MQMO_MATCH_MSG_ID
+                q.get(None, md, gmo)
+                return True
+            finally:
+                q.close()
+        except pymqi.MQMIError:
+            # Already got by an instance, its reply will be discarded
+            return False
+
+    def awaitResponse(self, msgId, correlId, timeout=None):
+        """
+            Wait for the reply, up to timeout seconds if given. Returns None if it did not arrive.
+        """
         self.logger.info('Attempting get from Reply Queue')
 
         # Message Descriptor
@@ -226,21 +457,43 @@ class MQRequest:
         gmo.Options = pymqi.CMQC.MQGMO_WAIT | \
                         pymqi.CMQC.MQGMO_FAIL_IF_QUIESCING | \
                         pymqi.CMQC.MQGMO_NO_PROPERTIES
-        gmo.WaitInterval = 5000  # 5 seconds
+        # Gets of up to MQ_REACTOR_MAX_IDLE seconds, so stop() is seen promptly
+        slice_ms = max(1, int(max_idle() * 1000))
+        gmo.WaitInterval = slice_ms
         #gmo.MatchOptions = pymqi.CMQC.MQMO_MATCH_MSG_ID
         gmo.MatchOptions = pymqi.CMQC.MQMO_MATCH_CORREL_ID
         gmo.Version = pymqi.CMQC.MQGMO_VERSION_2
+        # The reply's trace properties tell how long it spent in transit
+        properties = get_options_with_properties(self.qmgr, gmo)
 
         keep_running = True
+        wait_start = time.perf_counter()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.awaiting = correlId
         while keep_running:
             try:
+                if self._stop_event.is_set():
+                    return None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    gmo.WaitInterval = max(1, min(slice_ms, int(remaining * 1000)))
                 # Wait up to to gmo.WaitInterval for a new message.
                 message = self.dynamic['queue'].get(None, md, gmo)
+                if is_wakeup(md):
+                    continue
+                self.reply_msgid = md.MsgId
+                metrics.observe('mq_get_wait_seconds', time.perf_counter() - wait_start, component='request')
+                span = tracer.current()
+                if span is not None:
+                    span.set('reply_transit', since_sent(tracer.extract(properties)))
 
                 # Process the message here..
-                msgObject = json.loads(message.decode())
+                with metrics.timer('mq_decode_seconds', component='request'):
+                    msgObject = json.loads(message.decode())
                 self.logger.info('Have reply message from Queue')
-                self.logger.info(msgObject)
+                self.logger.debug(msgObject)
                 return msgObject
 
                 # Not expecting any more messages
@@ -16,16 +16,26 @@
 import json
 from mq_sdk.utilities.env import EnvStore
 import json
-import pymqi
+from mq_sdk.utilities.transport import pymqi
 import math
+import time
 import logging
 from mq_sdk.utilities.constants import NETWORK_TYPE
+from mq_sdk.utilities.metrics import metrics
+from mq_sdk.utilities.properties import put_options_with_properties, get_options_with_properties, read_property
+from mq_sdk.utilities.qos import policy_for, REPLY, RETRY, BACKOUT
+from mq_sdk.utilities.retry import RetryPolicy, RETRY_ATTEMPT, RETRY_NOT_BEFORE, RETRY_ORIGIN
+from mq_sdk.utilities.tracing import tracer, TRACEPARENT, TRACE_SENT_AT
+from mq_sdk.utilities.wake import Waker, is_wakeup
 
 class MQResponse():
     logging.basicConfig(level=logging.INFO)
     logger = logging.getLogger(__name__)
 
-    def __init__(self, ccdt_path: str):        
+    # Milliseconds getMessages waits in each get before trying again
+    WAIT_INTERVAL = 5000
+
+    def __init__(self, ccdt_path: str, queue_name: bytes = None):        
         self.envStore = EnvStore(
             ccdt_path=ccdt_path,
             network_type=NETWORK_TYPE.INBOUND_NETWORK
@@ -39,6 +49,9 @@ class MQResponse():
         }
 
         self.buildMQDetails()
+        # Requests are got from queue_name instead of QUEUE_NAME if given
+        if queue_name:
+            self.MQDetails[self.envStore.QUEUE_NAME] = queue_name
 
         self.logger.info('Credentials are set')
         #logger.info(credentials)
@@ -48,11 +61,23 @@ class MQResponse():
 
         self.qmgr = None
         self.queue = None
+        # Trace context carried by the last request got, if any
+        self.trace = None
+        # Failed attempts of the last request got, when it was re-delivered from the retry queue
+        self.retry_attempt = 0
+        self.retry_policy = RetryPolicy.from_env(self.envStore)
+        self.retryQueue = None
+        # Persistence, expiry, priority and syncpoint of the messages sent
+        self.qos = {message_class: policy_for(message_class, self.envStore)
+                    for message_class in (REPLY, RETRY, BACKOUT)}
+        # Interrupts a get on the request queue, see wake()
+        self.waker = Waker(self.connect, self.MQDetails[self.envStore.QUEUE_NAME], component='response')
 
     
     def buildMQDetails(self):
         for key in [self.envStore.QMGR, self.envStore.QUEUE_NAME, self.envStore.CHANNEL, self.envStore.HOST,
-                    self.envStore.PORT, self.envStore.KEY_REPOSITORY, self.envStore.CIPHER, self.envStore.BACKOUT_QUEUE]:
+                    self.envStore.PORT, self.envStore.KEY_REPOSITORY, self.envStore.CIPHER, self.envStore.BACKOUT_QUEUE,
+                    self.envStore.RETRY_QUEUE]:
             self.MQDetails[key] = self.envStore.getEnvValue(key)
 
 
@@ -61,7 +86,7 @@ class MQResponse():
 
 
     def perform_get(self):
-        if(self.qmgr):
+        if(self.qmgr and self.queue is None):
             self.queue = self.getQueue(self.MQDetails[self.envStore.QUEUE_NAME], True)    
         
         if(self.queue):
@@ -105,12 +130,14 @@ class MQResponse():
             options = pymqi.CMQC.MQPMO_NEW_CORREL_ID
 
             qmgr = pymqi.QueueManager(None)
-            qmgr.connect_with_options(self.MQDetails[self.envStore.QMGR],
-                                    user=self.credentials[self.envStore.USER],
-                                    password=self.credentials[self.envStore.PASSWORD],
-                                    opts=options, cd=cd, sco=sco)
+            with metrics.timer('mq_connect_seconds', component='response'):
+                qmgr.connect_with_options(self.MQDetails[self.envStore.QMGR],
+                                        user=self.credentials[self.envStore.USER],
+                                        password=self.credentials[self.envStore.PASSWORD],
+                                        opts=options, cd=cd, sco=sco)
             return qmgr
         except pymqi.MQMIError as e:
+            metrics.inc('mq_errors_total', component='response', operation='connect')
             self.logger.error("Error connecting")
             self.logger.error(e)
             return None
@@ -132,78 +159,122 @@ class MQResponse():
                 od.ObjectType = pymqi.CMQC.MQOT_Q
                 odOptions = pymqi.CMQC.MQOO_OUTPUT
 
-            q.open(od, odOptions)
+            with metrics.timer('mq_open_seconds', component='response'):
+                q.open(od, odOptions)
+            metrics.gauge('mq_open_handles', 1, component='response')
             return q
 
         except pymqi.MQMIError as e:
             self.logger.error("Error getting queue")
             self.logger.error(e)
             return None
+
+    def closeQueue(self, queue):
+        if queue is None:
+            return
+        try:
+            queue.close()
+            metrics.gauge('mq_open_handles', -1, component='response')
+        except pymqi.MQMIError as e:
+            self.logger.error("Error closing queue")
+            self.logger.error(e)
         
 
     def getMessages(self,qmgr):
         self.logger.info('Attempting gets from Queue')
+        while True:
+            try:
+                md, msgObject = self.receive(self.WAIT_INTERVAL)
+                if md is not None:
+                    return md, msgObject
+            except KeyboardInterrupt:
+                self.logger.info('Have received a keyboard interrupt')
+                return None, None
+
+    def receive(self, wait_interval):
+        """
+            Make a single get, waiting up to wait_interval milliseconds for a message
+            (0 returns at once). Returns (md, msgObject), or (None, None) when nothing
+            arrived. An empty get commits the gets made since the previous one.
+        """
+        if self.queue is None:
+            self.queue = self.getQueue(self.MQDetails[self.envStore.QUEUE_NAME], True)
         # Message Descriptor
         # Get Message Options
         gmo = pymqi.GMO()
         gmo.Options = pymqi.CMQC.MQGMO_WAIT | pymqi.CMQC.MQGMO_FAIL_IF_QUIESCING | pymqi.CMQC.MQGMO_SYNCPOINT
-        gmo.WaitInterval = 5000  # 5 seconds
-
-        keep_running = True
-        
-        while keep_running:
-            backoutCounter = 0   
-            ok = True
-            msgObject = None
+        gmo.WaitInterval = wait_interval
+        properties = get_options_with_properties(self.qmgr, gmo)
 
-            try:
-                # Reset the MsgId, CorrelId & GroupId so that we can reuse
-                # the same 'md' object again.
-                md = pymqi.MD()
-                md.MsgId = pymqi.CMQC.MQMI_NONE
-                md.CorrelId = pymqi.CMQC.MQCI_NONE
-                md.GroupId = pymqi.CMQC.MQGI_NONE
-                
-                # Wait up to to gmo.WaitInterval for a new message.
-                message = self.queue.get(None, md, gmo)
-                backoutCounter = md.BackoutCount             
+        backoutCounter = 0   
+        msgObject = None
+        message = None
 
-                # Process the message here..
+        try:
+            # Reset the MsgId, CorrelId & GroupId so that we can reuse
+            # the same 'md' object again.
+            md = pymqi.MD()
+            md.MsgId = pymqi.CMQC.MQMI_NONE
+            md.CorrelId = pymqi.CMQC.MQCI_NONE
+            md.GroupId = pymqi.CMQC.MQGI_NONE
+            
+            # Wait up to to gmo.WaitInterval for a new message.
+            wait_start = time.perf_counter()
+            message = self.queue.get(None, md, gmo)
+            metrics.observe('mq_get_wait_seconds', time.perf_counter() - wait_start, component='response')
+            if is_wakeup(md):
+                self.qmgr.commit()
+                return None, None
+            self.trace = tracer.extract(properties)
+            self.retry_attempt = int(read_property(properties, RETRY_ATTEMPT, 0))
+            backoutCounter = md.BackoutCount             
+            if backoutCounter:
+                metrics.inc('mq_redelivered_total', component='response')
+
+            # Process the message here..
+            with metrics.timer('mq_decode_seconds', component='response'):
                 msgObject = json.loads(message.decode())            
-                self.logger.info('Have message from Queue')
-                self.logger.info(msgObject)    
-                return md, msgObject
-
-            except pymqi.MQMIError as e:
-                if e.comp == pymqi.CMQC.MQCC_FAILED and e.reason == pymqi.CMQC.MQRC_NO_MSG_AVAILABLE:
-                    # No messages, that's OK, we can ignore it.
-                    ok = True
-                else:
-                    # Some other error condition.
-                    ok = False        
-
-            except (UnicodeDecodeError, ValueError) as e:
-                self.logger.info('Message is not valid json')
-                self.logger.info(e)
-                self.logger.info(message)
-                ok = False
-                continue
-
-            except KeyboardInterrupt:
-                self.logger.info('Have received a keyboard interrupt')
-                keep_running = False
-
-            except:
-                ok = False
-
+            self.logger.info('Have message from Queue')
+            self.logger.debug(msgObject)    
+            return md, msgObject
 
-            if ok == True:
-                #Commiting 
-                qmgr.commit()            
-            elif ok == False:
-                keep_running=self.rollback(qmgr, md, msgObject, backoutCounter)        
+        except pymqi.MQMIError as e:
+            if e.comp == pymqi.CMQC.MQCC_FAILED and e.reason == pymqi.CMQC.MQRC_NO_MSG_AVAILABLE:
+                # No messages, that's OK, commit what was got so far.
+                with metrics.timer('mq_commit_seconds', component='response'):
+                    self.qmgr.commit()            
+                return None, None
+
+        except (UnicodeDecodeError, ValueError) as e:
+            self.logger.info('Message is not valid json')
+            self.logger.info(e)
+            self.logger.info(message)
+            return None, None
+
+        except Exception:
+            pass
+
+        # Some other error condition.
+        self.rollback(self.qmgr, md, msgObject, backoutCounter)
+        return None, None
+
+    def wake(self):
+        """
+            Make a get waiting on the request queue return. The queue may be shared
+            with other instances, one of which can get the message instead.
+        """
+        return self.waker.wake()
+
+    def commit(self):
+        try:
+            with metrics.timer('mq_commit_seconds', component='response'):
+                self.qmgr.commit()
+            return True
+        except pymqi.MQMIError as e:
+            self.logger.error("Error on commit")
+            self.logger.error(e)
+            return False
 
-    
     def respondToRequest(self, message, md):
         # Create a response message descriptor with the CorrelId
         # set to the value of MsgId of the original request message.
@@ -220,40 +291,92 @@ class MQResponse():
         replyQueue = self.getQueue(response_md.ReplyToQ, False)                
 
         try:
-            replyQueue.put(self.envStore.stringForVersion(json.dumps(msgReply)), response_md)
+            # Carry the trace context back with the reply
+            pmo = put_options_with_properties(self.qmgr, tracer.inject(), self.qos[REPLY].apply(response_md))
+            with metrics.timer('mq_put_seconds', component='response'):
+                replyQueue.put(self.envStore.stringForVersion(json.dumps(msgReply)), response_md, pmo)
             return True
         except:
+            metrics.inc('mq_errors_total', component='response', operation='put')
             #Roll back on exception
             return False
+        finally:
+            # The put stays in the unit of work after the reply queue is closed
+            self.closeQueue(replyQueue)
         
     
-    def rollback(self, qmgr , md, msg, backoutCounter):
+    def scheduleRetry(self, md, msg):
+        """
+            Move a failed message to the retry queue, to be re-delivered once its
+            backoff delay has passed, or to the backout queue when its attempts are used up.
+        """
+        attempt = self.retry_attempt + 1
+        if self.retry_policy.exhausted(attempt):
+            self.logger.info("Retries exhausted after %d attempts" % attempt)
+            return self.moveToBackoutQueue(self.qmgr, md, msg)
+
+        if self.retryQueue is None:
+            self.retryQueue = self.getQueue(self.MQDetails[self.envStore.RETRY_QUEUE], False)
+            if self.retryQueue is None:
+                return self.rollback(self.qmgr, md, msg, md.BackoutCount, retry=False)
+        delay = self.retry_policy.delay(attempt)
+        properties = {
+            RETRY_ATTEMPT: attempt,
+            RETRY_NOT_BEFORE: time.time() + delay,
+            RETRY_ORIGIN: self.MQDetails[self.envStore.QUEUE_NAME].decode(),
+        }
+        if self.trace is not None:
+            properties[TRACEPARENT] = self.trace.traceparent()
+            properties[TRACE_SENT_AT] = repr(self.trace.sent_at) if self.trace.sent_at else None
+        try:
+            pmo = put_options_with_properties(self.qmgr, properties, self.qos[RETRY].apply(md))
+            self.retryQueue.put(self.envStore.stringForVersion(json.dumps(msg)), md, pmo)
+            self.qmgr.commit()
+            metrics.inc('mq_retries_scheduled_total', component='response')
+            self.logger.info("Message scheduled for retry %d in %.1f seconds" % (attempt, delay))
+            return True
+        except pymqi.MQMIError as e:
+            self.logger.error("Error scheduling retry")
+            self.logger.error(e)
+            return self.rollback(self.qmgr, md, msg, md.BackoutCount, retry=False)
+
+    def moveToBackoutQueue(self, qmgr, md, msg):
         # get the backout queue from the Environment --> fix this
         BACKOUT_QUEUE = self.MQDetails[self.envStore.BACKOUT_QUEUE]
-    
+        metrics.inc('mq_backout_queue_total', component='response')
+        self.logger.info("REDIRECTING THE MESSAGE TO THE BACKOUT QUEUE " + str(BACKOUT_QUEUE))
+        backoutQueue = self.getQueue(BACKOUT_QUEUE, False)
+
+        try:
+            msg = self.envStore.stringForVersion(json.dumps(msg))
+            backoutQueue.put(msg, md, self.qos[BACKOUT].apply(md))
+            qmgr.commit()                        
+            self.logger.info("Message sent to the backout queue" + str(BACKOUT_QUEUE))
+            return True
+        except:
+            self.logger.info("Error on redirecting the message")
+            return False
+        finally:
+            self.closeQueue(backoutQueue)
+
+    def rollback(self, qmgr , md, msg, backoutCounter, retry=True):
+        if retry and self.retry_policy is not None and msg is not None:
+            return self.scheduleRetry(md, msg)
+
         ok = False 
 
         # if the backout counter is greater than 5
         # handle possible poisoning message scenario
         if (backoutCounter >= 5):
             self.logger.info("POSIONING MESSAGE DETECTED! ")
-            self.logger.info("REDIRECTING THE MESSAGE TO THE BACKOUT QUEUE " + str(BACKOUT_QUEUE))
-            backoutQueue = self.getQueue(BACKOUT_QUEUE, False)
-
-            try:
-                msg = self.envStore.stringForVersion(json.dumps(msg))
-                backoutQueue.put(msg,md)            
-                qmgr.commit()                        
-                ok = True
-                self.logger.info("Message sent to the backout queue" + str(BACKOUT_QUEUE))
-            except:
-                self.logger.info("Error on redirecting the message")
-                ok = False
+            ok = self.moveToBackoutQueue(qmgr, md, msg)
 
         else:        
 
             try:
-                qmgr.backout()            
+                with metrics.timer('mq_backout_seconds', component='response'):
+                    qmgr.backout()            
+                metrics.inc('mq_backouts_total', component='response')
                 ok = True
             except:
                 self.logger.error("Error on rollback")
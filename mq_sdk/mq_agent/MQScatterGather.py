@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import logging
+import time
+from typing import Dict, List, Tuple
+
+from mq_sdk.mq_agent.MQRequest import MQRequest
+from mq_sdk.utilities.metrics import metrics
+from mq_sdk.utilities.properties import put_options_with_properties, get_options_with_properties
+from mq_sdk.utilities.tracing import tracer
+from mq_sdk.utilities.transport import pymqi
+from mq_sdk.utilities.types import AgentReply, GatherResult
+
+
+class MQScatterGather:
+    """
+        Sends one request to several agents, or several instances of one agent, in
+        parallel and gathers their replies on a single dynamic reply queue.
+
+        Each request gets its own CorrelId, which the responder copies to its reply, so
+        replies are matched to the agent they came from in whatever order they arrive.
+        Gathering stops when every agent has replied, when quorum replies have arrived,
+        or when the deadline passes, and what arrived by then is returned with the
+        latency of each reply. Replies that arrive after a gather ended are discarded
+        by the next one.
+
+        The agents are the OUTBOUND_NETWORK endpoints of ccdt_path, named by AGENT_NAME.
+        Their QUEUE_NAMEs must be reachable from the queue manager of the first endpoint,
+        for example through remote queue definitions. An instance shares the connection
+        and reply queue between calls, so it should be used by one thread at a time.
+    """
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
+
+    def __init__(self, ccdt_path: str):
+        self.requester = MQRequest(ccdt_path=ccdt_path)
+        self.envStore = self.requester.envStore
+        self.qmgr = None
+        self.queues = {}
+        self.reply_queue = None
+        self.reply_queue_name = None
+
+    def agents(self) -> Dict[str, str]:
+        """
+            AGENT_NAME (or QUEUE_NAME when it has none) to QUEUE_NAME, for every endpoint.
+        """
+        agents = {}
+        for endpoint in self.envStore.getEnv():
+            queue_name = endpoint.get(self.envStore.QUEUE_NAME)
+            if queue_name:
+                agents[endpoint.get(self.envStore.AGENT_NAME) or queue_name] = queue_name
+        return agents
+
+    def targets(self, agent_names: List[str] = None, instances: int = 1) -> List[Tuple[str, str]]:
+        """
+            (agent name, queue name) of each request to send. With instances > 1 each agent
+            gets that many copies, taken by different instances consuming its queue.
+        """
+        agents = self.agents()
+        unknown = [name for name in agent_names or [] if name not in agents]
+        if unknown:
+            raise ValueError(f"Unknown agents {unknown}, known agents are {list(agents)}")
+        names = agent_names or list(agents)
+        return [(f"{name}#{i}" if instances > 1 else name, agents[name])
+                for name in names for i in range(instances)]
+
+    def connect(self) -> bool:
+        if self.qmgr is None:
+            self.qmgr = self.requester.connect()
+            self.requester.qmgr = self.qmgr
+        if self.qmgr is not None and self.reply_queue is None:
+            dynamic = self.requester.get_dynamic_queue()
+            if dynamic:
+                self.reply_queue, self.reply_queue_name = dynamic
+        return self.reply_queue is not None
+
+    def queue(self, queue_name: str):
+        if queue_name not in self.queues:
+            q = pymqi.Queue(self.qmgr)
+            od = pymqi.OD()
+            od.ObjectName = queue_name
+            with metrics.timer('mq_open_seconds', component='scatter'):
+                q.open(od, pymqi.CMQC.MQOO_OUTPUT)
+            metrics.gauge('mq_open_handles', 1, component='scatter')
+            self.queues[queue_name] = q
+        return self.queues[queue_name]
+
+    def scatter(self, message: str, targets: List[Tuple[str, str]]) -> Dict[bytes, AgentReply]:
+        """
+            Put the request on each target queue. Returns the pending replies by CorrelId.
+        """
+        pending = {}
+        body = self.envStore.stringForVersion(json.dumps(message))
+        for agent_name, queue_name in targets:
+            reply = AgentReply(agent_name=agent_name, queue_name=queue_name)
+            try:
+                md = pymqi.MD()
+                md.ReplyToQ = self.reply_queue_name
+                md.MsgType = pymqi.CMQC.MQMT_REQUEST
+                md.Format = pymqi.CMQC.MQFMT_STRING
+                pmo = put_options_with_properties(self.qmgr, tracer.inject(), self.requester.qos.apply(md))
+                # A CorrelId per request, copied to its reply by the responder
+                pmo.Options |= pymqi.CMQC.MQPMO_NEW_CORREL_ID
+                with metrics.timer('mq_put_seconds', component='scatter'):
+                    self.queue(queue_name).put(body, md, pmo)
+                pending[md.CorrelId] = reply
+            except pymqi.MQMIError as e:
+                metrics.inc('mq_errors_total', component='scatter', operation='put')
+                self.logger.error(f"Error sending request to {agent_name}")
+                self.logger.error(e)
+                reply.error = str(e)
+                pending[id(reply)] = reply
+        if self.requester.qos.syncpoint:
+            self.qmgr.commit()
+        return pending
+
+    def gather(self, pending: Dict[bytes, AgentReply], sent_at: float, deadline: float, quorum: int) -> None:
+        """
+            Get replies until every request is answered, quorum is reached or the deadline passes.
+        """
+        gmo = pymqi.GMO()
+        gmo.Options = pymqi.CMQC.MQGMO_WAIT | pymqi.CMQC.MQGMO_FAIL_IF_QUIESCING
+        gmo.MatchOptions = pymqi.CMQC.MQMO_NONE
+        get_options_with_properties(self.qmgr, gmo)
+        waiting = {correl_id for correl_id, reply in pending.items() if reply.error is None}
+        answered = 0
+        while waiting and answered < quorum:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            gmo.WaitInterval = max(1, int(remaining * 1000))
+            md = pymqi.MD()
+            try:
+                message = self.reply_queue.get(None, md, gmo)
+            except pymqi.MQMIError as e:
+                if e.comp == pymqi.CMQC.MQCC_FAILED and e.reason == pymqi.CMQC.MQRC_NO_MSG_AVAILABLE:
+                    break
+                raise
+            if md.CorrelId not in waiting:
+                metrics.inc('mq_scatter_late_replies_total', component='scatter')
+                continue
+            waiting.discard(md.CorrelId)
+            reply = pending[md.CorrelId]
+            reply.latency = time.monotonic() - sent_at
+            metrics.observe('mq_scatter_reply_seconds', reply.latency, component='scatter', agent=reply.agent_name)
+            try:
+                body = json.loads(message.decode())
+            except (UnicodeDecodeError, ValueError) as e:
+                reply.error = f"Reply is not valid json: {e}"
+                continue
+            if not isinstance(body, dict):
+                reply.error = f"Reply is not a json object: {type(body).__name__}"
+                continue
+            reply.reply = body
+            answered += 1
+
+    def request(self, message: str, agent_names: List[str] = None, instances: int = 1,
+                deadline: float = 30.0, quorum: int = None) -> GatherResult:
+        """
+            Send message to the agents (all of them by default) and gather their replies for
+            up to deadline seconds, or until quorum of them have replied.
+        """
+        targets = self.targets(agent_names, instances)
+        quorum = min(quorum or len(targets), len(targets))
+        if not self.connect():
+            raise RuntimeError("Could not connect to the queue manager")
+
+        start = time.monotonic()
+        with tracer.span("mq.scatter", agents=len(targets), quorum=quorum):
+            pending = self.scatter(message, targets)
+            self.gather(pending, start, start + deadline, quorum)
+
+        replies = list(pending.values())
+        answered = [r for r in replies if r.reply is not None]
+        missing = [r.agent_name for r in replies if r.reply is None]
+        if missing:
+            metrics.inc('mq_scatter_missing_total', len(missing), component='scatter')
+        return GatherResult(
+            replies=replies,
+            missing=missing,
+            complete=not missing,
+            quorum_reached=len(answered) >= quorum,
+            elapsed=time.monotonic() - start
+        )
+
+    def close(self):
+        for q in self.queues.values():
+            q.close()
+            metrics.gauge('mq_open_handles', -1, component='scatter')
+        self.queues.clear()
+        if self.reply_queue is not None:
+            self.reply_queue.close()
+            metrics.gauge('mq_open_handles', -1, component='request')
+            self.reply_queue = None
+        if self.qmgr is not None:
+            self.qmgr.disconnect()
+            self.qmgr = None
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+from mq_sdk.utilities.metrics import metrics
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MQSingleFlight:
+    """
+        Coalesces identical in-flight requests to the same agent.
+
+        The first caller for a key performs the MQ round trip. Callers that arrive
+        with the same key while it is in flight wait for it and receive the same reply.
+        The mq_coalesced_total counter and coalesced_total count the coalesced calls;
+        per key counts are only kept for the MAX_KEYS keys coalesced last.
+    """
+    logger = logging.getLogger(__name__)
+
+    MAX_KEYS = 256
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.coalesced_total = 0
+        # Most recently coalesced key last
+        self.coalesced: OrderedDict = OrderedDict()
+
+    @staticmethod
+    def key(agent_name: str, message: str) -> str:
+        """
+            Build the coalescing key from the target agent and the normalized message text.
+
+            The thread_id is left out: followers share the reply computed in the
+            conversation of the leader's thread, and their own thread on the remote
+            agent never sees the turn.
+        """
+        normalized = " ".join(str(message).lower().split())
+        return hashlib.sha256(f"{agent_name}\x00{normalized}".encode("utf-8")).hexdigest()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+            Run fn for the key, or wait for the run already in flight and share its result.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.coalesced_total += 1
+                self.coalesced[key] = self.coalesced.pop(key, 0) + 1
+                if len(self.coalesced) > self.MAX_KEYS:
+                    self.coalesced.popitem(last=False)
+
+        if not leader:
+            metrics.inc('mq_coalesced_total', component='single_flight')
+            self.logger.info(f"Coalescing request {key[:12]} with the one in flight")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        """
+            Number of coalesced calls per key, for the MAX_KEYS keys coalesced last.
+        """
+        with self._lock:
+            return dict(self.coalesced)
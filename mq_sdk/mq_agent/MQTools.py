@@ -18,9 +18,14 @@ from pydantic import BaseModel, Field
 from datetime import *
 
 from mq_sdk.mq_agent.MQRequest import MQRequest
+from mq_sdk.mq_agent.MQScatterGather import MQScatterGather
+from mq_sdk.mq_agent.MQSingleFlight import MQSingleFlight
+from mq_sdk.utilities.circuit_breaker import circuit_breaker
+from mq_sdk.utilities.constants import NETWORK_TYPE
+from mq_sdk.utilities.env import EnvStore
 from mq_sdk.utilities.types import Message
 
-from typing import Optional
+from typing import List, Optional
 
 from langchain_core.callbacks import (
     AsyncCallbackManagerForToolRun,
@@ -34,6 +39,10 @@ class ContactExternalAgentToolArgs(BaseModel):
     message: str = Field(description="The message that you want to send to the external agent.")
     agent_name: str = Field(description="The name of the agent that you want to contact within the network.")
 
+# Shared by every conversation in the process, so identical
+# concurrent delegations share one MQ round trip.
+single_flight = MQSingleFlight()
+
 class ContactExternalAgentTool(BaseTool):
     name: str = "contact_external_agent"
     description: str = "Contact an external agent in the network. You will be be notified when the external agent replies to your message."
@@ -81,7 +90,78 @@ class ContactExternalAgentTool(BaseTool):
         except Exception as e:
             print(f'>>>>>> Error: {e}')
 
-        req = MQRequest(ccdt_path=ccdt_path)
-        req.perform_connection()
-        respone = req.put_and_wait_response(msg.model_dump_json())
-        return respone
\ No newline at end of file
+        # Fail fast while the agent is known to be down
+        breaker = circuit_breaker(agent_name)
+        if breaker is not None and not breaker.allow():
+            return f"Error: {agent_name} is not responding. Do not contact it again for {breaker.retry_in():.1f} seconds."
+
+        def round_trip():
+            envStore = EnvStore(ccdt_path=ccdt_path, network_type=NETWORK_TYPE.OUTBOUND_NETWORK)
+            envStore.setEnv()
+            breaker = circuit_breaker(agent_name, envStore)
+            try:
+                req = MQRequest(ccdt_path=ccdt_path)
+                timeout = req.request_timeout()
+                req.perform_connection()
+                response = req.put_and_wait_response(msg.model_dump_json(), timeout=timeout)
+            except Exception:
+                # Any failure ends a half-open probe, or the circuit would stay open
+                breaker.record_failure()
+                raise
+            if response is None:
+                breaker.record_failure()
+                return f"Error: {agent_name} did not reply within {timeout:g} seconds."
+            breaker.record_success()
+            return response
+
+        respone = single_flight.do(MQSingleFlight.key(agent_name, message), round_trip)
+        return respone
+
+class ContactExternalAgentsToolArgs(BaseModel):
+    message: str = Field(description="The message that you want to send to every external agent.")
+    agent_names: Optional[List[str]] = Field(default=None, description="The names of the agents to contact at once. All agents in the network when not given.")
+    deadline_seconds: float = Field(default=60.0, description="How long to wait for the replies.")
+
+class ContactExternalAgentsTool(BaseTool):
+    name: str = "contact_external_agents"
+    description: str = "Send the same message to several external agents in the network at once and collect their replies. Use it instead of contacting them one after another."
+    args_schema: Optional[ArgsSchema] = ContactExternalAgentsToolArgs
+    return_direct: bool = True
+
+    def _run(
+        self, 
+        message:str, 
+        config: RunnableConfig,
+        agent_names: Optional[List[str]] = None,
+        deadline_seconds: float = 60.0,
+        run_manager: Optional[CallbackManagerForToolRun] = None,
+    ) -> dict:
+        """Use the tool."""        
+        return self.contact_external_agents_func(
+            message=message,
+            agent_names=agent_names,
+            deadline_seconds=deadline_seconds,
+            config=config
+        )
+
+    def contact_external_agents_func(self, message, agent_names, deadline_seconds, config: RunnableConfig):
+        _config = config.get("configurable", {})        
+        thread_id = _config.get("thread_id", None)    
+        ccdt_path = _config.get("ccdt_path", None)
+        msg = Message(
+            message=message,
+            thread_id=str(thread_id)
+        )
+
+        scatter_gather = MQScatterGather(ccdt_path=ccdt_path)
+        try:
+            result = scatter_gather.request(msg.model_dump_json(), agent_names=agent_names, deadline=deadline_seconds)
+        finally:
+            scatter_gather.close()
+        return {
+            'replies_from_external_assistants': {
+                r.agent_name: r.reply.get('reply_from_external_assistant', r.reply)
+                for r in result.replies if r.reply is not None
+            },
+            'no_reply_from': result.missing,
+        }
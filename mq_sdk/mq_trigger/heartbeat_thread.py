@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import threading
+import time
+
+from mq_sdk.mq_agent.MQResponse import MQResponse
+from mq_sdk.utilities.heartbeat import load, instance_id, heartbeat_interval, heartbeat_topic, MISSED_HEARTBEATS
+from mq_sdk.utilities.metrics import metrics
+from mq_sdk.utilities.transport import pymqi
+
+
+class HeartbeatThread(threading.Thread):
+    """
+        Publishes the instance's load on the HEARTBEAT_TOPIC of the agent's
+        INBOUND_NETWORK every HEARTBEAT_INTERVAL seconds, and a last heartbeat
+        when stopped so requesters drop the instance at once.
+    """
+    def __init__(self, ccdt_path: str, model: str = None):
+        super().__init__(name="heartbeat", daemon=True)
+        self.responder = MQResponse(
+            ccdt_path=ccdt_path
+        )
+        envStore = self.responder.envStore
+        self.topic_name = envStore.getEnvValue(envStore.HEARTBEAT_TOPIC)
+        self.instance_queue = envStore.getEnvValue(envStore.INSTANCE_QUEUE)
+        self.instance_id = instance_id(envStore)
+        self.interval = heartbeat_interval(envStore)
+        backend = envStore.getEnvValue(envStore.MODEL_BACKEND)
+        self.model = backend.decode() if backend else model
+        agent_name = envStore.getEnvValue(envStore.AGENT_NAME)
+        self.agent_name = agent_name.decode() if agent_name else None
+        self.queue_name = self.responder.MQDetails[envStore.QUEUE_NAME].decode()
+        self.topic = None
+        self._stop_event = threading.Event()
+
+    def configured(self) -> bool:
+        return self.topic_name is not None
+
+    def heartbeat(self, stopping: bool = False) -> dict:
+        in_flight, latency = load.snapshot()
+        return {
+            'instance_id': self.instance_id,
+            'queue_name': self.queue_name,
+            'instance_queue': self.instance_queue.decode() if self.instance_queue else None,
+            'agent_name': self.agent_name,
+            'model': self.model,
+            'in_flight': in_flight,
+            'latency': latency,
+            'interval': self.interval,
+            'sent_at': time.time(),
+            'stopping': stopping
+        }
+
+    def publish(self, stopping: bool = False):
+        md = pymqi.MD()
+        md.Format = pymqi.CMQC.MQFMT_STRING
+        md.Persistence = pymqi.CMQC.MQPER_NOT_PERSISTENT
+        # A heartbeat nobody got in time says nothing about the instance any longer
+        md.Expiry = int(self.interval * MISSED_HEARTBEATS * 10)
+        self.topic.pub(self.responder.envStore.stringForVersion(json.dumps(self.heartbeat(stopping))), md)
+        metrics.inc('mq_heartbeats_total', component='listener')
+
+    def run(self):
+        self.responder.perform_connection()
+        if self.responder.qmgr is None:
+            return
+        topic_string = heartbeat_topic(self.topic_name.decode(), self.queue_name, self.instance_id)
+        try:
+            self.topic = pymqi.Topic(self.responder.qmgr, topic_string=topic_string)
+            self.topic.open(open_opts=pymqi.CMQC.MQOO_OUTPUT)
+        except pymqi.MQMIError as e:
+            print(f"Error opening heartbeat topic: {e}")
+            return
+        print(f'Heartbeat: {topic_string} every {self.interval:g}s')
+
+        while not self._stop_event.is_set():
+            try:
+                self.publish()
+            except pymqi.MQMIError as e:
+                print(f"Error in HeartbeatThread: {e}")
+            self._stop_event.wait(self.interval)
+        try:
+            self.publish(stopping=True)
+            self.topic.close()
+        except pymqi.MQMIError as e:
+            print(f"Error in HeartbeatThread: {e}")
+
+    def stop(self):
+        self._stop_event.set()
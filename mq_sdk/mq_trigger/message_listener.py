@@ -13,20 +13,98 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from mq_sdk.utilities.cancellation import cancellations
+from mq_sdk.utilities.constants import NETWORK_TYPE
+from .heartbeat_thread import HeartbeatThread
 from .message_listener_thread import MessageListenerThread
+from .profiling_control_thread import ProfilingControlThread
+from .reactor import shared_reactor
+from .retry_scheduler_thread import RetrySchedulerThread
+from .state_listener_thread import StateBackgroundListener
 
 class MessageListener:
-    def __init__(self, ccdt_path, on_message):
+    def __init__(self, ccdt_path, on_message, dedup_store=None, reactor=None, model=None):
         self.listener = MessageListenerThread(
             ccdt_path,
-            on_message
+            on_message,
+            dedup_store=dedup_store
         )
-        self.listener.start()
+        # Requests routed to this instance alone, if it has a queue of its own
+        self.instance_listener = None
+        instance_queue = self.listener.responder.envStore.getEnvValue(
+            self.listener.responder.envStore.INSTANCE_QUEUE)
+        if instance_queue:
+            self.instance_listener = MessageListenerThread(
+                ccdt_path,
+                on_message,
+                dedup_store=dedup_store,
+                queue_name=instance_queue
+            )
+        # Served by a reactor shared with other listeners, or by a thread of its own
+        self.reactor = reactor or shared_reactor()
+        for listener in self.listeners():
+            if self.reactor is not None:
+                self.reactor.register(listener)
+            else:
+                listener.start()
 
+        # Load of the instance, if the agent has a heartbeat topic
+        self.heartbeat = HeartbeatThread(ccdt_path, model=model)
+        if self.heartbeat.configured():
+            self.heartbeat.start()
+
+        # Profiling commands, if the agent has a control queue
+        self.profiling_control = ProfilingControlThread(ccdt_path)
+        if self.profiling_control.configured():
+            self.profiling_control.start()
+
+        # Cancellations of requests, if the agent has a cancel topic. They arrive while a
+        # request is being handled, the reactor runs handlers on its worker threads
+        self.cancellation_listener = None
+        cancel_topic = self.listener.responder.envStore.getEnvValue(
+            self.listener.responder.envStore.CANCEL_TOPIC)
+        if cancel_topic:
+            self.cancellation_listener = StateBackgroundListener(
+                ccdt_path,
+                cancellations.on_cancel_message,
+                network_type=NETWORK_TYPE.INBOUND_NETWORK,
+                topics=[cancel_topic.decode()]
+            )
+            if self.reactor is not None:
+                self.reactor.register(self.cancellation_listener)
+            else:
+                self.cancellation_listener.daemon = True
+                self.cancellation_listener.start()
+
+        # Re-delivers failed messages from the retry queue, if the agent has one
+        self.retry_scheduler = RetrySchedulerThread(ccdt_path)
+        if self.retry_scheduler.configured():
+            self.retry_scheduler.start()
+
+
+    def listeners(self):
+        return [listener for listener in (self.listener, self.instance_listener) if listener is not None]
 
     def send_reply(self, md, message):
-        self.listener.send_reply(md, message)
+        # Replied to on the connection the request was got on
+        listener = next((listener for listener in self.listeners() if listener.handling == md.MsgId), self.listener)
+        return listener.send_reply(md, message)
 
     def shutdown(self):
-        self.listener.stop()
-        self.listener.join()
+        if self.heartbeat.is_alive():
+            # The last heartbeat tells requesters to stop routing here
+            self.heartbeat.stop()
+            self.heartbeat.join(timeout=5)
+        self.profiling_control.stop()
+        self.retry_scheduler.stop()
+        if self.cancellation_listener is not None:
+            if self.reactor is not None:
+                self.reactor.unregister(self.cancellation_listener)
+            else:
+                self.cancellation_listener.stop()
+        for listener in self.listeners():
+            if self.reactor is not None:
+                self.reactor.unregister(listener)
+            else:
+                listener.stop()
+                listener.join()
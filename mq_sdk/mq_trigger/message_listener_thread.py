@@ -19,40 +19,138 @@ import time
 import json
 
 from mq_sdk.mq_agent.MQResponse import MQResponse
+from mq_sdk.utilities.cancellation import cancellations
+from mq_sdk.utilities.dedup import MQDedupStore
+from mq_sdk.utilities.heartbeat import load
+from mq_sdk.utilities.metrics import metrics
+from mq_sdk.utilities.profiling import profiler
+from mq_sdk.utilities.tracing import tracer, since_sent
 from mq_sdk.utilities.types import Message
 
 
 class MessageListenerThread(threading.Thread):
     def __init__(self,
                 ccdt_path: str,
-                on_icoming_message):
+                on_icoming_message,
+                dedup_store: MQDedupStore = None,
+                queue_name: bytes = None):
         super().__init__()
         self.responder = MQResponse(
-            ccdt_path=ccdt_path
+            ccdt_path=ccdt_path,
+            queue_name=queue_name
         ) 
         self.on_incoming_message = on_icoming_message
+        self.dedup_store = dedup_store
         self.responder.perform_connection()
+        # MsgId of the request being handled
+        self.handling = None
         self._stop_event = threading.Event()
 
     def send_reply(self, md , message):
-        self.responder.respondToRequest(message, md)
+        if cancellations.is_cancelled(md.CorrelId):
+            metrics.inc('mq_cancelled_total', component='listener', stage='reply')
+            print(f'Not replying to cancelled request {md.CorrelId.hex()}')
+            return False
+        sent = self.responder.respondToRequest(message, md)
+        if sent and self.dedup_store is not None:
+            self.dedup_store.record_reply(md, message)
+        return sent
+
+    def is_duplicate(self, md, msgObject):
+        """
+            Check the dedup store for a message that was already processed.
+            If a reply was stored for it, the reply is sent again to the current requester.
+        """
+        if self.dedup_store is None:
+            return False
+        record = self.dedup_store.lookup(md, msgObject)
+        if record is None:
+            return False
+        metrics.inc('mq_duplicates_total', component='listener')
+        print(f'Skipping already processed message {record.msg_id}')
+        if record.reply is not None:
+            self.responder.respondToRequest(record.reply, md)
+        self.responder.commit()
+        return True
 
     def run(self):
         while not self._stop_event.is_set():
+            self.poll(self.responder.WAIT_INTERVAL)
+
+    def poll(self, wait_interval):
+        """
+            Wait up to wait_interval milliseconds for a request and handle it.
+            Returns True if a message was got.
+        """
+        message = self.receive(wait_interval)
+        if message is None:
+            return False
+        self.handle(message)
+        return True
+
+    def receive(self, wait_interval):
+        """
+            Wait up to wait_interval milliseconds for a request. Returns (md, msgObject),
+            or None if nothing arrived. The get is in syncpoint until handle() is done
+            with it, so a request must be handled before the next one is got.
+        """
+        try:
+            md, msgObject = self.responder.receive(wait_interval)
+            if md is None or msgObject is None:
+                return None
+            return md, msgObject
+        except Exception as e:
+            print(f"Error in MessageListenerThread: {e}")
+            return None
+
+    def handle(self, message):
+        md, msgObject = message
+        try:
+            if self.is_duplicate(md, msgObject):
+                return
+            if cancellations.is_cancelled(md.CorrelId):
+                # The requester gave up while the request was queued
+                metrics.inc('mq_cancelled_total', component='listener', stage='queued')
+                print(f'Skipping cancelled request {md.CorrelId.hex()}')
+                self.responder.commit()
+                return
             try:
-                md, msgObject = self.responder.perform_get()
-                if md is not None and msgObject is not None:
+                msgObject_ = msgObject
+                with metrics.timer('mq_decode_seconds', component='listener'):
+                    msg = Message(**json.loads(msgObject_))
+                msg.mqmd = md
+                # Continue the requester's trace, replies sent by the handler carry it back
+                trace = self.responder.trace
+                with tracer.span("mq.process", parent=trace, queue_wait=since_sent(trace)), \
+                        metrics.timer('mq_handler_seconds', component='listener'), \
+                        profiler.message(md.MsgId, kind='request'), \
+                        cancellations.scope(md.CorrelId), \
+                        load.track():
+                    self.handling = md.MsgId
                     try:
-                        msgObject_ = msgObject
-                        print(f'MD type {type(md)}')
-                        msg = Message(**json.loads(msgObject_))
-                        msg.mqmd = md
                         self.on_incoming_message(msg)
-                    except Exception as e:
-                        print(f"Error parsing message: {e}")
-                   
+                    finally:
+                        self.handling = None
+                if self.dedup_store is not None:
+                    self.dedup_store.record(md, msgObject)
+                # The request is done with, along with any reply put in syncpoint
+                self.responder.commit()
             except Exception as e:
-                print(f"Error in MessageListenerThread: {e}")
+                metrics.inc('mq_handler_errors_total', component='listener')
+                print(f"Error parsing message: {e}")
+                if self.responder.retry_policy is not None:
+                    self.responder.scheduleRetry(md, msgObject)
+               
+        except Exception as e:
+            print(f"Error in MessageListenerThread: {e}")
+
+    @property
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def wake(self):
+        self.responder.wake()
             
     def stop(self):
         self._stop_event.set()
+        self.wake()
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import threading
+
+from mq_sdk.mq_agent.MQResponse import MQResponse
+from mq_sdk.utilities.profiling import profiler
+from mq_sdk.utilities.transport import pymqi
+
+
+class ProfilingControlThread(threading.Thread):
+    """
+        Reads profiling commands, e.g. {"command": "start", "mode": "sampling", "seconds": 30},
+        from the PROFILE_CONTROL_QUEUE of the agent's INBOUND_NETWORK.
+    """
+    def __init__(self, ccdt_path: str):
+        super().__init__(name="profiling-control", daemon=True)
+        self.responder = MQResponse(
+            ccdt_path=ccdt_path
+        )
+        self.queue_name = self.responder.envStore.getEnvValue(self.responder.envStore.PROFILE_CONTROL_QUEUE)
+        self.queue = None
+        self._stop_event = threading.Event()
+
+    def configured(self) -> bool:
+        return self.queue_name is not None
+
+    def run(self):
+        self.responder.perform_connection()
+        self.queue = self.responder.getQueue(self.queue_name, True)
+        if self.queue is None:
+            return
+        print(f'Profiling control queue: {self.queue_name.decode()}')
+
+        gmo = pymqi.GMO()
+        gmo.Options = pymqi.CMQC.MQGMO_WAIT | pymqi.CMQC.MQGMO_FAIL_IF_QUIESCING | pymqi.CMQC.MQGMO_NO_SYNCPOINT
+        gmo.WaitInterval = 5000
+        while not self._stop_event.is_set():
+            try:
+                md = pymqi.MD()
+                command = json.loads(self.queue.get(None, md, gmo).decode())
+                print(f'Profiling command: {command}')
+                profiler.command(command)
+            except pymqi.MQMIError as e:
+                if e.reason != pymqi.CMQC.MQRC_NO_MSG_AVAILABLE:
+                    print(f"Error in ProfilingControlThread: {e}")
+                    return
+            except Exception as e:
+                print(f"Invalid profiling command: {e}")
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ..utilities import wake
+from ..utilities.metrics import metrics
+
+
+class Reactor(threading.Thread):
+    """
+      Serves many listeners (MessageListenerThread, StateBackgroundListener) from one
+      thread, instead of a thread each blocked in its own get. pymqi has no asynchronous
+      consume (MQCB), so the reactor multiplexes the gets: the listeners are served in
+      turn, each with a get that waits up to max_idle seconds. A message is got as soon
+      as it arrives on the listener being waited on, and within max_idle for each other
+      listener ahead of its own in the round, without any get that returns at once.
+
+      Messages got are handled on a pool of worker threads, so a long handler, such
+      as an LLM turn, does not hold up the other listeners. A listener is not polled
+      again until its message is handled: its get is in syncpoint until the handler
+      commits, and its messages stay in order.
+
+      A listener served by the reactor is never started as a thread of its own.
+      Registering, unregistering or stopping a listener, or a handler finishing, puts a
+      wake-up message for the get the reactor is waiting in (see mq_sdk.utilities.wake),
+      so they take effect at once.
+    """
+    # Seconds between checks while every listener is busy handling a message
+    BUSY_WAIT = 5.0
+
+    def __init__(self, max_idle: float = None, workers: int = 8):
+        super().__init__(daemon=True, name='mq-reactor')
+        self.max_idle = max_idle if max_idle is not None else wake.max_idle()
+        self.sources = []
+        self.workers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mq-reactor-worker')
+        self._lock = threading.Lock()
+        self._handled = threading.Condition(self._lock)
+        self._busy = set()
+        self._local = threading.local()
+        # The listener whose get the reactor is waiting in
+        self._receiving = None
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+
+    def register(self, source):
+        """
+            Start serving a listener, from the next get.
+        """
+        with self._lock:
+            self.sources.append(source)
+        metrics.gauge('mq_reactor_sources', 1, component='reactor')
+        self._interrupt()
+        if not self.is_alive() and not self._stop_event.is_set():
+            try:
+                self.start()
+            except RuntimeError:
+                # Started by another thread in the meantime
+                pass
+
+    def unregister(self, source):
+        """
+            Stop serving a listener. Returns once the reactor is no longer using it,
+            unless called from its own handler.
+        """
+        # Wakes its get if the reactor is waiting in it
+        source.stop()
+        with self._lock:
+            if source in self.sources:
+                self.sources.remove(source)
+                metrics.gauge('mq_reactor_sources', -1, component='reactor')
+            if getattr(self._local, 'source', None) is not source:
+                while source in self._busy:
+                    self._handled.wait()
+            if threading.current_thread() is not self:
+                while self._receiving is source:
+                    self._handled.wait()
+        self._wake.set()
+
+    def run(self):
+        wait_interval = max(1, int(self.max_idle * 1000))
+        while not self._stop_event.is_set():
+            with self._lock:
+                sources = [source for source in self.sources if not source.stopped]
+                if len(sources) != len(self.sources):
+                    metrics.gauge('mq_reactor_sources', len(sources) - len(self.sources), component='reactor')
+                self.sources = sources
+                ready = [source for source in sources if source not in self._busy]
+            if not ready:
+                # Woken as soon as a handler is done or a listener is registered
+                self._sleep(self.BUSY_WAIT if sources else self.max_idle)
+                continue
+
+            got = False
+            for source in ready:
+                if self._stop_event.is_set():
+                    break
+                with self._lock:
+                    if source.stopped:
+                        continue
+                    self._receiving = source
+                try:
+                    message = source.receive(wait_interval)
+                finally:
+                    with self._lock:
+                        self._receiving = None
+                        self._handled.notify_all()
+                if message is not None:
+                    got = True
+                    self._dispatch(source, message)
+            if not got:
+                metrics.inc('mq_reactor_idle_total', component='reactor')
+
+    def _interrupt(self):
+        self._wake.set()
+        receiving = self._receiving
+        if receiving is not None:
+            receiving.wake()
+
+    def _dispatch(self, source, message):
+        with self._lock:
+            self._busy.add(source)
+        metrics.gauge('mq_reactor_busy', 1, component='reactor')
+        try:
+            self.workers.submit(self._handle, source, message)
+        except RuntimeError:
+            # The pool was shut down, handle it here
+            self._handle(source, message)
+
+    def _handle(self, source, message):
+        self._local.source = source
+        try:
+            source.handle(message)
+        finally:
+            self._local.source = None
+            with self._lock:
+                self._busy.discard(source)
+                self._handled.notify_all()
+            metrics.gauge('mq_reactor_busy', -1, component='reactor')
+            # The listener is ready again, without waiting for the current get to end
+            self._interrupt()
+
+    def _sleep(self, seconds):
+        self._wake.wait(seconds)
+        self._wake.clear()
+
+    def stop(self):
+        self._stop_event.set()
+        with self._lock:
+            sources = list(self.sources)
+        for source in sources:
+            source.stop()
+        self._interrupt()
+
+    def shutdown(self):
+        self.stop()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+        # Lets the messages being handled finish
+        self.workers.shutdown(wait=getattr(self._local, 'source', None) is None)
+
+
+_reactor = None
+_reactor_lock = threading.Lock()
+
+
+def shared_reactor():
+    """
+        Reactor shared by every listener of the process when MQ_REACTOR is set
+        (e.g. MQ_REACTOR=1), otherwise None and each listener runs its own thread.
+        MQ_REACTOR_MAX_IDLE and MQ_REACTOR_WORKERS tune it.
+    """
+    global _reactor
+    if os.getenv('MQ_REACTOR', '').lower() in ('', '0', 'false', 'no'):
+        return None
+    with _reactor_lock:
+        if _reactor is None:
+            _reactor = Reactor(workers=int(os.getenv('MQ_REACTOR_WORKERS', 8)))
+        return _reactor
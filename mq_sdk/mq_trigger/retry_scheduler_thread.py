@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import heapq
+import threading
+import time
+
+from mq_sdk.mq_agent.MQResponse import MQResponse
+from mq_sdk.utilities.metrics import metrics
+from mq_sdk.utilities.properties import put_options_with_properties, get_options_with_properties, read_property
+from mq_sdk.utilities.retry import RETRY_ATTEMPT, RETRY_NOT_BEFORE, RETRY_ORIGIN
+from mq_sdk.utilities.tracing import TRACEPARENT, TRACE_SENT_AT
+from mq_sdk.utilities.transport import pymqi
+
+# Properties kept when a message goes back to its queue
+CARRIED_PROPERTIES = (RETRY_ATTEMPT, RETRY_ORIGIN, TRACEPARENT, TRACE_SENT_AT)
+
+
+class RetrySchedulerThread(threading.Thread):
+    """
+        Browses the RETRY_QUEUE and moves each message back to the queue it
+        failed on once its retry_not_before time has passed. The move is one
+        unit of work, so a message is never lost or duplicated by a restart.
+    """
+    def __init__(self, ccdt_path: str):
+        super().__init__(name="retry-scheduler", daemon=True)
+        self.responder = MQResponse(
+            ccdt_path=ccdt_path
+        )
+        self.queue_name = self.responder.MQDetails[self.responder.envStore.RETRY_QUEUE]
+        self.queue = None
+        self.targets = {}
+        self.due = []
+        self._stop_event = threading.Event()
+
+    def configured(self) -> bool:
+        return self.queue_name is not None
+
+    def open(self):
+        self.responder.perform_connection()
+        if self.responder.qmgr is None:
+            return None
+        od = pymqi.OD()
+        od.ObjectName = self.queue_name
+        self.queue = pymqi.Queue(self.responder.qmgr, od,
+                                 pymqi.CMQC.MQOO_INPUT_AS_Q_DEF | pymqi.CMQC.MQOO_BROWSE | pymqi.CMQC.MQOO_FAIL_IF_QUIESCING)
+        return self.queue
+
+    def run(self):
+        try:
+            if self.open() is None:
+                return
+        except pymqi.MQMIError as e:
+            print(f"Error opening retry queue: {e}")
+            return
+        print(f'Retry scheduler: {self.queue_name.decode()}')
+
+        gmo = pymqi.GMO()
+        gmo.Options = pymqi.CMQC.MQGMO_WAIT | pymqi.CMQC.MQGMO_FAIL_IF_QUIESCING | pymqi.CMQC.MQGMO_BROWSE_FIRST
+        properties = get_options_with_properties(self.responder.qmgr, gmo)
+        while not self._stop_event.is_set():
+            try:
+                self.reinject_due()
+                # Wait for a new message, at most until the next one is due
+                wait = self.due[0][0] - time.time() if self.due else 1.0
+                gmo.WaitInterval = int(min(max(wait, 0.05), 1.0) * 1000)
+                gmo.MsgHandle = properties.msg_handle
+                md = pymqi.MD()
+                self.queue.get(None, md, gmo)
+                gmo.Options = (gmo.Options & ~pymqi.CMQC.MQGMO_BROWSE_FIRST) | pymqi.CMQC.MQGMO_BROWSE_NEXT
+                not_before = float(read_property(properties, RETRY_NOT_BEFORE, 0))
+                heapq.heappush(self.due, (not_before, md.MsgId))
+            except pymqi.MQMIError as e:
+                if e.reason != pymqi.CMQC.MQRC_NO_MSG_AVAILABLE:
+                    print(f"Error in RetrySchedulerThread: {e}")
+                    return
+            except Exception as e:
+                print(f"Error in RetrySchedulerThread: {e}")
+
+    def reinject_due(self):
+        qmgr = self.responder.qmgr
+        while self.due and self.due[0][0] <= time.time():
+            _, msg_id = heapq.heappop(self.due)
+            md = pymqi.MD()
+            md.MsgId = msg_id
+            gmo = pymqi.GMO()
+            gmo.Options = pymqi.CMQC.MQGMO_SYNCPOINT | pymqi.CMQC.MQGMO_FAIL_IF_QUIESCING
+            gmo.MatchOptions = pymqi.CMQC.MQMO_MATCH_MSG_ID
+            handle = get_options_with_properties(qmgr, gmo)
+            try:
+                message = self.queue.get(None, md, gmo)
+            except pymqi.MQMIError as e:
+                if e.reason == pymqi.CMQC.MQRC_NO_MSG_AVAILABLE:
+                    # Already re-injected by another instance
+                    continue
+                raise
+            carried = {name: read_property(handle, name) for name in CARRIED_PROPERTIES}
+            origin = carried[RETRY_ORIGIN] or self.responder.MQDetails[self.responder.envStore.QUEUE_NAME].decode()
+            try:
+                pmo = put_options_with_properties(qmgr, carried, pymqi.PMO(Options=pymqi.CMQC.MQPMO_SYNCPOINT))
+                self.target(origin).put(message, md, pmo)
+                qmgr.commit()
+                metrics.inc('mq_retries_reinjected_total', component='retry')
+                print(f'Retry {carried[RETRY_ATTEMPT]} re-injected into {origin}')
+            except pymqi.MQMIError as e:
+                qmgr.backout()
+                print(f"Error re-injecting retry: {e}")
+
+    def target(self, name: str):
+        if name not in self.targets:
+            self.targets[name] = self.responder.getQueue(name, False)
+        return self.targets[name]
+
+    def stop(self):
+        self._stop_event.set()
@@ -13,17 +13,32 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from .reactor import shared_reactor
 from .state_listener_thread import StateBackgroundListener
 
 
 class StateListener:
-    def __init__(self, ccdt_path, on_state_change):
+    def __init__(self, ccdt_path, on_state_change, reactor=None):
         self.listener = StateBackgroundListener(
             ccdt_path,
             on_state_change
         )
-        self.listener.start()
+        # Served by a reactor shared with other listeners, or by a thread of its own
+        self.reactor = reactor or shared_reactor()
+        if self.reactor is not None:
+            self.reactor.register(self.listener)
+        else:
+            self.listener.start()
+
+    def add_subscription(self, topic_string, selector=None):
+        self.listener.subscriber.add_subscription(topic_string, selector)
+
+    def remove_subscription(self, topic_string):
+        self.listener.subscriber.remove_subscription(topic_string)
 
     def shutdown(self):
-        self.listener.stop()
-        self.listener.join()
+        if self.reactor is not None:
+            self.reactor.unregister(self.listener)
+        else:
+            self.listener.stop()
+            self.listener.join()
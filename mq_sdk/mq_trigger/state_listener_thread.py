@@ -15,36 +15,96 @@
 
 import json
 import threading
-import json
+import time
 
+from ..utilities.constants import NETWORK_TYPE
 from ..utilities.subscriber import MQSubscriber
+from ..utilities.metrics import metrics
+from ..utilities.profiling import profiler
+from ..utilities.tracing import tracer, since_sent
 
 
 class StateBackgroundListener(threading.Thread):
+    # Milliseconds each get waits for a publication when run as its own thread
+    WAIT_INTERVAL = 30 * 1000
+
     def __init__(self,
                 ccdt_path: str,
-                on_state_change):
+                on_state_change,
+                network_type: NETWORK_TYPE = NETWORK_TYPE.STATE_NETWORK,
+                topics=None):
         super().__init__()
         self.on_state_change = on_state_change
         self.subscriber = MQSubscriber(
-            ccdt_path=ccdt_path
+            ccdt_path=ccdt_path,
+            network_type=network_type
         ) 
-        self.subscriber.subscribe()
+        self.subscriber.subscribe(topics)
+        self._md = None
+        self._gmo = None
         self._stop_event = threading.Event()
 
     def run(self):
         print('BackgroundListener:: Start listening...')
-        md, gmo = self.subscriber.getMessageConfig()
         while not self._stop_event.is_set():
-            try:
-                md = self.subscriber.resetMD(md)
-                messageJSON = self.subscriber.subscription.get(None, md, gmo)
+            self.poll(self.WAIT_INTERVAL)
+
+    def poll(self, wait_interval):
+        """
+            Wait up to wait_interval milliseconds for a publication and hand it to
+            on_state_change. Returns True if one was got. Any error other than no
+            message stops the listener.
+        """
+        publication = self.receive(wait_interval)
+        if publication is None:
+            return False
+        self.handle(publication)
+        return True
+
+    def receive(self, wait_interval):
+        """
+            Wait up to wait_interval milliseconds for a publication. Returns
+            (md, messageJSON, trace), or None if nothing arrived.
+        """
+        try:
+            self.subscriber.apply_pending()
+            if self._md is None:
+                self._md, self._gmo = self.subscriber.getMessageConfig()
+            md = self.subscriber.resetMD(self._md)
+            self._gmo["WaitInterval"] = wait_interval
+            wait_start = time.perf_counter()
+            messageJSON = self.subscriber.get(md, self._gmo)
+            metrics.observe('mq_get_wait_seconds', time.perf_counter() - wait_start, component='subscriber')
+            if self.subscriber.is_wakeup(md):
+                self.subscriber.apply_pending()
+                return None
+            return md, messageJSON, tracer.extract(self.subscriber.properties)
+        except Exception as e:
+            if not "MQRC_NO_MSG_AVAILABLE" in str(e):
+                print(f'BackgroundListener error: {e}')
+                self.stop()
+            return None
+
+    def handle(self, publication):
+        md, messageJSON, trace = publication
+        try:
+            with metrics.timer('mq_decode_seconds', component='subscriber'):
                 msgObject = json.loads(messageJSON.decode())
+            with tracer.span("mq.state_update", parent=trace, queue_wait=since_sent(trace)), \
+                    metrics.timer('mq_handler_seconds', component='subscriber'), \
+                    profiler.message(md.MsgId, kind='state'):
                 self.on_state_change(msgObject)
-            except Exception as e:
-                if not "MQRC_NO_MSG_AVAILABLE" in str(e):
-                    print(f'BackgroundListener error: {e}')
-                    return
+        except Exception as e:
+            print(f'BackgroundListener error: {e}')
+            self.stop()
+
+    @property
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def wake(self):
+        self.subscriber.wake()
 
     def stop(self):
         self._stop_event.set()
+        self.wake()
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import logging
+import threading
+import time
+
+from .transport import pymqi
+from .metrics import metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Reasons after which the connection cannot be used again
+CONNECTION_ERRORS = (
+    pymqi.CMQC.MQRC_CONNECTION_BROKEN,
+    pymqi.CMQC.MQRC_HCONN_ERROR,
+    pymqi.CMQC.MQRC_Q_MGR_NOT_AVAILABLE,
+    pymqi.CMQC.MQRC_Q_MGR_QUIESCING,
+    pymqi.CMQC.MQRC_Q_MGR_STOPPING,
+    pymqi.CMQC.MQRC_CONNECTION_QUIESCING,
+    pymqi.CMQC.MQRC_CONNECTION_STOPPING,
+)
+
+
+def connection_lost(error: pymqi.MQMIError) -> bool:
+    return error.reason in CONNECTION_ERRORS
+
+
+class AsyncPutter:
+    """
+      Puts and publishes with MQPMO_ASYNC_RESPONSE, so the client does not wait for the
+      queue manager to confirm each message and puts are pipelined over the connection.
+
+      pymqi has no MQSTAT to collect the status of asynchronous puts. Puts are made in
+      syncpoint instead, and committing them is the status check: the commit fails if
+      any put since the previous one failed. A flush commits the messages put so far,
+      after flush_every messages, once flush_interval seconds have passed since the
+      last flush, or when called. The time-based flush is made by a background thread,
+      so it also happens when no more messages are put; close() stops it. Messages of a
+      batch that failed are handed to on_failure(messages, error) as (message, md)
+      pairs, so the caller can put them again, possibly on the background thread.
+    """
+    def __init__(self, qmgr,
+                flush_every: int = 100,
+                flush_interval: float = 1.0,
+                on_failure=None,
+                component: str = 'async_put'):
+        self.qmgr = qmgr
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.on_failure = on_failure
+        self.component = component
+        self.pending = []
+        self.last_flush = time.monotonic()
+        # Puts and commits share the connection's unit of work, and the flusher thread
+        self._lock = threading.RLock()
+        self._closed = threading.Event()
+        if flush_interval:
+            threading.Thread(target=self._flush_periodically, name='async-put-flush', daemon=True).start()
+
+    def put(self, target, message, md: pymqi.MD = None, pmo: pymqi.PMO = None) -> bool:
+        """
+            Put message to an open Queue, or publish it on an open Topic, without
+            waiting for its status. Returns False if the put failed straight away.
+        """
+        md = md or pymqi.MD()
+        pmo = pmo or pymqi.PMO()
+        pmo.Options = (pmo.Options & ~pymqi.CMQC.MQPMO_NO_SYNCPOINT) | \
+                        pymqi.CMQC.MQPMO_SYNCPOINT | pymqi.CMQC.MQPMO_ASYNC_RESPONSE
+        send = getattr(target, 'pub', None) or target.put
+        with self._lock:
+            try:
+                with metrics.timer('mq_put_seconds', component=self.component):
+                    send(message, md, pmo)
+            except pymqi.MQMIError as e:
+                self.failed([(message, md)], e)
+                return False
+
+            self.pending.append((message, md))
+            if len(self.pending) >= self.flush_every:
+                self.flush()
+        return True
+
+    def locked(self):
+        """
+            Context manager holding off the flushes, for other calls on the putter's
+            connection: a connection shared with MQCNO_HANDLE_SHARE_NO_BLOCK fails
+            a call made while the flush thread's commit is in progress.
+        """
+        return self._lock
+
+    def flush(self) -> bool:
+        """
+            Commit the messages put since the last flush. Returns False if any of them failed.
+        """
+        with self._lock:
+            self.last_flush = time.monotonic()
+            if not self.pending:
+                return True
+            batch, self.pending = self.pending, []
+            try:
+                with metrics.timer('mq_commit_seconds', component=self.component):
+                    self.qmgr.commit()
+                metrics.inc('mq_async_puts_total', len(batch), component=self.component)
+                return True
+            except pymqi.MQMIError as e:
+                try:
+                    self.qmgr.backout()
+                except pymqi.MQMIError:
+                    pass
+                self.failed(batch, e)
+                return False
+
+    def close(self) -> bool:
+        """
+            Stop the background flushes and commit what is pending. Call it before
+            disconnecting. Returns False if any of the pending messages failed.
+        """
+        self._closed.set()
+        return self.flush()
+
+    def _flush_periodically(self):
+        wait = self.flush_interval
+        while not self._closed.wait(wait):
+            with self._lock:
+                wait = self.last_flush + self.flush_interval - time.monotonic()
+                if wait <= 0 and not self._closed.is_set():
+                    if self.pending:
+                        self.flush()
+                    wait = self.flush_interval
+
+    def failed(self, messages, error):
+        metrics.inc('mq_async_put_failures_total', len(messages), component=self.component)
+        logger.error("%d asynchronous put(s) failed" % len(messages))
+        logger.error(error)
+        if self.on_failure is not None:
+            self.on_failure(messages, error)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Cooperative cancellation of requests the requester has given up on.
+
+A requester that stops waiting for a reply publishes the request's CorrelId
+on the CANCEL_TOPIC. Responders subscribed to it record the CorrelId, skip the
+request if it is still queued, stop the handler at its next check and do not
+send a reply nobody will read.
+"""
+
+import contextlib
+import contextvars
+import threading
+import time
+
+from .metrics import metrics
+
+CANCEL_CORREL_ID = 'correl_id'
+
+
+class RequestCancelled(Exception):
+    pass
+
+
+class CancellationRegistry:
+    """
+        CorrelIds of cancelled requests, remembered for ttl seconds.
+        The request being handled by the current thread is set with scope(), so
+        handlers can call cancelled() or raise_if_cancelled() between steps.
+    """
+
+    def __init__(self, ttl: float = 600.0):
+        self.ttl = ttl
+        self._cancelled = {}
+        self._lock = threading.Lock()
+        self._current = contextvars.ContextVar('mq_cancellation_correl_id', default=None)
+
+    def cancel(self, correl_id: bytes):
+        now = time.monotonic()
+        with self._lock:
+            self._cancelled = {c: t for c, t in self._cancelled.items() if t > now}
+            self._cancelled[correl_id] = now + self.ttl
+        metrics.inc('mq_cancellations_received_total', component='listener')
+
+    def is_cancelled(self, correl_id: bytes = None) -> bool:
+        correl_id = correl_id if correl_id is not None else self._current.get()
+        if correl_id is None:
+            return False
+        with self._lock:
+            expires = self._cancelled.get(correl_id)
+        return expires is not None and expires > time.monotonic()
+
+    def cancelled(self) -> bool:
+        """True if the request handled by the current thread was cancelled."""
+        return self.is_cancelled()
+
+    def raise_if_cancelled(self):
+        if self.cancelled():
+            raise RequestCancelled(self._current.get().hex())
+
+    @contextlib.contextmanager
+    def scope(self, correl_id: bytes):
+        token = self._current.set(correl_id)
+        try:
+            yield
+        finally:
+            self._current.reset(token)
+
+    def on_cancel_message(self, msgObject: dict):
+        """
+            Handle a message from the CANCEL_TOPIC, {"correl_id": "<hex>"}.
+        """
+        try:
+            self.cancel(bytes.fromhex(msgObject[CANCEL_CORREL_ID]))
+        except (KeyError, TypeError, ValueError):
+            pass
+
+
+cancellations = CancellationRegistry()
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Circuit breakers for the agents a process sends requests to.
+
+After failure_threshold consecutive failures (connection errors, or no reply
+within REQUEST_TIMEOUT) the circuit to an agent opens. Requests to it then
+fail at once, without connecting or creating a reply queue, until
+reset_timeout seconds have passed. A single probe request is then let through
+(half open): its success closes the circuit, its failure opens it again.
+"""
+
+import threading
+import time
+from typing import Dict
+
+from .env import EnvStore
+from .metrics import metrics
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, agent_name: str, retry_in: float):
+        super().__init__(f"{agent_name} is not responding, not retrying for {retry_in:.1f} seconds")
+        self.agent_name = agent_name
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+            Whether a request may be sent now. In half open state only one caller,
+            the probe, is allowed until its outcome is recorded.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+        metrics.inc('mq_circuit_rejected_total', component='request', agent=self.name)
+        return False
+
+    def retry_in(self) -> float:
+        with self._lock:
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def check(self):
+        """Raise CircuitOpenError unless a request may be sent now."""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_in())
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        metrics.inc('mq_circuit_failures_total', component='request', agent=self.name)
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                if self.state != OPEN:
+                    self._set_state(OPEN)
+
+    def _set_state(self, state: str):
+        self.state = state
+        metrics.inc('mq_circuit_transitions_total', component='request', agent=self.name, state=state)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def circuit_breaker(name: str, envStore: EnvStore = None) -> CircuitBreaker:
+    """
+        The breaker of an agent, created on first use with CIRCUIT_FAILURE_THRESHOLD and
+        CIRCUIT_RESET_TIMEOUT from envStore if given. Without envStore, returns None
+        if it does not exist yet.
+    """
+    breaker = _breakers.get(name)
+    if breaker is not None or envStore is None:
+        return breaker
+    with _breakers_lock:
+        if name not in _breakers:
+            breaker = CircuitBreaker(name)
+            threshold = envStore.getEnvValue(envStore.CIRCUIT_FAILURE_THRESHOLD)
+            reset_timeout = envStore.getEnvValue(envStore.CIRCUIT_RESET_TIMEOUT)
+            if threshold:
+                breaker.failure_threshold = int(threshold.decode())
+            if reset_timeout:
+                breaker.reset_timeout = float(reset_timeout.decode())
+            _breakers[name] = breaker
+        return _breakers[name]
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from mq_sdk.utilities.types import ProcessedMessage
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class MQDedupStore:
+    """
+      Local store of the requests an agent has already processed, keyed by MQ MsgId.
+
+      A request that is backed out after the agent has run it is redelivered with the
+      same MsgId. Looking it up here lets the listener skip the LangGraph turn and
+      re-send the stored reply instead. When use_content_hash is set, a request whose
+      body is identical to one already processed is also treated as a duplicate.
+      Entries older than window_seconds are purged.
+    """
+
+    PURGE_INTERVAL = 60
+
+    def __init__(self, path: str = ":memory:", window_seconds: float = 3600, use_content_hash: bool = False):
+        self.path = path
+        self.window_seconds = window_seconds
+        self.use_content_hash = use_content_hash
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS processed ("
+            " msg_id TEXT PRIMARY KEY,"
+            " content_hash TEXT,"
+            " reply TEXT,"
+            " processed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS processed_hash ON processed (content_hash)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS processed_at ON processed (processed_at)")
+        self._conn.commit()
+        self.purge()
+        logger.info("Dedup store opened at %s", path)
+
+    @staticmethod
+    def msg_id_key(md) -> Optional[str]:
+        """Hex form of the MsgId of a message descriptor."""
+        msg_id = getattr(md, "MsgId", None)
+        if not msg_id or not msg_id.strip(b"\x00"):
+            return None
+        return msg_id.hex()
+
+    @staticmethod
+    def content_hash(body) -> str:
+        """Hash of a message body, as received from the queue."""
+        if not isinstance(body, (bytes, bytearray)):
+            body = str(body).encode("utf-8")
+        return hashlib.sha256(body).hexdigest()
+
+    def lookup(self, md, body=None) -> Optional[ProcessedMessage]:
+        """Return the record of an earlier processing of this message, if any."""
+        msg_id = self.msg_id_key(md)
+        since = time.time() - self.window_seconds
+        query = "SELECT msg_id, content_hash, reply, processed_at FROM processed WHERE processed_at >= ? AND "
+        with self._lock:
+            row = None
+            if msg_id:
+                row = self._conn.execute(query + "msg_id = ?", (since, msg_id)).fetchone()
+            if row is None and self.use_content_hash and body is not None:
+                row = self._conn.execute(
+                    query + "content_hash = ? ORDER BY processed_at DESC LIMIT 1",
+                    (since, self.content_hash(body))
+                ).fetchone()
+        if row is None:
+            return None
+        return ProcessedMessage(msg_id=row[0], content_hash=row[1], reply=row[2], processed_at=row[3])
+
+    def record(self, md, body=None, reply: Optional[str] = None):
+        """Mark a message as processed, keeping any reply already stored for it."""
+        msg_id = self.msg_id_key(md)
+        if msg_id is None:
+            return
+        digest = self.content_hash(body) if body is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO processed (msg_id, content_hash, reply, processed_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(msg_id) DO UPDATE SET "
+                " content_hash = COALESCE(excluded.content_hash, processed.content_hash),"
+                " reply = COALESCE(excluded.reply, processed.reply),"
+                " processed_at = excluded.processed_at",
+                (msg_id, digest, reply, time.time())
+            )
+            self._conn.commit()
+        if time.time() - self._last_purge > self.PURGE_INTERVAL:
+            self.purge()
+
+    def record_reply(self, md, reply: str):
+        """Store the reply sent for a message so a redelivery can re-send it."""
+        self.record(md, reply=reply)
+
+    def purge(self):
+        """Drop the entries that fell out of the time window."""
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM processed WHERE processed_at < ?",
+                                     (time.time() - self.window_seconds,))
+            self._conn.commit()
+        self._last_purge = time.time()
+        if cur.rowcount:
+            logger.info("Dedup store purged %d expired entries", cur.rowcount)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -39,9 +39,30 @@ class EnvStore:
     QUEUE_NAME = 'QUEUE_NAME'
     QMGR = 'QMGR'
     TOPIC_NAME = 'TOPIC_NAME'
+    SUBSCRIPTIONS = 'SUBSCRIPTIONS'
+    SELECTOR = 'SELECTOR'
     MODEL_QUEUE_NAME = 'MODEL_QUEUE_NAME'
     DYNAMIC_QUEUE_PREFIX = 'DYNAMIC_QUEUE_PREFIX'
     BACKOUT_QUEUE = 'BACKOUT_QUEUE'
+    RETRY_QUEUE = 'RETRY_QUEUE'
+    RETRY_MAX_ATTEMPTS = 'RETRY_MAX_ATTEMPTS'
+    RETRY_BASE_DELAY = 'RETRY_BASE_DELAY'
+    RETRY_MAX_DELAY = 'RETRY_MAX_DELAY'
+    PROFILE_CONTROL_QUEUE = 'PROFILE_CONTROL_QUEUE'
+    CANCEL_TOPIC = 'CANCEL_TOPIC'
+    REQUEST_TIMEOUT = 'REQUEST_TIMEOUT'
+    CIRCUIT_FAILURE_THRESHOLD = 'CIRCUIT_FAILURE_THRESHOLD'
+    CIRCUIT_RESET_TIMEOUT = 'CIRCUIT_RESET_TIMEOUT'
+    HEARTBEAT_TOPIC = 'HEARTBEAT_TOPIC'
+    HEARTBEAT_INTERVAL = 'HEARTBEAT_INTERVAL'
+    INSTANCE_ID = 'INSTANCE_ID'
+    INSTANCE_QUEUE = 'INSTANCE_QUEUE'
+    MODEL_BACKEND = 'MODEL_BACKEND'
+    ROUTING_STRATEGY = 'ROUTING_STRATEGY'
+    HEDGE_PERCENTILE = 'HEDGE_PERCENTILE'
+    HEDGE_QUEUE = 'HEDGE_QUEUE'
+    HEDGE_INITIAL_DELAY = 'HEDGE_INITIAL_DELAY'
+    HEDGE_MIN_DELAY = 'HEDGE_MIN_DELAY'
     USER = 'USER'
     PASSWORD = 'PASSWORD'
     APP_USER = 'APP_USER'
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Heartbeats of agent instances, for routing requests to the least loaded one.
+
+Every responder instance publishes a heartbeat on HEARTBEAT_TOPIC each
+HEARTBEAT_INTERVAL seconds. The heartbeat carries its in-flight request count,
+its recent handler latency, its model backend and the INSTANCE_QUEUE that only
+it consumes. Requesters subscribed to the topic keep the live instances behind
+each queue and send a request to the instance queue of the least loaded, or
+fastest, one. An instance whose heartbeats stop for MISSED_HEARTBEATS
+intervals is taken as dead and gets no more requests.
+"""
+
+import collections
+import contextlib
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Dict, List, Optional
+
+from .constants import NETWORK_TYPE
+from .env import EnvStore
+from .metrics import metrics
+from .types import InstanceHeartbeat
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LEAST_LOADED = 'least_loaded'
+LOWEST_LATENCY = 'lowest_latency'
+
+# Seconds between heartbeats when the agent sets no HEARTBEAT_INTERVAL
+DEFAULT_INTERVAL = 2.0
+# Heartbeats an instance may miss before it is taken as dead
+MISSED_HEARTBEATS = 3
+
+
+def instance_id(envStore: EnvStore) -> str:
+    configured = envStore.getEnvValue(envStore.INSTANCE_ID)
+    return configured.decode() if configured else f"{socket.gethostname()}-{os.getpid()}"
+
+
+def heartbeat_interval(envStore: EnvStore) -> float:
+    interval = envStore.getEnvValue(envStore.HEARTBEAT_INTERVAL)
+    return float(interval.decode()) if interval else DEFAULT_INTERVAL
+
+
+def heartbeat_topic(topic: str, queue_name: str = '#', instance: str = None) -> str:
+    """The topic an instance of queue_name publishes on, or subscribes to with the defaults."""
+    levels = [topic.rstrip('/'), queue_name] + ([instance] if instance else [])
+    return '/'.join(levels)
+
+
+class LoadTracker:
+    """
+        The requests this process is handling and the latency of the last window
+        it handled, as reported in its heartbeats.
+    """
+
+    def __init__(self, window: int = 50):
+        self.in_flight = 0
+        self.latencies = collections.deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def track(self):
+        with self._lock:
+            self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.latencies.append(time.perf_counter() - start)
+
+    def snapshot(self):
+        """In-flight requests and median latency in seconds, None until one was handled."""
+        with self._lock:
+            ordered = sorted(self.latencies)
+            in_flight = self.in_flight
+        return in_flight, ordered[len(ordered) // 2] if ordered else None
+
+
+load = LoadTracker()
+
+
+class InstanceDirectory:
+    """
+        The live instances behind each queue, kept up to date by on_heartbeat.
+        choose() counts the requests it routes to an instance until its next
+        heartbeat, so requests sent in between are spread rather than all sent
+        to the instance that was least loaded at the last heartbeat.
+    """
+
+    def __init__(self, strategy: str = LEAST_LOADED, missed_heartbeats: int = MISSED_HEARTBEATS):
+        self.strategy = strategy
+        self.missed_heartbeats = missed_heartbeats
+        self.listener = None
+        self._instances: Dict[str, InstanceHeartbeat] = {}
+        self._seen: Dict[str, float] = {}
+        self._routed: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def on_heartbeat(self, msgObject: dict):
+        try:
+            heartbeat = InstanceHeartbeat(**msgObject)
+        except Exception as e:
+            logger.error('Ignoring malformed heartbeat: %s' % e)
+            return
+        with self._lock:
+            if heartbeat.stopping:
+                self._forget(heartbeat.instance_id)
+                logger.info('Instance %s stopped' % heartbeat.instance_id)
+                return
+            if heartbeat.instance_id not in self._instances:
+                logger.info('Instance %s of %s is live' % (heartbeat.instance_id, heartbeat.queue_name))
+            self._instances[heartbeat.instance_id] = heartbeat
+            self._seen[heartbeat.instance_id] = time.monotonic()
+            self._routed[heartbeat.instance_id] = 0
+
+    def live(self, queue_name: str) -> List[InstanceHeartbeat]:
+        now = time.monotonic()
+        with self._lock:
+            for instance, heartbeat in list(self._instances.items()):
+                if now - self._seen[instance] > heartbeat.interval * self.missed_heartbeats:
+                    self._forget(instance)
+                    metrics.inc('mq_instances_dead_total', component='request')
+                    logger.warning('No heartbeat from instance %s, taken as dead' % instance)
+            return [heartbeat for heartbeat in self._instances.values()
+                    if heartbeat.queue_name == queue_name and heartbeat.instance_queue]
+
+    def choose(self, queue_name: str) -> Optional[InstanceHeartbeat]:
+        """
+            The live instance of queue_name to send the next request to, or None
+            if none is known, in which case the request goes to queue_name itself.
+        """
+        candidates = self.live(queue_name)
+        if not candidates:
+            return None
+        with self._lock:
+            def load_of(heartbeat):
+                return heartbeat.in_flight + self._routed.get(heartbeat.instance_id, 0)
+
+            if self.strategy == LOWEST_LATENCY:
+                # Instances with no latency yet are tried first
+                chosen = min(candidates, key=lambda h: (h.latency or 0.0, load_of(h)))
+            else:
+                chosen = min(candidates, key=lambda h: (load_of(h), h.latency or 0.0))
+            self._routed[chosen.instance_id] = self._routed.get(chosen.instance_id, 0) + 1
+        metrics.inc('mq_routed_total', component='request', instance=chosen.instance_id)
+        return chosen
+
+    def release(self, instance: str):
+        """A request routed to instance is done with."""
+        with self._lock:
+            if self._routed.get(instance, 0) > 0:
+                self._routed[instance] -= 1
+
+    def _forget(self, instance: str):
+        self._instances.pop(instance, None)
+        self._seen.pop(instance, None)
+        self._routed.pop(instance, None)
+
+
+_directories: Dict[str, InstanceDirectory] = {}
+_directories_lock = threading.Lock()
+
+
+def instance_directory(ccdt_path: str, envStore: EnvStore) -> Optional[InstanceDirectory]:
+    """
+        The directory of the agent's HEARTBEAT_TOPIC, subscribed to on first use and
+        shared by every request of the process. None if the agent has no heartbeat topic.
+    """
+    topic = envStore.getEnvValue(envStore.HEARTBEAT_TOPIC)
+    if not topic:
+        return None
+    topic = topic.decode()
+    with _directories_lock:
+        if topic not in _directories:
+            # Imported here, the trigger package builds on the utilities
+            from ..mq_trigger.state_listener_thread import StateBackgroundListener
+
+            strategy = envStore.getEnvValue(envStore.ROUTING_STRATEGY)
+            directory = InstanceDirectory(strategy.decode() if strategy else LEAST_LOADED)
+            directory.listener = StateBackgroundListener(
+                ccdt_path,
+                directory.on_heartbeat,
+                network_type=NETWORK_TYPE.OUTBOUND_NETWORK,
+                topics=[heartbeat_topic(topic)]
+            )
+            directory.listener.daemon = True
+            directory.listener.start()
+            _directories[topic] = directory
+        return _directories[topic]
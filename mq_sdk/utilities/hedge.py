@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Hedged requests to replicated agents.
+
+When the reply to a request is late compared with the replies seen so far,
+a duplicate of it is sent, to another instance consuming the same queue or to
+HEDGE_QUEUE, and whichever reply arrives first is used. Only requests slower
+than the HEDGE_PERCENTILE of recent latencies are hedged, so the extra load
+stays around (100 - percentile)% while the tail latency is cut.
+"""
+
+import collections
+import threading
+from typing import Dict
+
+from .env import EnvStore
+from .metrics import metrics
+
+
+class HedgePolicy:
+    """
+        Tracks the latency of the last window requests to a queue and tells how long
+        to wait before hedging: the percentile of those latencies, bounded by min_delay
+        and max_delay, or initial_delay until min_samples latencies are known.
+    """
+
+    def __init__(self, percentile: float = 95.0, window: int = 200, min_samples: int = 20,
+                 initial_delay: float = 5.0, min_delay: float = 0.05, max_delay: float = 60.0):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.latencies = collections.deque(maxlen=window)
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.withdrawn = 0
+        self._lock = threading.Lock()
+
+    def delay(self) -> float:
+        with self._lock:
+            if len(self.latencies) < self.min_samples:
+                return self.initial_delay
+            ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return min(self.max_delay, max(self.min_delay, ordered[index]))
+
+    def record(self, latency: float, hedged: bool = False, hedge_won: bool = False, withdrawn: bool = False):
+        with self._lock:
+            self.latencies.append(latency)
+            self.requests += 1
+            self.hedged += hedged
+            self.hedge_wins += hedge_won
+            self.withdrawn += withdrawn
+        if hedged:
+            metrics.inc('mq_hedges_total', component='request')
+        if hedge_won:
+            metrics.inc('mq_hedge_wins_total', component='request')
+        if withdrawn:
+            metrics.inc('mq_hedges_withdrawn_total', component='request')
+
+    def stats(self) -> Dict[str, float]:
+        """
+            hedge_rate: share of requests hedged. win_rate: share of hedges answered first.
+            withdrawn: losing requests taken back off the queue before any instance got them.
+        """
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hedged': self.hedged,
+                'hedge_wins': self.hedge_wins,
+                'withdrawn': self.withdrawn,
+                'hedge_rate': self.hedged / self.requests if self.requests else 0.0,
+                'win_rate': self.hedge_wins / self.hedged if self.hedged else 0.0,
+            }
+
+
+# Requesters are created per call, the latencies are kept per target queue for the process
+_policies: Dict[str, HedgePolicy] = {}
+_policies_lock = threading.Lock()
+
+
+def hedge_policy(envStore: EnvStore, queue_name: str) -> HedgePolicy:
+    """
+        Hedge policy of the requests to queue_name, or None if the agent has no HEDGE_PERCENTILE.
+    """
+    percentile = envStore.getEnvValue(envStore.HEDGE_PERCENTILE)
+    if not percentile:
+        return None
+    with _policies_lock:
+        if queue_name not in _policies:
+            policy = HedgePolicy(percentile=float(percentile.decode()))
+            for key, attribute in ((envStore.HEDGE_INITIAL_DELAY, 'initial_delay'),
+                                   (envStore.HEDGE_MIN_DELAY, 'min_delay')):
+                value = envStore.getEnvValue(key)
+                if value:
+                    setattr(policy, attribute, float(value.decode()))
+            _policies[queue_name] = policy
+        return _policies[queue_name]
@@ -0,0 +1,659 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Loopback transport: an in-memory message broker behind the pymqi API used by the SDK.
+
+Queues, temporary dynamic queues, topics with '#'/'+' wildcard subscriptions and
+selectors, message properties and syncpoint units of work behave as they do on a
+queue manager, so agents can exchange messages without one. Within a process the
+message bytes are handed over without copying.
+
+Agents in separate processes on the same host share a broker over a local socket:
+
+    python -m mq_sdk.utilities.loopback --address 127.0.0.1:50100
+
+and set MQ_TRANSPORT=loopback and MQ_LOOPBACK_ADDRESS=127.0.0.1:50100 in each agent.
+Without MQ_LOOPBACK_ADDRESS every process gets its own broker.
+"""
+
+import argparse
+import collections
+import itertools
+import logging
+import operator
+import os
+import re
+import threading
+import time
+import types
+import weakref
+from multiprocessing.managers import BaseManager
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ADDRESS = 'MQ_LOOPBACK_ADDRESS'
+AUTHKEY = 'MQ_LOOPBACK_AUTHKEY'
+DEFAULT_AUTHKEY = 'mq-loopback'
+
+# The constants the SDK uses, with their MQ values
+CMQC = types.SimpleNamespace(
+    MQCC_OK=0,
+    MQCC_FAILED=2,
+    MQRC_CONNECTION_BROKEN=2009,
+    MQRC_HCONN_ERROR=2018,
+    MQRC_NO_MSG_AVAILABLE=2033,
+    MQRC_Q_MGR_NOT_AVAILABLE=2059,
+    MQRC_Q_MGR_QUIESCING=2161,
+    MQRC_Q_MGR_STOPPING=2162,
+    MQRC_CONNECTION_QUIESCING=2202,
+    MQRC_CONNECTION_STOPPING=2203,
+    MQRC_UNKNOWN_OBJECT_NAME=2085,
+    MQRC_NO_SUBSCRIPTION=2428,
+    MQRC_PROPERTY_NOT_AVAILABLE=2471,
+    MQRC_SELECTION_STRING_ERROR=2519,
+    MQMI_NONE=b"\0" * 24,
+    MQCI_NONE=b"\0" * 24,
+    MQGI_NONE=b"\0" * 24,
+    MQFMT_STRING=b"MQSTR   ",
+    MQMT_REQUEST=1,
+    MQMT_REPLY=2,
+    MQMT_REPORT=4,
+    MQMT_DATAGRAM=8,
+    MQPER_NOT_PERSISTENT=0,
+    MQPER_PERSISTENT=1,
+    MQPER_PERSISTENCE_AS_Q_DEF=2,
+    MQEI_UNLIMITED=-1,
+    MQOT_Q=1,
+    MQOT_TOPIC=8,
+    MQOO_INPUT_AS_Q_DEF=0x00000001,
+    MQOO_INPUT_SHARED=0x00000002,
+    MQOO_INPUT_EXCLUSIVE=0x00000004,
+    MQOO_BROWSE=0x00000008,
+    MQOO_OUTPUT=0x00000010,
+    MQOO_FAIL_IF_QUIESCING=0x00002000,
+    MQCO_NONE=0x00000000,
+    MQCO_REMOVE_SUB=0x00000008,
+    MQPMO_SYNCPOINT=0x00000002,
+    MQPMO_NO_SYNCPOINT=0x00000004,
+    MQPMO_NEW_MSG_ID=0x00000040,
+    MQPMO_NEW_CORREL_ID=0x00000080,
+    MQPMO_ASYNC_RESPONSE=0x00010000,
+    MQPMO_VERSION_3=3,
+    MQGMO_NO_WAIT=0x00000000,
+    MQGMO_WAIT=0x00000001,
+    MQGMO_SYNCPOINT=0x00000002,
+    MQGMO_NO_SYNCPOINT=0x00000004,
+    MQGMO_BROWSE_FIRST=0x00000010,
+    MQGMO_BROWSE_NEXT=0x00000020,
+    MQGMO_ACCEPT_TRUNCATED_MSG=0x00000040,
+    MQGMO_FAIL_IF_QUIESCING=0x00002000,
+    MQGMO_CONVERT=0x00004000,
+    MQGMO_NO_PROPERTIES=0x04000000,
+    MQGMO_PROPERTIES_IN_HANDLE=0x08000000,
+    MQGMO_VERSION_2=2,
+    MQGMO_VERSION_4=4,
+    MQMO_NONE=0x00000000,
+    MQMO_MATCH_MSG_ID=0x00000001,
+    MQMO_MATCH_CORREL_ID=0x00000002,
+    MQSO_NON_DURABLE=0x00000000,
+    MQSO_CREATE=0x00000002,
+    MQSO_RESUME=0x00000004,
+    MQSO_DURABLE=0x00000008,
+    MQSO_MANAGED=0x00000020,
+    MQSO_WILDCARD_TOPIC=0x00200000,
+    MQTYPE_BOOLEAN=0x00000004,
+    MQTYPE_INT64=0x00000080,
+    MQTYPE_FLOAT64=0x00000200,
+    MQTYPE_STRING=0x00000400,
+    MQVL_NULL_TERMINATED=-1,
+    MQXPT_TCP=2,
+    MQCHT_CLNTCONN=6,
+    MQCNO_HANDLE_SHARE_BLOCK=0x00000040,
+)
+
+CMQXC = types.SimpleNamespace(MQCD_VERSION_11=11)
+
+
+class MQMIError(Exception):
+    def __init__(self, comp, reason):
+        super().__init__(comp, reason)
+        self.comp = comp
+        self.reason = reason
+
+    def __str__(self):
+        return "MQI Error. Comp: %d, Reason %d: %s" % (self.comp, self.reason, self.errorAsString())
+
+    def errorAsString(self):
+        # Same wording as pymqi, callers match on the reason name
+        names = [name for name, value in vars(CMQC).items() if name.startswith('MQRC_') and value == self.reason]
+        return "%s: %s" % ("FAILED" if self.comp == CMQC.MQCC_FAILED else "WARNING",
+                           names[0] if names else "MQRC_%d" % self.reason)
+
+
+def _failed(reason):
+    return MQMIError(CMQC.MQCC_FAILED, reason)
+
+
+class _Options:
+    defaults = {}
+
+    def __init__(self, **kw):
+        self.__dict__.update(self.defaults)
+        self.__dict__.update(kw)
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def set_vs(self, key, value):
+        setattr(self, key, value)
+
+
+class MD(_Options):
+    defaults = dict(MsgId=CMQC.MQMI_NONE, CorrelId=CMQC.MQCI_NONE, GroupId=CMQC.MQGI_NONE,
+                    ReplyToQ=b"", Format=b"", MsgType=CMQC.MQMT_DATAGRAM, BackoutCount=0,
+                    Persistence=CMQC.MQPER_PERSISTENCE_AS_Q_DEF, Expiry=CMQC.MQEI_UNLIMITED,
+                    Priority=-1, PutDate=b"", PutTime=b"")
+
+
+class GMO(_Options):
+    defaults = dict(Options=0, WaitInterval=0, MatchOptions=CMQC.MQMO_MATCH_MSG_ID | CMQC.MQMO_MATCH_CORREL_ID,
+                    Version=1, MsgHandle=0)
+
+
+class PMO(_Options):
+    defaults = dict(Options=0, Version=1, OriginalMsgHandle=0)
+
+
+class OD(_Options):
+    defaults = dict(ObjectName=b"", DynamicQName=b"", ObjectType=CMQC.MQOT_Q)
+
+
+class SD(_Options):
+    defaults = dict(Options=0, SubName="", ObjectString="", SelectionString="")
+
+
+class CD(_Options):
+    pass
+
+
+class SCO(_Options):
+    pass
+
+
+def _name(value) -> str:
+    value = value.decode() if isinstance(value, bytes) else str(value)
+    return value.strip().rstrip("\0")
+
+
+class Selector:
+    """
+        Evaluates the comparisons of an MQ selection string against message
+        properties: = <> < > <= >=, AND, OR, NOT, parentheses, numbers,
+        'strings', TRUE and FALSE. A missing property compares as false.
+    """
+    COMPARISONS = {"=": operator.eq, "<>": operator.ne, "<": operator.lt,
+                   ">": operator.gt, "<=": operator.le, ">=": operator.ge}
+    TOKENS = re.compile(r"\s*(?:(\d+\.\d*|\.\d+|\d+)|('(?:[^']|'')*')|(<>|<=|>=|!=|[=<>()])|([A-Za-z_][\w.]*))")
+
+    def __init__(self, text: str):
+        self.tokens = self.tokenize(text)
+        self.pos = 0
+        self.tree = self.parse_or()
+        if self.pos != len(self.tokens):
+            raise _failed(CMQC.MQRC_SELECTION_STRING_ERROR)
+
+    def tokenize(self, text):
+        tokens, pos = [], 0
+        text = text.strip()
+        while pos < len(text):
+            m = self.TOKENS.match(text, pos)
+            if not m:
+                raise _failed(CMQC.MQRC_SELECTION_STRING_ERROR)
+            number, string, op, word = m.groups()
+            if number:
+                tokens.append(("value", float(number) if "." in number else int(number)))
+            elif string:
+                tokens.append(("value", string[1:-1].replace("''", "'")))
+            elif op:
+                tokens.append(("op", "<>" if op == "!=" else op))
+            elif word.upper() in ("AND", "OR", "NOT"):
+                tokens.append(("op", word.upper()))
+            elif word.upper() in ("TRUE", "FALSE"):
+                tokens.append(("value", word.upper() == "TRUE"))
+            else:
+                tokens.append(("name", word))
+            pos = m.end()
+        return tokens
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, op=None):
+        token = self.peek()
+        if token[0] is None or (op is not None and token != ("op", op)):
+            raise _failed(CMQC.MQRC_SELECTION_STRING_ERROR)
+        self.pos += 1
+        return token
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek() == ("op", "OR"):
+            self.take()
+            node = ("OR", node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.peek() == ("op", "AND"):
+            self.take()
+            node = ("AND", node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.peek() == ("op", "NOT"):
+            self.take()
+            return ("NOT", self.parse_not())
+        if self.peek() == ("op", "("):
+            self.take()
+            node = self.parse_or()
+            self.take(")")
+            return node
+        left = self.take()
+        if self.peek()[0] == "op" and self.peek()[1] in self.COMPARISONS:
+            op = self.take()[1]
+            return (op, left, self.take())
+        return ("=", left, ("value", True))
+
+    def operand(self, token, properties):
+        kind, value = token
+        return properties.get(value) if kind == "name" else value
+
+    def evaluate(self, properties: dict, node=None) -> bool:
+        node = node or self.tree
+        op = node[0]
+        if op == "OR":
+            return self.evaluate(properties, node[1]) or self.evaluate(properties, node[2])
+        if op == "AND":
+            return self.evaluate(properties, node[1]) and self.evaluate(properties, node[2])
+        if op == "NOT":
+            return not self.evaluate(properties, node[1])
+        left, right = self.operand(node[1], properties), self.operand(node[2], properties)
+        if left is None or right is None:
+            return False
+        try:
+            return self.COMPARISONS[op](left, right)
+        except TypeError:
+            return False
+
+
+def topic_matches(pattern: str, topic: str) -> bool:
+    """MQ wildcard topic match: '#' matches any number of levels, '+' exactly one."""
+    pattern_levels, topic_levels = pattern.split('/'), topic.split('/')
+    for i, level in enumerate(pattern_levels):
+        if level == '#':
+            return True
+        if i >= len(topic_levels) or (level != '+' and level != topic_levels[i]):
+            return False
+    return len(pattern_levels) == len(topic_levels)
+
+
+class Broker:
+    """
+        Queues, subscriptions and units of work shared by the connections of
+        this process, or of every process attached to the same broker address.
+        Messages are (bytes, descriptor dict, properties dict) tuples.
+    """
+
+    def __init__(self):
+        self.queues = collections.defaultdict(collections.deque)
+        self.condition = threading.Condition()
+        self.units = {}
+        self.subscriptions = {}
+        self.cursors = {}
+        self.sequence = itertools.count(1)
+
+    def connect(self) -> int:
+        conn = next(self.sequence)
+        with self.condition:
+            self.units[conn] = []
+        return conn
+
+    def disconnect(self, conn: int):
+        # As with MQDISC, outstanding work is committed
+        self.commit(conn)
+        with self.condition:
+            self.units.pop(conn, None)
+
+    def dynamic_name(self, prefix: str) -> str:
+        return prefix.replace('*', '%08X' % next(self.sequence)) if '*' in prefix \
+            else prefix + '%08X' % next(self.sequence)
+
+    def delete(self, name: str):
+        with self.condition:
+            self.queues.pop(name, None)
+
+    def depth(self, name: str) -> int:
+        with self.condition:
+            return len(self.queues.get(name, ()))
+
+    def put(self, conn: int, name: str, message, syncpoint: bool = False):
+        with self.condition:
+            if syncpoint:
+                self.units[conn].append(("put", name, message))
+                return
+            self.queues[name].append(message)
+            self.condition.notify_all()
+
+    def get(self, conn: int, name: str, wait: float, msg_id=None, correl_id=None, syncpoint: bool = False):
+        deadline = time.monotonic() + wait
+        with self.condition:
+            while True:
+                queue = self.queues[name]
+                if any(_expired(message) for message in queue):
+                    self.queues[name] = queue = collections.deque(m for m in queue if not _expired(m))
+                for i, message in enumerate(queue):
+                    descriptor = message[1]
+                    if msg_id is not None and descriptor["MsgId"] != msg_id:
+                        continue
+                    if correl_id is not None and descriptor["CorrelId"] != correl_id:
+                        continue
+                    del queue[i]
+                    # Like a browse cursor position, forget the message once it is gone
+                    for seen in self.cursors.values():
+                        seen.discard(descriptor["MsgId"])
+                    if syncpoint:
+                        self.units[conn].append(("get", name, message))
+                    return message
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise _failed(CMQC.MQRC_NO_MSG_AVAILABLE)
+                self.condition.wait(remaining)
+
+    def browse(self, cursor, name: str, wait: float, first: bool = False, msg_id=None, correl_id=None):
+        """Return the next message not yet seen by this browse cursor, leaving it on the queue."""
+        deadline = time.monotonic() + wait
+        with self.condition:
+            seen = self.cursors.setdefault(cursor, set())
+            if first:
+                seen.clear()
+            while True:
+                for message in self.queues[name]:
+                    descriptor = message[1]
+                    if descriptor["MsgId"] in seen or _expired(message):
+                        continue
+                    if msg_id is not None and descriptor["MsgId"] != msg_id:
+                        continue
+                    if correl_id is not None and descriptor["CorrelId"] != correl_id:
+                        continue
+                    seen.add(descriptor["MsgId"])
+                    return message
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise _failed(CMQC.MQRC_NO_MSG_AVAILABLE)
+                self.condition.wait(remaining)
+
+    def close_cursor(self, cursor):
+        with self.condition:
+            self.cursors.pop(cursor, None)
+
+    def commit(self, conn: int):
+        with self.condition:
+            work, self.units[conn] = self.units.get(conn, []), []
+            for action, name, message in work:
+                if action == "put":
+                    self.queues[name].append(message)
+            self.condition.notify_all()
+
+    def backout(self, conn: int):
+        with self.condition:
+            work, self.units[conn] = self.units.get(conn, []), []
+            for action, name, (body, descriptor, properties) in reversed(work):
+                if action == "get":
+                    descriptor = dict(descriptor, BackoutCount=descriptor.get("BackoutCount", 0) + 1)
+                    self.queues[name].appendleft((body, descriptor, properties))
+            self.condition.notify_all()
+
+    def subscribe(self, topic_string: str, queue_name: str, selector: str = None) -> int:
+        sub_id = next(self.sequence)
+        with self.condition:
+            self.subscriptions[sub_id] = (topic_string, queue_name, Selector(selector) if selector else None)
+        return sub_id
+
+    def unsubscribe(self, sub_id: int):
+        with self.condition:
+            if self.subscriptions.pop(sub_id, None) is None:
+                raise _failed(CMQC.MQRC_NO_SUBSCRIPTION)
+
+    def publish(self, conn: int, topic_string: str, message, syncpoint: bool = False) -> int:
+        body, descriptor, properties = message
+        delivered = 0
+        with self.condition:
+            for pattern, queue_name, selector in list(self.subscriptions.values()):
+                if topic_matches(pattern, topic_string) and (selector is None or selector.evaluate(properties)):
+                    self.put(conn, queue_name, (body, dict(descriptor), properties), syncpoint)
+                    delivered += 1
+        return delivered
+
+
+_local_broker = Broker()
+_remote_broker = None
+
+
+class _BrokerManager(BaseManager):
+    pass
+
+
+def _address(value: str):
+    host, _, port = value.rpartition(':')
+    return (host or '127.0.0.1', int(port)) if port.isdigit() else value
+
+
+def _authkey() -> bytes:
+    return os.getenv(AUTHKEY, DEFAULT_AUTHKEY).encode()
+
+
+def broker():
+    """The broker for this process: the one at MQ_LOOPBACK_ADDRESS if set, otherwise in process."""
+    global _remote_broker
+    address = os.getenv(ADDRESS)
+    if not address:
+        return _local_broker
+    if _remote_broker is None:
+        _BrokerManager.register('broker')
+        manager = _BrokerManager(address=_address(address), authkey=_authkey())
+        manager.connect()
+        _remote_broker = manager.broker()
+        logger.info('Connected to loopback broker at %s', address)
+    return _remote_broker
+
+
+def serve(address: str):
+    """Serve this process's broker to the agents on the host."""
+    _BrokerManager.register('broker', callable=lambda: _local_broker)
+    manager = _BrokerManager(address=_address(address), authkey=_authkey())
+    logger.info('Loopback broker listening on %s', address)
+    manager.get_server().serve_forever()
+
+
+class QueueManager:
+    def __init__(self, name=None):
+        self.broker = None
+        self.conn = None
+
+    def connect_with_options(self, name, *args, **kwargs):
+        self.broker = broker()
+        self.conn = self.broker.connect()
+
+    def commit(self):
+        self.broker.commit(self.conn)
+
+    def backout(self):
+        self.broker.backout(self.conn)
+
+    def disconnect(self):
+        if self.conn is not None:
+            self.broker.disconnect(self.conn)
+            self.conn = None
+
+
+_handles = weakref.WeakValueDictionary()
+_handle_ids = itertools.count(1)
+
+
+class _Properties(dict):
+    def set(self, name, value, property_type=None, value_length=None, **kwargs):
+        self[_name(name)] = value
+
+    def get(self, name, default=None, *args, **kwargs):
+        name = _name(name)
+        if name not in self:
+            raise _failed(CMQC.MQRC_PROPERTY_NOT_AVAILABLE)
+        return self[name]
+
+
+class MessageHandle:
+    def __init__(self, qmgr=None, cmho=None):
+        self.msg_handle = next(_handle_ids)
+        self.properties = _Properties()
+        _handles[self.msg_handle] = self
+
+
+def _expired(message) -> bool:
+    expires_at = message[1].get("_expires_at")
+    return expires_at is not None and expires_at < time.time()
+
+
+def _outgoing(message, md, pmo):
+    md = md if md is not None else MD()
+    if md.MsgId == CMQC.MQMI_NONE or (pmo is not None and pmo.Options & CMQC.MQPMO_NEW_MSG_ID):
+        md.MsgId = os.urandom(24)
+    if pmo is not None and pmo.Options & CMQC.MQPMO_NEW_CORREL_ID:
+        md.CorrelId = os.urandom(24)
+    properties = {}
+    if pmo is not None and pmo.OriginalMsgHandle in _handles:
+        properties = dict(_handles[pmo.OriginalMsgHandle].properties)
+    if isinstance(message, str):
+        message = message.encode()
+    syncpoint = pmo is not None and bool(pmo.Options & CMQC.MQPMO_SYNCPOINT)
+    descriptor = dict(md.__dict__)
+    if md.Expiry > 0:
+        # Expiry is in tenths of a second
+        descriptor["_expires_at"] = time.time() + md.Expiry / 10.0
+    return (message, descriptor, properties), syncpoint
+
+
+class Queue:
+    def __init__(self, qmgr, od=None, options=None):
+        self.qmgr = qmgr
+        self.name = None
+        self.dynamic = False
+        if od is not None:
+            self.open(od, options)
+
+    def open(self, od, options=None):
+        if isinstance(od, OD) and _name(od.DynamicQName):
+            self.name = self.qmgr.broker.dynamic_name(_name(od.DynamicQName))
+            self.dynamic = True
+            od.ObjectName = self.name.encode()
+        else:
+            self.name = _name(od.ObjectName if isinstance(od, OD) else od)
+
+    def put(self, message, md=None, pmo=None):
+        outgoing, syncpoint = _outgoing(message, md, pmo)
+        self.qmgr.broker.put(self.qmgr.conn, self.name, outgoing, syncpoint)
+
+    def get(self, max_length=None, md=None, gmo=None):
+        gmo = gmo if gmo is not None else GMO()
+        wait = gmo.WaitInterval / 1000.0 if gmo.Options & CMQC.MQGMO_WAIT else 0
+        msg_id = correl_id = None
+        if md is not None and gmo.MatchOptions & CMQC.MQMO_MATCH_MSG_ID and md.MsgId != CMQC.MQMI_NONE:
+            msg_id = md.MsgId
+        if md is not None and gmo.MatchOptions & CMQC.MQMO_MATCH_CORREL_ID and md.CorrelId != CMQC.MQCI_NONE:
+            correl_id = md.CorrelId
+        if gmo.Options & (CMQC.MQGMO_BROWSE_FIRST | CMQC.MQGMO_BROWSE_NEXT):
+            body, descriptor, properties = self.qmgr.broker.browse(
+                self.cursor(), self.name, wait, bool(gmo.Options & CMQC.MQGMO_BROWSE_FIRST), msg_id, correl_id)
+        else:
+            body, descriptor, properties = self.qmgr.broker.get(
+                self.qmgr.conn, self.name, wait, msg_id, correl_id, bool(gmo.Options & CMQC.MQGMO_SYNCPOINT))
+        if md is not None:
+            md.__dict__.update({key: value for key, value in descriptor.items() if not key.startswith("_")})
+        if gmo.Options & CMQC.MQGMO_PROPERTIES_IN_HANDLE and gmo.MsgHandle in _handles:
+            handle = _handles[gmo.MsgHandle].properties
+            handle.clear()
+            handle.update(properties)
+        return body
+
+    def cursor(self) -> str:
+        return f"{self.qmgr.conn}:{id(self)}"
+
+    def close(self, options=None):
+        self.qmgr.broker.close_cursor(self.cursor())
+        # Temporary dynamic queues are deleted when closed
+        if self.dynamic:
+            self.qmgr.broker.delete(self.name)
+
+
+class Topic:
+    def __init__(self, qmgr, topic_name=None, topic_string=None, **kwargs):
+        self.qmgr = qmgr
+        self.topic_string = _name(topic_string or topic_name or "")
+
+    def open(self, **kwargs):
+        pass
+
+    def pub(self, message, md=None, pmo=None):
+        outgoing, syncpoint = _outgoing(message, md, pmo)
+        self.qmgr.broker.publish(self.qmgr.conn, self.topic_string, outgoing, syncpoint)
+
+    def close(self, options=None):
+        pass
+
+
+class Subscription:
+    def __init__(self, qmgr):
+        self.qmgr = qmgr
+        self.sub_id = None
+        self.sub_queue = None
+
+    def sub(self, sub_desc=None, sub_queue=None, **kwargs):
+        if sub_queue is None:
+            od = OD(DynamicQName=b"SYSTEM.MANAGED.NDURABLE.*")
+            sub_queue = Queue(self.qmgr, od, CMQC.MQOO_INPUT_AS_Q_DEF)
+        self.sub_queue = sub_queue
+        selector = _name(sub_desc.SelectionString or "") if sub_desc is not None else ""
+        self.sub_id = self.qmgr.broker.subscribe(_name(sub_desc.ObjectString), sub_queue.name, selector or None)
+
+    def get(self, max_length=None, md=None, gmo=None):
+        return self.sub_queue.get(max_length, md, gmo)
+
+    def close(self, sub_close_options=None, close_sub_queue=False, **kwargs):
+        if self.sub_id is not None:
+            self.qmgr.broker.unsubscribe(self.sub_id)
+            self.sub_id = None
+        if close_sub_queue and self.sub_queue is not None:
+            self.sub_queue.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a loopback broker to the agents on this host.")
+    parser.add_argument("--address", default=os.getenv(ADDRESS, "127.0.0.1:50100"),
+                        help="host:port or a unix socket path")
+    serve(parser.parse_args().address)
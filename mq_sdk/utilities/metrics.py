@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Low overhead counters, gauges and latency histograms for the MQ hot path.
+
+Everything is recorded into the process-wide `metrics` registry, which can be
+scraped in Prometheus text format (start_metrics_server) and forwarded to any
+number of additional sinks (add_sink).
+"""
+
+import bisect
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds, roughly x2.5 apart from 50us to 2 minutes
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum", "_lock")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile."""
+        with self._lock:
+            target = q * self.count
+            seen = 0
+            for bound, n in zip(self.buckets, self.counts):
+                seen += n
+                if seen >= target and self.count:
+                    return bound
+        return float("inf") if self.count else 0.0
+
+
+class Counter:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge(Counter):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+
+class MetricsSink:
+    """
+        Receives every recorded value. Subclass to forward metrics elsewhere
+        (StatsD, OpenTelemetry, logs...).
+    """
+    def observe(self, name: str, labels: Labels, value: float):
+        pass
+
+    def inc(self, name: str, labels: Labels, amount: float):
+        pass
+
+    def set(self, name: str, labels: Labels, value: float):
+        pass
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "labels", "start")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.enabled = True
+        self._lock = threading.Lock()
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.counters: Dict[Tuple[str, Labels], Counter] = {}
+        self.gauges: Dict[Tuple[str, Labels], Gauge] = {}
+        self.sinks: List[MetricsSink] = []
+
+    def add_sink(self, sink: MetricsSink):
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink: MetricsSink):
+        self.sinks.remove(sink)
+
+    def _get(self, store, cls, name, labels):
+        key = (name, labels)
+        metric = store.get(key)
+        if metric is None:
+            with self._lock:
+                metric = store.setdefault(key, cls())
+        return metric
+
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        labels = tuple(sorted(labels.items()))
+        self._get(self.histograms, Histogram, name, labels).observe(value)
+        for sink in self.sinks:
+            sink.observe(name, labels, value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        if not self.enabled:
+            return
+        labels = tuple(sorted(labels.items()))
+        self._get(self.counters, Counter, name, labels).inc(amount)
+        for sink in self.sinks:
+            sink.inc(name, labels, amount)
+
+    def gauge(self, name: str, amount: float = 1, **labels):
+        """Move a gauge by amount (negative to decrease)."""
+        if not self.enabled:
+            return
+        labels = tuple(sorted(labels.items()))
+        metric = self._get(self.gauges, Gauge, name, labels)
+        metric.inc(amount)
+        for sink in self.sinks:
+            sink.set(name, labels, metric.value)
+
+    def timer(self, name: str, **labels) -> _Timer:
+        """
+            with metrics.timer("mq_put_seconds", component="request"):
+                queue.put(...)
+        """
+        return _Timer(self, name, labels)
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join('%s="%s"' % (k, str(v).replace('"', '\\"')) for k, v in pairs) + "}"
+
+        typed = set()
+        for kind, items in (("counter", counters), ("gauge", gauges)):
+            for (name, labels), metric in items:
+                if name not in typed:
+                    lines.append(f"# TYPE {name} {kind}")
+                    typed.add(name)
+                lines.append(f"{name}{fmt(labels)} {metric.value:g}")
+        for (name, labels), hist in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            with hist._lock:
+                counts, count, total = list(hist.counts), hist.count, hist.sum
+            cumulative = 0
+            for bound, n in zip(hist.buckets, counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{fmt(labels, [('le', f'{bound:g}')])} {cumulative}")
+            lines.append(f"{name}_bucket{fmt(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{fmt(labels)} {total:.6f}")
+            lines.append(f"{name}_count{fmt(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+
+metrics = MetricsRegistry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = metrics
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def start_metrics_server(port: int = 9464, host: str = "127.0.0.1", registry: MetricsRegistry = metrics):
+    """
+        Serve the registry in Prometheus text format on http://host:port/metrics
+        from a daemon thread. Returns the server; call shutdown() to stop it.
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info("Serving metrics on http://%s:%d/metrics", host, server.server_address[1])
+    return server
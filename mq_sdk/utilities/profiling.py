@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+On-demand profiling of a running agent.
+
+The listener threads run every message through profiler.message(). While the
+profiler is off that returns a shared no-op context, so it costs nothing.
+A profiling session is started for a number of seconds or messages by a signal
+(SIGUSR1 toggles it, SIGUSR2 dumps the stacks of every thread) or by a command
+on the agent's profiling control queue, and writes to PROFILE_DIR:
+
+    sampling   <session>.folded - stacks of all threads sampled every few ms,
+               in the collapsed format read by flamegraph tools
+    cprofile   <session>-<msgid>.prof - a deterministic profile of a message
+               handled, readable with pstats or snakeviz. Only one profiler can
+               be active in a process, so messages handled while another one is
+               being profiled are not
+
+together with <session>.json listing the messages handled during the session.
+"""
+
+import collections
+import contextlib
+import cProfile
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODES = ("sampling", "cprofile")
+DEFAULT_DIR = "profiles"
+_NOOP = contextlib.nullcontext()
+
+
+def message_tag(msg_id) -> str:
+    if isinstance(msg_id, bytes):
+        return msg_id.hex()
+    return str(msg_id) if msg_id is not None else "none"
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, interval: float):
+        super().__init__(name="profiling-sampler", daemon=True)
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        names = {}
+        while not self._stop_event.wait(self.interval):
+            names.update({t.ident: t.name for t in threading.enumerate()})
+            for ident, frame in sys._current_frames().items():
+                if ident == self.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class Profiler:
+    def __init__(self, directory: str = None):
+        self.directory = directory or os.getenv("PROFILE_DIR", DEFAULT_DIR)
+        self.active = False
+        self._lock = threading.Lock()
+        # Held by the message being profiled in cprofile mode
+        self._cprofile_lock = threading.Lock()
+        self._session = None
+
+    def start(self, mode: str = "sampling", seconds: float = None, messages: int = None,
+              interval: float = 0.005) -> bool:
+        """
+            Start a session that stops after the given seconds or messages, whichever comes first.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiling mode '{mode}', expected one of {', '.join(MODES)}")
+        with self._lock:
+            if self.active:
+                return False
+            os.makedirs(self.directory, exist_ok=True)
+            name = f"{mode}-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}"
+            self._session = {
+                "name": name,
+                "mode": mode,
+                "started": time.time(),
+                "limit_messages": messages,
+                "messages": [],
+                "sampler": _Sampler(interval) if mode == "sampling" else None,
+                "timer": threading.Timer(seconds, self.stop) if seconds else None,
+            }
+            if self._session["sampler"]:
+                self._session["sampler"].start()
+            if self._session["timer"]:
+                self._session["timer"].daemon = True
+                self._session["timer"].start()
+            self.active = True
+        logger.info("Profiling started: %s for %s seconds, %s messages", name, seconds, messages)
+        return True
+
+    def stop(self) -> str:
+        """Stop the session and write its files. Returns the path of the session manifest."""
+        with self._lock:
+            if not self.active:
+                return None
+            self.active = False
+            session, self._session = self._session, None
+        if session["timer"]:
+            session["timer"].cancel()
+        base = os.path.join(self.directory, session["name"])
+        manifest = {
+            "mode": session["mode"],
+            "pid": os.getpid(),
+            "started": session["started"],
+            "stopped": time.time(),
+            "messages": session["messages"],
+        }
+        sampler = session["sampler"]
+        if sampler:
+            sampler.stop()
+            with open(base + ".folded", "w") as f:
+                for stack, count in sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            manifest["samples"] = sampler.samples
+        with open(base + ".json", "w") as f:
+            json.dump(manifest, f, indent=2)
+        logger.info("Profiling stopped, written to %s.*", base)
+        return base + ".json"
+
+    def toggle(self, **kwargs):
+        return self.stop() if self.active else self.start(**kwargs)
+
+    def message(self, msg_id=None, kind: str = "message"):
+        """
+            Context for handling one message. A no-op unless a session is running.
+        """
+        if not self.active:
+            return _NOOP
+        return self._profile_message(message_tag(msg_id), kind)
+
+    @contextlib.contextmanager
+    def _profile_message(self, tag: str, kind: str):
+        session = self._session
+        if session is None:
+            yield
+            return
+        profile = None
+        if session["mode"] == "cprofile" and self._cprofile_lock.acquire(blocking=False):
+            try:
+                profile = cProfile.Profile()
+                profile.enable()
+            except Exception as e:
+                # e.g. another profiling tool is active, the message is handled unprofiled
+                logger.warning("Cannot profile message %s: %s", tag, e)
+                profile = None
+                self._cprofile_lock.release()
+        started = time.time()
+        try:
+            yield
+        finally:
+            # Profiling must never fail the handler
+            try:
+                if profile:
+                    try:
+                        profile.disable()
+                        profile.dump_stats(os.path.join(self.directory, f"{session['name']}-{tag}.prof"))
+                    finally:
+                        self._cprofile_lock.release()
+                with self._lock:
+                    session["messages"].append({
+                        "msg_id": tag,
+                        "kind": kind,
+                        "thread": threading.current_thread().name,
+                        "started": started,
+                        "seconds": round(time.time() - started, 6),
+                        "profiled": profile is not None,
+                    })
+                    done = session["limit_messages"] and len(session["messages"]) >= session["limit_messages"]
+                if done:
+                    self.stop()
+            except Exception as e:
+                logger.error("Profiling of message %s failed: %s", tag, e)
+
+    def dump_stacks(self, path: str = None) -> str:
+        """Write the current stack of every thread."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = path or os.path.join(self.directory, f"stacks-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.txt")
+        names = {t.ident: t.name for t in threading.enumerate()}
+        with open(path, "w") as f:
+            for ident, frame in sys._current_frames().items():
+                f.write(f"Thread {names.get(ident, ident)} ({ident}):\n")
+                f.write("".join(traceback.format_stack(frame)))
+                f.write("\n")
+        logger.info("Thread stacks written to %s", path)
+        return path
+
+    def command(self, command: dict):
+        """
+            Apply a control command, e.g. {"command": "start", "mode": "cprofile", "messages": 20},
+            {"command": "stop"} or {"command": "dump_stacks"}.
+        """
+        action = command.get("command")
+        if action == "start":
+            return self.start(mode=command.get("mode", "sampling"), seconds=command.get("seconds"),
+                              messages=command.get("messages"), interval=command.get("interval", 0.005))
+        if action == "stop":
+            return self.stop()
+        if action == "dump_stacks":
+            return self.dump_stacks()
+        logger.error("Unknown profiling command %s", action)
+        return None
+
+
+profiler = Profiler()
+
+
+def install_signal_handlers(profiler: Profiler = profiler):
+    """
+        SIGUSR1 starts or stops a session (PROFILE_MODE, PROFILE_SECONDS and
+        PROFILE_MESSAGES set its defaults), SIGUSR2 dumps the thread stacks.
+        Must be called from the main thread.
+    """
+    if not hasattr(signal, "SIGUSR1"):
+        logger.info("Profiling signals are not available on this platform")
+        return False
+
+    def toggle(signum, frame):
+        seconds = os.getenv("PROFILE_SECONDS")
+        messages = os.getenv("PROFILE_MESSAGES")
+        # Write the files off the signal handler
+        threading.Thread(target=profiler.toggle, daemon=True, kwargs=dict(
+            mode=os.getenv("PROFILE_MODE", "sampling"),
+            seconds=float(seconds) if seconds else None,
+            messages=int(messages) if messages else None,
+        )).start()
+
+    def dump(signum, frame):
+        threading.Thread(target=profiler.dump_stacks, daemon=True).start()
+
+    signal.signal(signal.SIGUSR1, toggle)
+    signal.signal(signal.SIGUSR2, dump)
+    return True
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import weakref
+
+from .transport import pymqi
+
+# pymqi cannot delete message handles (no MQDLTMH), they live until the connection
+# is closed. Handles are reused per connection, for each set of property names.
+_handles = weakref.WeakKeyDictionary()
+
+
+def property_type(value):
+    """MQ property type for a Python value."""
+    if isinstance(value, bool):
+        return pymqi.CMQC.MQTYPE_BOOLEAN, 4
+    if isinstance(value, int):
+        return pymqi.CMQC.MQTYPE_INT64, 8
+    if isinstance(value, float):
+        return pymqi.CMQC.MQTYPE_FLOAT64, 8
+    return pymqi.CMQC.MQTYPE_STRING, pymqi.CMQC.MQVL_NULL_TERMINATED
+
+
+def _cached_handle(qmgr, key) -> pymqi.MessageHandle:
+    handles = _handles.setdefault(qmgr, {})
+    if key not in handles:
+        handles[key] = pymqi.MessageHandle(qmgr)
+    return handles[key]
+
+
+def build_message_handle(qmgr, properties: dict) -> pymqi.MessageHandle:
+    """
+        Message handle carrying the given properties with their MQ types,
+        so selectors can compare them as numbers or strings.
+    """
+    properties = {name: value for name, value in properties.items() if value is not None}
+    handle = _cached_handle(qmgr, tuple(sorted(properties)))
+    for name, value in properties.items():
+        mq_type, length = property_type(value)
+        if mq_type == pymqi.CMQC.MQTYPE_STRING:
+            value = str(value)
+        handle.properties.set(name.encode('utf-8'), value, property_type=mq_type, value_length=length)
+    return handle
+
+
+def put_options_with_properties(qmgr, properties: dict, pmo: pymqi.PMO = None) -> pymqi.PMO:
+    """
+        Put message options that attach the properties to the message being put.
+    """
+    pmo = pmo or pymqi.PMO()
+    if properties:
+        pmo.Version = pymqi.CMQC.MQPMO_VERSION_3
+        pmo.OriginalMsgHandle = build_message_handle(qmgr, properties).msg_handle
+    return pmo
+
+
+def get_options_with_properties(qmgr, gmo: pymqi.GMO) -> pymqi.MessageHandle:
+    """
+        Ask for the properties of the message being got to be returned in a message
+        handle, instead of being discarded. Returns the handle to read them from.
+    """
+    handle = _cached_handle(qmgr, None)
+    gmo.Version = pymqi.CMQC.MQGMO_VERSION_4
+    gmo.MsgHandle = handle.msg_handle
+    gmo.Options = (gmo.Options & ~pymqi.CMQC.MQGMO_NO_PROPERTIES) | pymqi.CMQC.MQGMO_PROPERTIES_IN_HANDLE
+    return handle
+
+
+def read_property(handle: pymqi.MessageHandle, name: str, default=None):
+    """
+        Value of a property of the message got into handle, or default if it has none.
+    """
+    try:
+        value = handle.properties.get(name.encode('utf-8'))
+    except pymqi.MQMIError:
+        return default
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', 'ignore')
+    if isinstance(value, str):
+        value = value.rstrip('\x00')
+    return default if value is None else value
@@ -13,19 +13,33 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
+import itertools
 import json
-import pymqi
+import time
+from .transport import pymqi
 import logging
+from .async_put import AsyncPutter
 from .env import EnvStore
+from .metrics import metrics
+from .qos import policy_for, REQUEST
+from mq_sdk.utilities.constants import NETWORK_TYPE
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class MQPut:
-    def __init__(self):
+    """
+      Puts dicts as JSON messages on the QUEUE_NAME of the env.json in ccdt_path.
+      With asynchronous=True puts do not wait for their completion status; they are
+      committed every flush_every messages or flush_interval seconds and on flush(),
+      and failures go to on_failure(messages, error). put_many loads messages in bulk.
+    """
+    def __init__(self, ccdt_path: str = "../../", network_type: NETWORK_TYPE = NETWORK_TYPE.OUTBOUND_NETWORK,
+                 asynchronous=False, flush_every=100, flush_interval=1.0, on_failure=None):
         self.logger = logger
         # Initialize EnvStore
-        self.envStore = EnvStore("../../")
+        self.envStore = EnvStore(ccdt_path, network_type=network_type)
         self.envStore.setEnv()
 
         # Build MQDetails and credentials dictionaries
@@ -43,11 +57,20 @@ class MQPut:
         # Initialize connection and queue attributes
         self.qmgr = None
         self.queue = None
+        self.putter = None
+        self.on_failure = on_failure
+        self.qos = policy_for(REQUEST, self.envStore)
 
         # Connect to Queue Manager and open the queue
         self._connect()
         if self.qmgr:
             self._get_queue()
+            if asynchronous:
+                self.putter = AsyncPutter(self.qmgr,
+                                          flush_every=flush_every,
+                                          flush_interval=flush_interval,
+                                          on_failure=on_failure,
+                                          component='put')
 
     def _build_mq_details(self):
         """Populate MQDetails using environment values."""
@@ -127,14 +150,87 @@ class MQPut:
             # Create a string from the message object and modify it for versioning if necessary.
             msg_str = json.dumps(message)
             final_msg = self.envStore.stringForVersion(msg_str)
-            self.queue.put(final_msg, md)
+            pmo = self.qos.apply(md)
+            if self.putter is not None:
+                self.putter.put(self.queue, final_msg, md, pmo)
+                return
+            self.queue.put(final_msg, md, pmo)
+            if self.qos.syncpoint:
+                self.qmgr.commit()
             self.logger.info("Put message successful")
         except pymqi.MQMIError as e:
             self.logger.error("Error in putting message to queue")
             self.logger.error(e)
 
+    def put_many(self, messages, batch_size: int = 100) -> dict:
+        """
+        Put every message of an iterable, which is consumed lazily, committing once per
+        batch_size messages. Dicts are JSON-dumped, str and bytes are put as they are.
+        The MD and put options are built once and reused for every message. A batch that
+        fails is backed out and its messages passed to on_failure(messages, error).
+        With asynchronous=True, the puts pending are committed before each batch, which
+        holds off the background flushes until it is committed.
+        Returns the counts and the put+commit time of each batch.
+        """
+        encode = json.JSONEncoder().encode
+        md = pymqi.MD()
+        md.Format = pymqi.CMQC.MQFMT_STRING
+        pmo = self.qos.apply(md)
+        # Unique MsgIds without resetting the reused MD, and one unit of work per batch
+        pmo.Options = (pmo.Options & ~pymqi.CMQC.MQPMO_NO_SYNCPOINT) | \
+                        pymqi.CMQC.MQPMO_SYNCPOINT | pymqi.CMQC.MQPMO_NEW_MSG_ID
+        if self.putter is not None:
+            pmo.Options |= pymqi.CMQC.MQPMO_ASYNC_RESPONSE
+
+        report = {'messages': 0, 'failed': 0, 'batches': []}
+        iterator = iter(messages)
+        while True:
+            batch = list(itertools.islice(iterator, batch_size))
+            if not batch:
+                break
+            bodies = [m if isinstance(m, bytes) else
+                      self.envStore.stringForVersion(m if isinstance(m, str) else encode(m))
+                      for m in batch]
+            start = time.perf_counter()
+            # The putter's flush thread must not commit part of the batch, and its own
+            # pending puts are committed first, so a backout of the batch does not lose them
+            with self.putter.locked() if self.putter is not None else contextlib.nullcontext():
+                if self.putter is not None:
+                    self.putter.flush()
+                try:
+                    for body in bodies:
+                        self.queue.put(body, md, pmo)
+                    self.qmgr.commit()
+                    ok = True
+                except pymqi.MQMIError as e:
+                    ok = False
+                    self.logger.error("Error in putting batch of %d messages to queue" % len(bodies))
+                    self.logger.error(e)
+                    try:
+                        self.qmgr.backout()
+                    except pymqi.MQMIError:
+                        pass
+                    if self.on_failure is not None:
+                        self.on_failure(batch, e)
+            seconds = time.perf_counter() - start
+            metrics.observe('mq_batch_seconds', seconds, component='put')
+            report['messages'] += len(bodies)
+            report['failed'] += 0 if ok else len(bodies)
+            report['batches'].append({'messages': len(bodies), 'seconds': seconds, 'ok': ok})
+        self.logger.info("Put %d messages in %d batches, %d failed" %
+                         (report['messages'], len(report['batches']), report['failed']))
+        return report
+
+    def flush(self):
+        """Commit the asynchronous puts made so far. Returns False if any of them failed."""
+        if self.putter is None:
+            return True
+        return self.putter.flush()
+
     def disconnect(self):
         """Close the queue and disconnect from the Queue Manager."""
+        if self.putter is not None:
+            self.putter.close()
         if self.queue:
             try:
                 self.queue.close()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Quality of service per message class.
+
+Each class of message the SDK sends gets a policy for persistence, expiry,
+priority and syncpoint, applied to its MD and put options. Transient traffic,
+such as price updates superseded by the next snapshot, is sent non-persistent
+and expires, so the queue manager does not log it. Requests and messages moved
+to the retry or backout queues stay persistent.
+
+The defaults can be changed per agent in its env.json, e.g.
+"QOS_STATE_UPDATE": "persistent=false,expiry=30,priority=3".
+"""
+
+from .env import EnvStore
+from .transport import pymqi
+
+STATE_UPDATE = 'state_update'
+REQUEST = 'request'
+REPLY = 'reply'
+RETRY = 'retry'
+BACKOUT = 'backout'
+
+
+class QoSPolicy:
+    """
+        persistent: True, False, or None for the queue's default persistence.
+        expiry: seconds the message may wait to be got, None for unlimited.
+        priority: 0 to 9, None for the queue's default priority.
+        syncpoint: put in the caller's unit of work, which it must commit.
+    """
+
+    def __init__(self, persistent: bool = None, expiry: float = None, priority: int = None,
+                 syncpoint: bool = False):
+        self.persistent = persistent
+        self.expiry = expiry
+        self.priority = priority
+        self.syncpoint = syncpoint
+
+    def apply(self, md: pymqi.MD, pmo: pymqi.PMO = None) -> pymqi.PMO:
+        """Set the policy on the message descriptor and return the put options."""
+        if self.persistent is not None:
+            md.Persistence = pymqi.CMQC.MQPER_PERSISTENT if self.persistent else pymqi.CMQC.MQPER_NOT_PERSISTENT
+        if self.expiry is not None:
+            # Expiry is in tenths of a second
+            md.Expiry = max(1, int(self.expiry * 10))
+        if self.priority is not None:
+            md.Priority = self.priority
+        pmo = pmo or pymqi.PMO()
+        if self.syncpoint:
+            pmo.Options = (pmo.Options & ~pymqi.CMQC.MQPMO_NO_SYNCPOINT) | pymqi.CMQC.MQPMO_SYNCPOINT
+        else:
+            pmo.Options = (pmo.Options & ~pymqi.CMQC.MQPMO_SYNCPOINT) | pymqi.CMQC.MQPMO_NO_SYNCPOINT
+        return pmo
+
+    def updated(self, spec: str) -> "QoSPolicy":
+        """
+            Copy of the policy with the settings of a spec such as
+            "persistent=false,expiry=30,priority=3,syncpoint=true" (expiry=none for unlimited).
+        """
+        settings = dict(vars(self))
+        for item in spec.split(','):
+            if not item.strip():
+                continue
+            name, _, value = item.partition('=')
+            name, value = name.strip().lower(), value.strip().lower()
+            if name not in settings:
+                raise ValueError(f"Unknown QoS setting {name}")
+            if value in ('', 'none', 'default'):
+                settings[name] = None if name != 'syncpoint' else False
+            elif name in ('persistent', 'syncpoint'):
+                settings[name] = value in ('true', 'yes', '1')
+            elif name == 'priority':
+                settings[name] = int(value)
+            else:
+                settings[name] = float(value)
+        return QoSPolicy(**settings)
+
+    def __repr__(self):
+        return "QoSPolicy(%s)" % ", ".join(f"{k}={v!r}" for k, v in vars(self).items())
+
+
+DEFAULT_POLICIES = {
+    # Superseded by the next snapshot, and only useful while fresh
+    STATE_UPDATE: QoSPolicy(persistent=False, expiry=60),
+    # A user's question must survive a queue manager restart
+    REQUEST: QoSPolicy(persistent=True),
+    # Replies go to temporary dynamic queues, which only hold non-persistent messages
+    REPLY: QoSPolicy(persistent=False, expiry=300),
+    # Moved in the same unit of work as the get of the failed message
+    RETRY: QoSPolicy(persistent=True, syncpoint=True),
+    BACKOUT: QoSPolicy(persistent=True, syncpoint=True),
+}
+
+
+def policy_for(message_class: str, envStore: EnvStore = None) -> QoSPolicy:
+    """
+        Policy of a message class, with the agent's QOS_<CLASS> setting applied if it has one.
+    """
+    policy = DEFAULT_POLICIES[message_class]
+    spec = envStore.getEnvValue(f"QOS_{message_class.upper()}") if envStore is not None else None
+    return policy.updated(spec.decode()) if spec else policy
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Delayed retry of failed messages.
+
+A message whose processing fails is moved to the agent's RETRY_QUEUE with
+properties recording the attempt, the queue it came from and the time before
+which it must not be retried. The retry scheduler re-injects it into that queue
+once it is due. When the attempts are used up the message goes to the
+BACKOUT_QUEUE instead.
+"""
+
+import random
+
+from .env import EnvStore
+
+RETRY_ATTEMPT = 'retry_attempt'
+RETRY_NOT_BEFORE = 'retry_not_before'
+RETRY_ORIGIN = 'retry_origin'
+
+
+class RetryPolicy:
+    """
+        Exponential backoff with equal jitter: the delay before attempt n is
+        between half and all of min(max_delay, base_delay * multiplier ** (n - 1)).
+    """
+
+    def __init__(self, max_attempts: int = 5, base_delay: float = 2.0, max_delay: float = 300.0,
+                 multiplier: float = 2.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+
+    def delay(self, attempt: int) -> float:
+        cap = min(self.max_delay, self.base_delay * self.multiplier ** max(attempt - 1, 0))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    def exhausted(self, attempt: int) -> bool:
+        return attempt >= self.max_attempts
+
+    @classmethod
+    def from_env(cls, envStore: EnvStore) -> "RetryPolicy":
+        """The policy configured for the agent, or None if it has no RETRY_QUEUE."""
+        if not envStore.getEnvValue(envStore.RETRY_QUEUE):
+            return None
+        policy = cls()
+        for key, attribute, kind in ((envStore.RETRY_MAX_ATTEMPTS, 'max_attempts', int),
+                                     (envStore.RETRY_BASE_DELAY, 'base_delay', float),
+                                     (envStore.RETRY_MAX_DELAY, 'max_delay', float)):
+            value = envStore.getEnvValue(key)
+            if value:
+                setattr(policy, attribute, kind(value.decode()))
+        return policy
@@ -13,11 +13,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import pymqi
+from .transport import pymqi
 import logging
+import threading
 import uuid
 
 from .env import EnvStore  
+from .metrics import metrics
+from .properties import get_options_with_properties
+from .wake import Waker, is_wakeup
 from mq_sdk.utilities.constants import NETWORK_TYPE
 
 logging.basicConfig(level=logging.INFO)
@@ -25,10 +29,19 @@ logger = logging.getLogger(__name__)
 
 
 class MQSubscriber:    
-    def __init__(self, ccdt_path: str):        
+    """
+      Subscribes to one or more topic strings, wildcards included, and receives
+      every publication on a single queue. Subscriptions can be added and removed
+      while the subscriber is being read. A change requested from another thread is
+      applied by the reading thread (see apply_pending), which is woken from its get
+      by a wake-up message (see mq_sdk.utilities.wake).
+    """
+    DEFAULT_MODEL_QUEUE = 'SYSTEM.DEFAULT.MODEL.QUEUE'
+
+    def __init__(self, ccdt_path: str, network_type: NETWORK_TYPE = NETWORK_TYPE.STATE_NETWORK):        
         self.envStore = EnvStore(
             ccdt_path=ccdt_path,
-            network_type=NETWORK_TYPE.STATE_NETWORK 
+            network_type=network_type
         )
         self.envStore.setEnv()
         
@@ -41,15 +54,45 @@ class MQSubscriber:
         self.conn_info = self.envStore.getConnection(self.envStore.HOST, self.envStore.PORT)
 
         self.qmgr = None
+        self.properties = None
+        self.queue = None
+        self.queue_name = None
         self.subscription = None
+        self.subscriptions = {}
+        # Selector of each subscription, by topic string
+        self.selectors = {}
+
+        self._lock = threading.Lock()
+        self._pending = []
+        self._reader = None
+        self.waker = Waker(self.newConnection, component='subscriber')
 
     def buildMQDetails(self):        
         for key in [self.envStore.QMGR, self.envStore.TOPIC_NAME, self.envStore.CHANNEL,
                     self.envStore.HOST, self.envStore.PORT, self.envStore.KEY_REPOSITORY, self.envStore.CIPHER,
-                    self.envStore.AGENT_NAME]:
+                    self.envStore.AGENT_NAME, self.envStore.MODEL_QUEUE_NAME, self.envStore.SUBSCRIPTIONS,
+                    self.envStore.SELECTOR]:
             self.MQDetails[key] = self.envStore.getEnvValue(key)
 
-    def connect(self):        
+    def topicRoot(self) -> str:
+        topic = self.MQDetails[self.envStore.TOPIC_NAME] or b''
+        return topic.decode().rstrip('/')
+
+    def defaultTopics(self):
+        """
+            SUBSCRIPTIONS from the environment (comma separated topic strings),
+            otherwise everything published under TOPIC_NAME.
+        """
+        configured = self.MQDetails[self.envStore.SUBSCRIPTIONS]
+        if configured:
+            return [t.strip() for t in configured.decode().split(',') if t.strip()]
+        return [f"{self.topicRoot()}/#"]
+
+    def connect(self):
+        self.qmgr = self.newConnection()
+        return self.qmgr
+
+    def newConnection(self):
         logger.info('Establishing connection with MQ Server')
         try:
             cd = pymqi.CD(Version=pymqi.CMQXC.MQCD_VERSION_11)
@@ -68,21 +111,60 @@ class MQSubscriber:
 
             options = pymqi.CMQC.MQPMO_NEW_CORREL_ID
 
-            self.qmgr = pymqi.QueueManager(None)
-            self.qmgr.connect_with_options(self.MQDetails[self.envStore.QMGR],
-                                           user=self.credentials[self.envStore.USER],
-                                           password=self.credentials[self.envStore.PASSWORD],
-                                           opts=options, cd=cd, sco=sco)
+            qmgr = pymqi.QueueManager(None)
+            with metrics.timer('mq_connect_seconds', component='subscriber'):
+                qmgr.connect_with_options(self.MQDetails[self.envStore.QMGR],
+                                          user=self.credentials[self.envStore.USER],
+                                          password=self.credentials[self.envStore.PASSWORD],
+                                          opts=options, cd=cd, sco=sco)
             logger.info('Connection established')
-            return self.qmgr
+            return qmgr
 
         except pymqi.MQMIError as e:
             logger.error("Error connecting to MQ Server")
             logger.error(e)
             return None
 
-    def getSubscription(self):        
+    def getQueue(self):
+        """
+            Open the temporary dynamic queue all subscriptions deliver to.
+        """
+        logger.info('Opening subscription queue')
+        try:
+            model = self.MQDetails[self.envStore.MODEL_QUEUE_NAME] or self.DEFAULT_MODEL_QUEUE
+            od = pymqi.OD()
+            od.ObjectName = model
+            od.DynamicQName = 'SUB.*'
+            with metrics.timer('mq_open_seconds', component='subscriber'):
+                self.queue = pymqi.Queue(self.qmgr, od, pymqi.CMQC.MQOO_INPUT_EXCLUSIVE)
+            metrics.gauge('mq_open_handles', 1, component='subscriber')
+            self.queue_name = od.ObjectName.strip()
+            self.waker.queue_name = self.queue_name
+            return self.queue
+        except pymqi.MQMIError as e:
+            logger.error("Error opening subscription queue")
+            logger.error(e)
+            return None
+
+    def defaultSelector(self):
+        selector = self.MQDetails[self.envStore.SELECTOR]
+        return selector.decode() if selector else None
+
+    def getSubscription(self, topic_string=None, selector=None):        
+        """
+            Subscribe topic_string to the subscription queue. An MQ selector, e.g.
+            "pct_change > 5 AND route = 'Newcastle-Faro'", is evaluated by the queue
+            manager against the publication properties, so unmatched publications
+            are never delivered. Subscribing a topic string again with the same selector
+            returns its subscription, with another selector it replaces it.
+        """
         logger.info('Connecting to subscription')
+        topic_string = topic_string or self.defaultTopics()[0]
+        if topic_string in self.subscriptions:
+            if self.selectors.get(topic_string) == selector:
+                return self.subscriptions[topic_string]
+            # Both would deliver the publications they match
+            self.closeSubscription(topic_string)
         try:
             # Generate a unique subscription name per run
             unique_sub_name = f"{self.MQDetails[self.envStore.AGENT_NAME]}_{uuid.uuid4()}"
@@ -91,25 +173,91 @@ class MQSubscriber:
             sub_desc["Options"] = (
                 pymqi.CMQC.MQSO_CREATE |
                 pymqi.CMQC.MQSO_NON_DURABLE |  # Non-durable avoids MQRC_SUBSCRIPTION_IN_USE
-                pymqi.CMQC.MQSO_MANAGED
+                pymqi.CMQC.MQSO_WILDCARD_TOPIC  # '#' and '+' match whole topic levels
             )
             sub_desc.set_vs("SubName", unique_sub_name)
-            sub_desc.set_vs("ObjectString", self.MQDetails[self.envStore.TOPIC_NAME])
+            sub_desc.set_vs("ObjectString", topic_string)
+            if selector:
+                sub_desc.set_vs("SelectionString", selector)
 
-            if self.qmgr is None:
+            if self.qmgr is None or self.queue is None:
                 logger.error("Queue manager is not connected")
                 return None
 
-            self.subscription = pymqi.Subscription(self.qmgr)
-            self.subscription.sub(sub_desc=sub_desc)
-            logger.info(f"Subscription established: {unique_sub_name}")
-            return self.subscription
+            subscription = pymqi.Subscription(self.qmgr)
+            with metrics.timer('mq_subscribe_seconds', component='subscriber'):
+                subscription.sub(sub_desc=sub_desc, sub_queue=self.queue)
+            self.subscriptions[topic_string] = subscription
+            self.selectors[topic_string] = selector
+            if self.subscription is None:
+                self.subscription = subscription
+            logger.info(f"Subscription established: {unique_sub_name} on {topic_string}"
+                        + (f" where {selector}" if selector else ""))
+            return subscription
 
         except pymqi.MQMIError as e:
             logger.error("Error creating subscription")
             logger.error(e)
             return None
-    
+
+    def closeSubscription(self, topic_string):
+        subscription = self.subscriptions.pop(topic_string, None)
+        self.selectors.pop(topic_string, None)
+        if subscription is None:
+            return False
+        if self.subscription is subscription:
+            self.subscription = next(iter(self.subscriptions.values()), None)
+        try:
+            subscription.close(sub_close_options=pymqi.CMQC.MQCO_REMOVE_SUB)
+            logger.info(f"Subscription removed: {topic_string}")
+            return True
+        except pymqi.MQMIError as e:
+            logger.error("Error removing subscription")
+            logger.error(e)
+            return False
+
+    def add_subscription(self, topic_string, selector=None):
+        """
+            Subscribe to another topic string, e.g. 'tickets/Newcastle/+/#',
+            optionally filtered by a selector.
+        """
+        self._submit(self.getSubscription, topic_string, selector)
+
+    def remove_subscription(self, topic_string):
+        self._submit(self.closeSubscription, topic_string)
+
+    def _submit(self, operation, *args):
+        with self._lock:
+            if self._reader is None or self._reader is threading.current_thread():
+                operation(*args)
+                return
+            self._pending.append((operation, args))
+        self.wake()
+
+    def wake(self):
+        """
+            Make a reading thread waiting in get return, to apply the pending
+            changes or to stop. Otherwise they wait for the end of its get.
+        """
+        return self.waker.wake()
+
+    def is_wakeup(self, md) -> bool:
+        return is_wakeup(md)
+
+    def apply_pending(self):
+        """
+            Apply subscription changes requested by other threads.
+            Called by the thread that reads the subscription queue.
+        """
+        with self._lock:
+            self._reader = threading.current_thread()
+            pending, self._pending = self._pending, []
+            for operation, args in pending:
+                operation(*args)
+
+    def get(self, md, gmo):
+        return self.queue.get(None, md, gmo)
+
     def getMessageConfig(self):
         subOptions = (
             pymqi.CMQC.MQGMO_NO_SYNCPOINT +
@@ -120,6 +268,8 @@ class MQSubscriber:
 
         gmo = pymqi.GMO(Options=subOptions)
         gmo["WaitInterval"] = 30 * 1000
+        # Publications carry their trace context as message properties
+        self.properties = get_options_with_properties(self.qmgr, gmo)
         md = pymqi.MD()        
 
         return md, gmo
@@ -130,19 +280,26 @@ class MQSubscriber:
         md.GroupId = pymqi.CMQC.MQGI_NONE 
         return md
 
-    def subscribe(self):
+    def subscribe(self, topics=None, selector=None):
         logger.info("MQSubscriber: Starting subscription process")
         self.connect()
-        if self.qmgr:
-            self.getSubscription()
+        if self.qmgr and self.getQueue():
+            # SELECTOR applies to the configured subscriptions
+            selector = selector if topics else selector or self.defaultSelector()
+            for topic_string in topics or self.defaultTopics():
+                self.getSubscription(topic_string, selector)
         return self.subscription is not None
 
     def close(self):
         try:
-            if self.subscription:
-                self.subscription.close(sub_close_options=pymqi.CMQC.MQCO_KEEP_SUB, close_sub_queue=True)
+            for topic_string in list(self.subscriptions):
+                self.closeSubscription(topic_string)
+            if self.queue:
+                self.queue.close()
+                metrics.gauge('mq_open_handles', -1, component='subscriber')
             if self.qmgr:
                 self.qmgr.disconnect()
+            self.waker.close()
             logger.info("MQSubscriber: Closed subscription and disconnected")
         except Exception as e:
             logger.error(f"Error during close: {e}")
@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Trace context propagation across MQ hops.
+
+Every put, reply and publication carries the current span as message properties
+(a W3C style `traceparent` and the time it was sent). The receiving side continues
+the trace from them, so the spans recorded by every agent process can be joined by
+trace id and a round trip split into queue wait, transit, LLM time and reply wait.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT = 'traceparent'
+TRACE_SENT_AT = 'trace_sent_at'
+
+
+class TraceContext(BaseModel):
+    trace_id: str
+    span_id: str
+    sent_at: Optional[float] = None
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    @classmethod
+    def from_traceparent(cls, traceparent: str, sent_at=None) -> Optional["TraceContext"]:
+        parts = str(traceparent).strip().split('-')
+        if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+            return None
+        try:
+            sent_at = float(sent_at) if sent_at is not None else None
+        except ValueError:
+            sent_at = None
+        return cls(trace_id=parts[1], span_id=parts[2], sent_at=sent_at)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "end", "attributes")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, attributes: dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.end = None
+        self.attributes = attributes or {}
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def context(self) -> TraceContext:
+        return TraceContext(trace_id=self.trace_id, span_id=self.span_id)
+
+    @property
+    def duration(self) -> float:
+        return (self.end or time.time()) - self.start
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "end": self.end,
+            "duration": self.duration,
+            "attributes": self.attributes,
+        }
+
+
+class SpanExporter:
+    def export(self, span: Span):
+        pass
+
+
+class InMemorySpanCollector(SpanExporter):
+    """Keeps the most recent spans in memory."""
+
+    def __init__(self, max_spans: int = 10000):
+        self._spans = deque(maxlen=max_spans)
+
+    def export(self, span: Span):
+        self._spans.append(span.to_dict())
+
+    def spans(self) -> List[dict]:
+        return list(self._spans)
+
+    def clear(self):
+        self._spans.clear()
+
+
+class JsonlSpanExporter(SpanExporter):
+    """Appends one JSON object per finished span to a local file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line + '\n')
+
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('mq_current_span', default=None)
+
+
+class Tracer:
+    def __init__(self):
+        self.exporters: List[SpanExporter] = []
+
+    def add_exporter(self, exporter: SpanExporter):
+        self.exporters.append(exporter)
+
+    def current(self) -> Optional[Span]:
+        return _current_span.get()
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[TraceContext] = None, **attributes):
+        """
+            Start a span as a child of parent, or of the current span, or as a new trace.
+        """
+        if parent is None:
+            current = _current_span.get()
+            parent = current.context() if current is not None else None
+        span = Span(name,
+                    trace_id=parent.trace_id if parent else secrets.token_hex(16),
+                    parent_id=parent.span_id if parent else None,
+                    attributes=attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set("error", repr(e))
+            raise
+        finally:
+            span.end = time.time()
+            _current_span.reset(token)
+            for exporter in self.exporters:
+                try:
+                    exporter.export(span)
+                except Exception as e:
+                    logger.error(f"Error exporting span: {e}")
+
+    def inject(self) -> Dict[str, str]:
+        """
+            Message properties carrying the current span, stamped with the send time.
+        """
+        span = _current_span.get()
+        if span is None:
+            return {}
+        return {TRACEPARENT: span.context().traceparent(), TRACE_SENT_AT: repr(time.time())}
+
+    def extract(self, properties) -> Optional[TraceContext]:
+        """
+            Trace context from the properties of a received message; properties is a
+            dict or a pymqi MessageHandle.
+        """
+        traceparent = _read(properties, TRACEPARENT)
+        if not traceparent:
+            return None
+        return TraceContext.from_traceparent(traceparent, _read(properties, TRACE_SENT_AT))
+
+
+def _read(properties, name):
+    if properties is None:
+        return None
+    if isinstance(properties, dict):
+        value = properties.get(name)
+    else:
+        try:
+            value = properties.properties.get(name.encode('utf-8'))
+        except Exception:
+            return None
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', 'ignore')
+    return value.rstrip('\x00') if isinstance(value, str) else value
+
+
+def since_sent(context: Optional[TraceContext]) -> Optional[float]:
+    """Seconds between the message being sent and now, if the sender stamped it."""
+    if context is None or context.sent_at is None:
+        return None
+    return max(0.0, time.time() - context.sent_at)
+
+
+def latency_breakdown(spans: Iterable[dict]) -> Dict[str, dict]:
+    """
+        Split each traced request/reply round trip, from the spans exported by all
+        the processes involved, into:
+          put          - request put on the requester
+          queue_wait   - from the put until the responder got the request (transit + queueing)
+          processing   - responder handling, of which llm is time in LLM calls
+          reply_wait   - from the reply being sent until the requester read it
+          total        - requester's end to end time
+    """
+    by_trace: Dict[str, List[dict]] = {}
+    for span in spans:
+        by_trace.setdefault(span["trace_id"], []).append(span)
+
+    result = {}
+    for trace_id, trace in by_trace.items():
+        request = next((s for s in trace if s["name"] == "mq.request"), None)
+        process = next((s for s in trace if s["name"] == "mq.process"), None)
+        if request is None:
+            continue
+        attrs = request.get("attributes", {})
+        breakdown = {
+            "total": request["duration"],
+            "put": attrs.get("put_seconds"),
+            "reply_wait": attrs.get("reply_transit"),
+            "queue_wait": None,
+            "processing": None,
+            "llm": sum(s["duration"] for s in trace if s["name"] == "llm.invoke"),
+        }
+        if process is not None:
+            breakdown["queue_wait"] = process.get("attributes", {}).get("queue_wait")
+            breakdown["processing"] = process["duration"]
+        result[trace_id] = breakdown
+    return result
+
+
+tracer = Tracer()
+
+
+def configure_from_env():
+    """Export spans to the JSONL file named by TRACE_EXPORT_PATH, if set."""
+    path = os.getenv("TRACE_EXPORT_PATH")
+    if path:
+        tracer.add_exporter(JsonlSpanExporter(path))
+        logger.info("Exporting trace spans to %s", path)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Transport backend used by the SDK, chosen with MQ_TRANSPORT:
+
+    mq        IBM MQ through pymqi (default)
+    loopback  the in-memory broker in mq_sdk.utilities.loopback, for agents in the
+              same process, or on the same host with MQ_LOOPBACK_ADDRESS
+
+Each backend provides the part of the pymqi API the SDK uses: QueueManager
+(connect, commit, backout), Queue (open, put, get with wait and MsgId/CorrelId
+matching), Topic (pub), Subscription (sub), MessageHandle properties and the
+MD/GMO/PMO/OD/SD descriptors. SDK modules import it as
+
+    from mq_sdk.utilities.transport import pymqi
+"""
+
+import importlib
+import os
+
+TRANSPORT = 'MQ_TRANSPORT'
+
+TRANSPORTS = {
+    'mq': 'pymqi',
+    'loopback': 'mq_sdk.utilities.loopback',
+}
+
+
+def load_transport(name: str = None):
+    name = (name or os.getenv(TRANSPORT) or 'mq').lower()
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown {TRANSPORT} '{name}', expected one of {', '.join(TRANSPORTS)}")
+    return importlib.import_module(TRANSPORTS[name])
+
+
+pymqi = load_transport()
@@ -14,8 +14,8 @@
 # limitations under the License.
 
 from pydantic import BaseModel, ConfigDict, field_validator, Field
-from typing import Optional
-from pymqi import MD
+from typing import List, Optional
+from mq_sdk.utilities.transport import pymqi
 from datetime import *
 
 class MQAgentInfo(BaseModel):    
@@ -31,14 +31,46 @@ class MQAgentMessage(BaseModel):
     receiver: str
     timestamp: datetime
 
+class ProcessedMessage(BaseModel):
+    msg_id: str
+    content_hash: Optional[str] = None
+    reply: Optional[str] = None
+    processed_at: float
+
+class AgentReply(BaseModel):
+    agent_name: str
+    queue_name: str
+    reply: Optional[dict] = None
+    latency: Optional[float] = None
+    error: Optional[str] = None
+
+class GatherResult(BaseModel):
+    replies: List[AgentReply]
+    missing: List[str]
+    complete: bool
+    quorum_reached: bool
+    elapsed: float
+
+class InstanceHeartbeat(BaseModel):
+    instance_id: str
+    queue_name: str
+    instance_queue: Optional[str] = None
+    agent_name: Optional[str] = None
+    model: Optional[str] = None
+    in_flight: int = 0
+    latency: Optional[float] = None
+    interval: float
+    sent_at: float
+    stopping: bool = False
+
 class Message(BaseModel):
     message: str
     thread_id: str
-    mqmd: Optional[MD] = None
+    mqmd: Optional[pymqi.MD] = None
 
     @field_validator('mqmd')
     def check_mqmd(cls, v):
-        if v is not None and not isinstance(v, MD):
+        if v is not None and not isinstance(v, pymqi.MD):
             raise ValueError(f"mqmd must be None or pymqi.MD, got {type(v)}")
         return v
 
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Wake-up messages.
+
+pymqi has no asynchronous consume (MQCB/MQCTL), so a thread waiting in a get cannot
+be interrupted. Putting a message that the get matches makes it return at once.
+Wake-up messages are recognised by their Format and dropped by the reader. They are
+non-persistent and expire, so one left on a queue nobody reads does not stay there.
+"""
+
+import logging
+import os
+import threading
+
+from .transport import pymqi
+from .metrics import metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+WAKE_FORMAT = b'MQWAKE  '
+# Tenths of a second a wake-up message lives if no reader gets it
+WAKE_EXPIRY = 100
+MAX_IDLE = 'MQ_REACTOR_MAX_IDLE'
+
+
+def max_idle() -> float:
+    """
+        Seconds a get waits at most before its thread looks again, from
+        MQ_REACTOR_MAX_IDLE (0.1 by default).
+    """
+    return float(os.getenv(MAX_IDLE, 0.1))
+
+
+def is_wakeup(md) -> bool:
+    return md.Format == WAKE_FORMAT
+
+
+class Waker:
+    """
+        Puts wake-up messages on queue_name. The reader's connection is busy with its
+        get, so they are put over a connection of their own, made with connect() on
+        first use and kept until close().
+    """
+
+    def __init__(self, connect, queue_name=None, component: str = 'wake'):
+        self.connect = connect
+        self.queue_name = queue_name
+        self.component = component
+        self.qmgr = None
+        self.queue = None
+        self._lock = threading.Lock()
+
+    def wake(self, correl_id: bytes = None) -> bool:
+        """
+            Wake the reader of queue_name, or the one waiting for correl_id if given.
+            Returns False if the message could not be put.
+        """
+        with self._lock:
+            if not self.queue_name:
+                return False
+            try:
+                if self.queue is None:
+                    self.qmgr = self.qmgr or self.connect()
+                    if self.qmgr is None:
+                        return False
+                    self.queue = pymqi.Queue(self.qmgr, self.queue_name, pymqi.CMQC.MQOO_OUTPUT)
+                md = pymqi.MD()
+                md.Format = WAKE_FORMAT
+                md.Persistence = pymqi.CMQC.MQPER_NOT_PERSISTENT
+                md.Expiry = WAKE_EXPIRY
+                if correl_id is not None:
+                    md.CorrelId = correl_id
+                self.queue.put(b'', md, pymqi.PMO(Options=pymqi.CMQC.MQPMO_NO_SYNCPOINT))
+                metrics.inc('mq_wakeups_total', component=self.component)
+                return True
+            except pymqi.MQMIError as e:
+                # The reader still looks again after its current get
+                logger.error("Error putting a wake-up message on %s" % self.queue_name)
+                logger.error(e)
+                return False
+
+    def close(self):
+        with self._lock:
+            try:
+                if self.queue is not None:
+                    self.queue.close()
+                if self.qmgr is not None:
+                    self.qmgr.disconnect()
+            except pymqi.MQMIError as e:
+                logger.error("Error closing the wake-up connection")
+                logger.error(e)
+            self.queue = None
+            self.qmgr = None
@@ -13,9 +13,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
 import time
 import uuid
 from mq_sdk.mq_trigger.message_listener import MessageListener
+from mq_sdk.utilities.cancellation import cancellations
+from mq_sdk.utilities.dedup import MQDedupStore
+from mq_sdk.utilities.metrics import start_metrics_server
+from mq_sdk.utilities.tracing import configure_from_env
+from mq_sdk.utilities.profiling import install_signal_handlers
 from agents.flights_searcher.graph import MyGraph
 
 from mq_sdk.utilities.types import Message
@@ -33,7 +39,8 @@ class TaskManager:
         self.agent = agent                       
         self.message_listener = MessageListener(
             ccdt_path="agents/flights_searcher/",
-            on_message=self.on_message
+            on_message=self.on_message,
+            dedup_store=MQDedupStore(path="agents/flights_searcher/processed_messages.db")
         )
 
     def on_message(self, incoming_message: Message):        
@@ -43,6 +50,10 @@ class TaskManager:
         config["configurable"]["thread_id"] = thread_id
         events = self.agent.stream({"messages": ("human", msg), "flight_info": ""}, config, stream_mode="values")
         for event in events:
+            if cancellations.cancelled():
+                # The requester gave up, stop the turn here
+                print(f'Request in thread_id: {thread_id} was cancelled')
+                break
             message = event.get("messages")
             if message:
                 if isinstance(message, list):
@@ -55,6 +66,10 @@ class TaskManager:
 
 
 if __name__ == "__main__":
+    if os.getenv("METRICS_PORT"):
+        start_metrics_server(port=int(os.getenv("METRICS_PORT")))
+    configure_from_env()
+    install_signal_handlers()
     graph = MyGraph().build_graph()
     assistant = TaskManager(agent=graph)
     try:
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+# © Copyright IBM Corporation 2024, 2025
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Open-loop load generator.
+
+Streams a JSONL corpus of Message payloads ({"message": ..., "thread_id": ...})
+to an agent's request queue at a fixed arrival schedule, whether or not earlier
+requests have been answered, and times each request until its reply.
+
+    python start_load_generator.py corpus.jsonl --arrival poisson --rate 20 --duration 60
+    python start_load_generator.py corpus.jsonl --arrival profile --speedup 2
+    python start_load_generator.py requests.jsonl --message-field body --requests 25
+
+Arrivals are 'constant' or 'poisson' at --rate per second, or 'profile', which
+replays the 'timestamp' field of each line (epoch seconds or ISO 8601).
+Latency is measured from the scheduled arrival, so a generator that falls behind
+does not hide queueing. The corpus is read line by line and never held in memory.
+With --metrics-url pointing at the agent's metrics endpoint, the backouts it
+recorded during the run are reported too.
+"""
+
+import argparse
+import contextlib
+import datetime
+import itertools
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+import urllib.request
+import uuid
+
+import numpy as np
+
+from mq_sdk.mq_agent.MQRequest import MQRequest
+from mq_sdk.utilities.transport import pymqi
+from mq_sdk.utilities.types import Message
+
+DEFAULT_CCDT_PATH = "agents/primary_agent/"
+BACKOUT_METRICS = ("mq_backouts_total", "mq_backout_queue_total", "mq_handler_errors_total")
+# Seconds between scans for requests whose reply is overdue
+EXPIRE_INTERVAL = 1.0
+
+
+def read_corpus(path: str, message_field: str = "message", loop: bool = False):
+    """
+        Yield (timestamp, Message) for every line of the corpus, reading one line at a time.
+    """
+    while True:
+        found = False
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if message_field not in record:
+                    continue
+                found = True
+                yield record.get("timestamp"), Message(
+                    message=str(record[message_field]),
+                    thread_id=str(record.get("thread_id") or uuid.uuid4()),
+                )
+        if not loop or not found:
+            return
+
+
+def to_seconds(timestamp) -> float:
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    return datetime.datetime.fromisoformat(str(timestamp)).timestamp()
+
+
+def arrivals(corpus, mode: str, rate: float, speedup: float, seed: int):
+    """
+        Yield (offset seconds from the start, Message) following the arrival mode.
+    """
+    rng = random.Random(seed)
+    offset = 0.0
+    first = None
+    for timestamp, message in corpus:
+        if mode == "profile":
+            if timestamp is None:
+                raise ValueError("--arrival profile needs a 'timestamp' on every line")
+            seconds = to_seconds(timestamp)
+            first = seconds if first is None else first
+            offset = (seconds - first) / speedup
+        yield offset, message
+        if mode == "constant":
+            offset += 1.0 / rate
+        elif mode == "poisson":
+            offset += rng.expovariate(rate)
+
+
+def scrape(url: str) -> dict:
+    """Sum the backout and handler error counters exposed by an agent's metrics endpoint."""
+    totals = dict.fromkeys(BACKOUT_METRICS, 0.0)
+    if not url:
+        return totals
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            for line in response.read().decode().splitlines():
+                m = re.match(r"^(\w+)(?:\{[^}]*\})? ([0-9.eE+-]+)$", line)
+                if m and m.group(1) in totals:
+                    totals[m.group(1)] += float(m.group(2))
+    except OSError as e:
+        print(f"Could not read metrics from {url}: {e}", file=sys.stderr)
+    return totals
+
+
+class ReplyCollector(threading.Thread):
+    """
+        Owns the reply queue: reads every reply and matches it to its request by
+        MsgId, which the responder copies to the reply. The MsgId is only known once
+        the request is put, so a reply can arrive before expect() is called for it;
+        it is kept with its arrival time until then.
+    """
+
+    def __init__(self, ccdt_path: str, timeout: float):
+        super().__init__(daemon=True)
+        self.timeout = timeout
+        self.request = MQRequest(ccdt_path=ccdt_path)
+        self.request.perform_connection()
+        self.request.dynamic['queue'], self.request.dynamic['name'] = self.request.get_dynamic_queue()
+        self.pending = {}
+        self.early = {}
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.timeouts = 0
+        self._stop_event = threading.Event()
+
+    def expect(self, msg_id, scheduled: float):
+        with self.lock:
+            received = self.early.pop(msg_id, None)
+            if received is None:
+                self.pending[msg_id] = scheduled
+                return
+        self.latencies.append(received - scheduled)
+
+    def outstanding(self) -> int:
+        with self.lock:
+            return len(self.pending)
+
+    def expire(self, now: float):
+        with self.lock:
+            expired = [k for k, scheduled in self.pending.items() if now - scheduled > self.timeout]
+            for k in expired:
+                del self.pending[k]
+            self.timeouts += len(expired)
+            # Replies to requests this run did not send
+            for k in [k for k, received in self.early.items() if now - received > self.timeout]:
+                del self.early[k]
+
+    def run(self):
+        gmo = pymqi.GMO()
+        gmo.Options = pymqi.CMQC.MQGMO_WAIT | pymqi.CMQC.MQGMO_FAIL_IF_QUIESCING | pymqi.CMQC.MQGMO_NO_PROPERTIES
+        gmo.WaitInterval = 200
+        gmo.MatchOptions = pymqi.CMQC.MQMO_NONE
+        last_expire = time.perf_counter()
+        while not self._stop_event.is_set():
+            md = pymqi.MD()
+            try:
+                self.request.dynamic['queue'].get(None, md, gmo)
+                received = time.perf_counter()
+                with self.lock:
+                    scheduled = self.pending.pop(md.MsgId, None)
+                    if scheduled is None:
+                        self.early[md.MsgId] = received
+                if scheduled is not None:
+                    self.latencies.append(received - scheduled)
+            except pymqi.MQMIError as e:
+                if e.reason != pymqi.CMQC.MQRC_NO_MSG_AVAILABLE:
+                    raise
+            now = time.perf_counter()
+            if now - last_expire >= EXPIRE_INTERVAL:
+                self.expire(now)
+                last_expire = now
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.request.dynamic['queue'].close()
+        self.request.qmgr.disconnect()
+
+
+def percentiles(seconds) -> dict:
+    if not len(seconds):
+        return None
+    ms = np.asarray(seconds) * 1e3
+    return {
+        "p50": round(float(np.percentile(ms, 50)), 3),
+        "p90": round(float(np.percentile(ms, 90)), 3),
+        "p99": round(float(np.percentile(ms, 99)), 3),
+        "p999": round(float(np.percentile(ms, 99.9)), 3),
+        "max": round(float(ms.max()), 3),
+    }
+
+
+def run(args) -> dict:
+    collector = ReplyCollector(args.ccdt_path, args.timeout)
+    sender = MQRequest(ccdt_path=args.ccdt_path)
+    sender.perform_connection()
+    sender.queue = sender.get_queue()
+    # Replies go to the collector's queue
+    sender.dynamic['name'] = collector.request.dynamic['name']
+
+    before = scrape(args.metrics_url)
+    collector.start()
+
+    schedule = arrivals(read_corpus(args.corpus, args.message_field, args.loop),
+                        args.arrival, args.rate, args.speedup, args.seed)
+    if args.requests:
+        schedule = itertools.islice(schedule, args.requests)
+
+    sent = errors = 0
+    lags = []
+    started = time.perf_counter()
+    for offset, message in schedule:
+        if args.duration and offset >= args.duration:
+            break
+        scheduled = started + offset
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        lags.append(max(0.0, time.perf_counter() - scheduled))
+        result = sender.putMessage(message.model_dump_json())
+        if not result:
+            errors += 1
+            continue
+        collector.expect(result[0], scheduled)
+        sent += 1
+    send_seconds = time.perf_counter() - started
+
+    # Wait for the replies still in flight
+    deadline = time.perf_counter() + args.timeout
+    while collector.outstanding() and time.perf_counter() < deadline:
+        time.sleep(0.05)
+    collector.expire(float("inf"))
+    collector.stop()
+    elapsed = time.perf_counter() - started
+    sender.queue.close()
+    sender.qmgr.disconnect()
+
+    after = scrape(args.metrics_url)
+    completed = len(collector.latencies)
+    attempted = sent + errors
+    return {
+        "benchmark": "load_generator",
+        "corpus": args.corpus,
+        "arrival": args.arrival,
+        "target_rate": args.rate if args.arrival != "profile" else None,
+        "sent": sent,
+        "completed": completed,
+        "errors": errors,
+        "timeouts": collector.timeouts,
+        "error_rate": round((errors + collector.timeouts) / attempted, 4) if attempted else None,
+        "achieved_send_rate": round(sent / send_seconds, 2) if send_seconds else None,
+        "throughput_rps": round(completed / elapsed, 2) if elapsed else None,
+        "latency_ms": percentiles(collector.latencies),
+        "send_lag_ms": percentiles(lags),
+        "agent": {name: after[name] - before[name] for name in BACKOUT_METRICS} if args.metrics_url else None,
+        "backout_rate": round((after["mq_backouts_total"] - before["mq_backouts_total"]) / sent, 4)
+        if args.metrics_url and sent else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="JSONL file of Message payloads")
+    parser.add_argument("--ccdt-path", default=DEFAULT_CCDT_PATH,
+                        help="agent directory whose env.json OUTBOUND_NETWORK names the request queue")
+    parser.add_argument("--arrival", choices=["constant", "poisson", "profile"], default="constant")
+    parser.add_argument("--rate", type=float, default=10.0, help="requests per second")
+    parser.add_argument("--speedup", type=float, default=1.0, help="replay a profile this many times faster")
+    parser.add_argument("--duration", type=float, help="stop scheduling after this many seconds")
+    parser.add_argument("--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--loop", action="store_true", help="restart the corpus when it runs out")
+    parser.add_argument("--message-field", default="message", help="field holding the message text")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for a reply")
+    parser.add_argument("--metrics-url", help="agent metrics endpoint, e.g. http://127.0.0.1:9464/metrics")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    # The SDK prints progress to stdout, keep it for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        result = run(args)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
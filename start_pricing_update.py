@@ -14,37 +14,29 @@
 # limitations under the License.
 
 from flights_pricing.flight_emitter import FlightEmitter
-from flights_pricing.flight_reader import FlightReader, FlightInfo
+from flights_pricing.flight_reader import FlightReader
+from flights_pricing.flight_snapshot import FlightSnapshot, StringPool
+from mq_sdk.utilities.tracing import configure_from_env
+import os
 import time
 
 MQ = "agents/primary_agent/"
 
 if __name__ == "__main__":
+    configure_from_env()
     reader:FlightReader = FlightReader()
-    emitter:FlightEmitter = FlightEmitter(MQ)
-    last_flights:list[FlightInfo] = None
+    # ASYNC_PUBLISH=1 pipelines the publications of a snapshot, committed once it is published
+    emitter:FlightEmitter = FlightEmitter(MQ, asynchronous=os.getenv("ASYNC_PUBLISH", "") not in ("", "0"))
+    pool:StringPool = StringPool()
+    last_snapshot:FlightSnapshot = FlightSnapshot.empty(pool)
     while True:    
-        flights:list[FlightInfo] = reader.generate_flight_info()    
-        print(f'>>>> {flights}')
-        some_change = False
-        if last_flights is None:
-            last_flights = flights
-            continue
-        if len(flights) != len(last_flights):
-                continue
-        for i in range(len(flights)):
-            lflight:FlightInfo = last_flights[i]
-            fight:FlightInfo = flights[i]
-            some_changes = lflight.price != fight.price or lflight.seats_left != fight.seats_left
-            print(f'>>> Something is changed: {some_changes}')
-            if some_changes or True:
-                last_flights = flights
-                emitter.publishMessage(flights[i].model_dump_json()) 
+        snapshot:FlightSnapshot = FlightSnapshot.from_flights(pool, reader.generate_flight_info())
+        changes = snapshot.diff(last_snapshot)
+        print(f'>>>> {len(snapshot)} flights, {len(changes.changed)} changed, '
+              f'{len(changes.added)} new, {len(changes.removed)} removed')
+        pct_change = dict(zip(changes.changed.tolist(), changes.pct_change.tolist()))
+        for row in changes.published_rows().tolist():
+            emitter.publishMessage(snapshot.flight_info(row).model_dump_json(), pct_change.get(row, 0.0)) 
+        emitter.flush()
+        last_snapshot = snapshot
         time.sleep(10)
-
-
-
-
-
-
-
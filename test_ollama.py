@@ -1,12 +1,9 @@
-import subprocess
+from agents.primary_agent.ollama_client import OllamaClient
 
 user_input = "Hi"
 
-result = subprocess.run(
-    ["ollama", "chat", "mistral", "--prompt", user_input],
-    capture_output=True,
-    text=True
-)
-
-output = result.stdout.strip()
-print(output)
+# OLLAMA_HOST may point at a local stub server instead of Ollama
+client = OllamaClient()
+for token in client.stream_chat(user_input):
+    print(token, end="", flush=True)
+print()